@@ -0,0 +1,239 @@
+"""
+asyncio support for SQJobs (Python 3.5+ only)
+"""
+import asyncio
+import inspect
+import signal
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .brokers.standard import Standard
+from .exceptions import RetryException
+from .poller import QueuePoller
+from .worker import Worker, format_error
+
+import logging
+logger = logging.getLogger('sqjobs.aio')
+
+
+class AsyncConnector(object):
+    """
+    Wraps a connector to be used from coroutines. Every method of the
+    connector is executed in a thread pool and returns an awaitable.
+    """
+
+    def __init__(self, connector, executor=None):
+        """
+        Creates a new async connector
+
+        :param connector: the connector to wrap
+        :param executor: executor where the connector calls are run (a thread pool by default)
+        """
+        self.connector = connector
+        self.executor = executor or ThreadPoolExecutor(4)
+
+    def __repr__(self):
+        return 'AsyncConnector({connector})'.format(
+            connector=type(self.connector).__name__
+        )
+
+    def __getattr__(self, name):
+        method = getattr(self.connector, name)
+
+        if not callable(method):
+            return method
+
+        def call(*args, **kwargs):
+            loop = asyncio.get_event_loop()
+            return loop.run_in_executor(self.executor, partial(method, *args, **kwargs))
+
+        return call
+
+
+class AsyncWorker(Worker):
+    """
+    Worker that runs jobs concurrently in an asyncio event loop.
+
+    Jobs whose `run` method is a coroutine function are run in the loop (as well
+    as any coroutine returned by their `pre_run`, `post_run`, `on_success`,
+    `on_failure` or `on_retry` methods). Normal jobs are run in a thread pool.
+    Up to `concurrency` jobs are executed at the same time.
+    """
+
+    def __init__(self, broker, queue_name, executor=None, **kwargs):
+        """
+        Creates a new async worker
+
+        :param broker: the broker where the jobs are retrieved from
+        :param queue_name: the name of the queue
+        :param executor: executor where the blocking calls (connector calls and normal
+         jobs) are run. By default, a thread pool of `concurrency` + 1 threads.
+        :param kwargs: other options of `Worker`
+        """
+        super(AsyncWorker, self).__init__(broker, queue_name, **kwargs)
+        self.executor = executor or ThreadPoolExecutor(self.concurrency + 1)
+        self.connector = AsyncConnector(broker.connector, self.executor)
+
+    def run(self, loop=None):
+        if loop:
+            loop.run_until_complete(self.run_async())
+            return
+
+        loop = asyncio.new_event_loop()
+
+        try:
+            loop.run_until_complete(self.run_async())
+        finally:
+            loop.close()
+
+    async def run_async(self):
+        logger.info('Running async worker, %d jobs registered...', len(self.registered_jobs))
+
+        loop = asyncio.get_event_loop()
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self._exit_gracefully, signum, None)
+            except (NotImplementedError, RuntimeError):  # Not supported or not the main thread
+                pass
+
+        await self.connector.warm_up(self.queue_names)
+
+        poller = QueuePoller(
+            self.queues, strict_priority=self.strict_priority,
+            max_backoff=self.timeout or Standard.NON_BLOCKING_MAX_BACKOFF
+        )
+        slots = asyncio.Semaphore(self.concurrency)
+        queue_name, buffer = self.queue_name, deque()
+        tasks = set()
+
+        def task_done(task):
+            tasks.discard(task)
+            slots.release()
+
+        if self.flusher:
+            self.flusher.start()
+
+        if self.heartbeat:
+            self.heartbeat.start()
+
+        try:
+            while not self._shutting_down:
+                await slots.acquire()
+
+                if not buffer and not self._shutting_down:
+                    queue_name, wait_time = poller.next_queue(self.timeout)
+
+                    if not self.timeout:  # Non-blocking mode: wait until the queue is active
+                        await asyncio.sleep(poller.idle_time(queue_name))
+
+                    buffer.extend(await self.connector.dequeue_batch(
+                        queue_name, max_messages=self.prefetch, wait_time=wait_time
+                    ))
+                    poller.report(queue_name, len(buffer))
+
+                if not buffer or self._shutting_down:
+                    slots.release()
+                    continue
+
+                payload = buffer.popleft()
+                task = asyncio.ensure_future(self._process_payload_async(payload, queue_name))
+                tasks.add(task)
+                task.add_done_callback(task_done)
+        finally:
+            if buffer:
+                await self.connector.release(queue_name, list(buffer))
+
+            if tasks:
+                logger.info('Waiting for %d jobs to finish...', len(tasks))
+                await asyncio.wait(tasks)
+
+            if self.heartbeat:
+                await self._run_in_executor(self.heartbeat.close)
+
+            if self.flusher:
+                await self._run_in_executor(self.flusher.close)
+
+    async def _process_payload_async(self, payload, queue_name=None):
+        try:
+            job_class = self.registered_jobs.get(payload['name'])
+
+            if not job_class:
+                logger.error('Unregistered task: %s', payload['name'])
+                return
+
+            job, args, kwargs = self.broker.unserialize_job(
+                job_class, queue_name or self.queue_name, payload
+            )
+
+            if not await self._run_in_executor(self._claim, job, payload):
+                return
+
+            await self._run_in_executor(self._set_custom_retry_time_if_needed, job)
+            await self._execute_job_async(job, args, kwargs)
+        except Exception:
+            logger.exception('Error executing job')
+        finally:
+            self._check_limits()
+
+    async def _execute_job_async(self, job, args, kwargs):
+        try:
+            if self.heartbeat:
+                await self._run_in_executor(self.heartbeat.add, job)
+
+            try:
+                await self._run_job(job, args, kwargs)
+            finally:
+                if self.heartbeat:
+                    await self._run_in_executor(self.heartbeat.remove, job)
+        except RetryException:
+            await self._run_in_executor(self._release_claim, job)
+            await self._run_hook(job.on_retry)
+            await self._run_in_executor(self._set_custom_retry_time_if_needed, job, deferred=True)
+            return
+        except Exception:
+            exc_info = sys.exc_info()
+            await self._run_in_executor(self._release_claim, job)
+            await self._run_hook(job.on_failure)
+            await self._run_in_executor(self._handle_exception, job, args, kwargs, *exc_info)
+            await self._run_in_executor(self._fail, job, format_error(exc_info))
+            return
+
+        await self._run_in_executor(self._succeed, job)
+        await self._run_hook(job.on_success)
+
+    async def _run_job(self, job, args, kwargs):
+        if not inspect.iscoroutinefunction(job.run):
+            return await self._run_in_executor(job.execute, *args, **kwargs)
+
+        await self._run_hook(job.pre_run, *args, **kwargs)
+        job.result = await job.run(*args, **kwargs)
+        await self._run_hook(job.post_run, *args, **kwargs)
+
+        return job.result
+
+    async def _run_hook(self, hook, *args, **kwargs):
+        """
+        Runs a method of a job: coroutine functions in the loop, and normal ones in
+        the executor, so they can block (ex: the ORM writes of Django jobs)
+        """
+        if inspect.iscoroutinefunction(hook):
+            return await hook(*args, **kwargs)
+
+        return await maybe_await(await self._run_in_executor(hook, *args, **kwargs))
+
+    def _run_in_executor(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+
+async def maybe_await(value):
+    """
+    Awaits `value` if it's awaitable, or returns it directly otherwise
+    """
+    if inspect.isawaitable(value):
+        return await value
+
+    return value
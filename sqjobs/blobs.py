@@ -0,0 +1,221 @@
+import os
+import tempfile
+import threading
+import uuid
+
+import boto3
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # pragma: no cover
+    from collections import MutableMapping
+
+import logging
+logger = logging.getLogger('sqjobs.blobs')
+
+
+class BlobStore(object):
+    """
+    Stores the payloads too big to be sent in a message (claim-check pattern).
+    Messages only carry the key of the blob with their payload.
+    """
+
+    def put(self, data):
+        """
+        Stores a new blob
+
+        :param data: the content of the blob (bytes)
+        :return: the key of the blob
+        """
+        raise NotImplementedError
+
+    def get(self, key):
+        """
+        Returns the content of a blob
+
+        :param key: the key of the blob
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        """
+        Deletes a blob. Deleting a blob that doesn't exist is not an error.
+
+        :param key: the key of the blob
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def new_key():
+        return uuid.uuid4().hex
+
+
+class FileSystemBlobStore(BlobStore):
+    """
+    Stores the blobs as files of a local (or shared) directory
+    """
+
+    def __init__(self, directory):
+        """
+        Creates a new file system blob store
+
+        :param directory: directory where the blobs are stored. It's created if it doesn't exist.
+        """
+        self.directory = directory
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def __repr__(self):
+        return 'FileSystemBlobStore("{directory}")'.format(directory=self.directory)
+
+    def put(self, data):
+        key = self.new_key()
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+        os.rename(tmp_path, self._path(key))  # Atomic, readers never see partial blobs
+
+        return key
+
+    def get(self, key):
+        with open(self._path(key), 'rb') as f:
+            return f.read()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _path(self, key):
+        return os.path.join(self.directory, os.path.basename(key))
+
+
+class S3BlobStore(BlobStore):
+    """
+    Stores the blobs as objects of a S3 (or S3 compatible) bucket
+    """
+
+    def __init__(self, bucket, prefix='', access_key=None, secret_key=None, region_name=None,
+                 endpoint_url=None):
+        """
+        Creates a new S3 blob store
+
+        :param bucket: name of the bucket
+        :param prefix: prefix of the keys of the blobs, like 'sqjobs/'
+        :param access_key: access key with read/write access to the bucket
+        :param secret_key: secret key with read/write access to the bucket
+        :param region_name: a region name, like 'us-east-1'
+        :param endpoint_url: URL of a S3 compatible service
+        """
+        self.bucket = bucket
+        self.prefix = prefix
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region_name = region_name
+        self.endpoint_url = endpoint_url
+
+        self._cached_client = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'S3BlobStore("{bucket}", prefix="{prefix}")'.format(
+            bucket=self.bucket, prefix=self.prefix
+        )
+
+    @property
+    def client(self):
+        """
+        Creates (and saves in a cache) a S3 client
+        """
+        with self._lock:
+            if self._cached_client is None:
+                config = {
+                    'service_name': 's3',
+                    'region_name': self.region_name,
+                    'aws_access_key_id': self.access_key,
+                    'aws_secret_access_key': self.secret_key,
+                }
+
+                if self.endpoint_url:
+                    config['endpoint_url'] = self.endpoint_url
+
+                self._cached_client = boto3.client(**config)
+
+        return self._cached_client
+
+    def put(self, data):
+        key = self.prefix + self.new_key()
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+        return key
+
+    def get(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+class LazyPayload(MutableMapping):
+    """
+    Payload whose content is loaded the first time it's accessed. Only its
+    metadata (the `_metadata` key) is available without loading it.
+    """
+
+    def __init__(self, loader, metadata):
+        """
+        Creates a new lazy payload
+
+        :param loader: function that returns the content of the payload
+        :param metadata: metadata of the payload
+        """
+        self._loader = loader
+        self._metadata = metadata
+        self._payload = None
+
+    def __repr__(self):
+        if self._payload is None:
+            return 'LazyPayload(<not loaded>, _metadata={metadata!r})'.format(
+                metadata=self._metadata
+            )
+
+        return repr(self.payload)
+
+    def __bool__(self):
+        return True  # Don't load the payload to know if it's empty
+
+    __nonzero__ = __bool__
+
+    @property
+    def loaded(self):
+        return self._payload is not None
+
+    @property
+    def payload(self):
+        if self._payload is None:
+            self._payload = self._loader()
+            self._payload['_metadata'] = self._metadata
+
+        return self._payload
+
+    def __getitem__(self, key):
+        if key == '_metadata' and self._payload is None:
+            return self._metadata
+
+        return self.payload[key]
+
+    def __setitem__(self, key, value):
+        self.payload[key] = value
+
+    def __delitem__(self, key):
+        del self.payload[key]
+
+    def __iter__(self):
+        return iter(self.payload)
+
+    def __len__(self):
+        return len(self.payload)
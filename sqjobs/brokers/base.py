@@ -1,3 +1,4 @@
+import time
 from abc import ABCMeta, abstractmethod
 from six import add_metaclass
 from uuid import uuid4
@@ -13,17 +14,29 @@ class Broker(object):
 
         :param job_class: python class of the payload job
         :param args: arguments to execute the job
-        :param kwargs: keyword arguments to execute the job
+        :param kwargs: keyword arguments to execute the job. `queue_name`,
+         `delay` (time in seconds until the job can be executed) and `dedup_key`
+         (workers with an idempotency store execute once the jobs with the same
+         key, the ID of the job by default) are not passed to the job.
         """
         raise NotImplementedError
 
+    def add_jobs(self, jobs):
+        """
+        Add several jobs to the broker
+
+        :param jobs: iterable of (job_class, args, kwargs) tuples
+        :return: list with a job result per job
+        """
+        return [self.add_job(job_class, *args, **kwargs) for job_class, args, kwargs in jobs]
+
     def gen_job_id(self):
         """
         Generate a new unique job ID
         """
         return str(uuid4())
 
-    def serialize_job(self, job_name, job_id, args, kwargs):
+    def serialize_job(self, job_name, job_id, args, kwargs, delay=None, dedup_key=None):
         """
         Serialize a job into a string to be sent to the broker
 
@@ -31,8 +44,18 @@ class Broker(object):
         :param job_id: the ID of the job
         :param args: arguments of the job
         :param kwargs: keyword arguments of the job
+        :param delay: time (in seconds) until the job can be executed
+        :param dedup_key: key used by the workers to detect duplicated jobs
         """
-        return self.connector.serialize_job(job_name, job_id, args, kwargs)
+        payload = self.connector.serialize_job(job_name, job_id, args, kwargs)
+
+        if delay:
+            payload['eta'] = time.time() + delay
+
+        if dedup_key:
+            payload['dedup_key'] = dedup_key
+
+        return payload
 
     def unserialize_job(self, job_class, queue_name, payload):
         """
@@ -0,0 +1,257 @@
+import atexit
+import threading
+import time
+import weakref
+
+from .base import Broker
+from ..connectors.resilient import backoff
+from ..exceptions import BufferFull
+from ..job import JobResult
+
+import logging
+logger = logging.getLogger('sqjobs.broker')
+
+
+class Buffered(Broker):
+    """
+    Broker that adds the jobs in the background. It wraps a standard broker:
+    `add_job` returns immediately, and a background thread sends the jobs to
+    its connector in batches.
+
+    A batch is sent when it reaches `max_size` jobs, when its oldest job has
+    been waiting for `max_delay` seconds or when the broker is flushed (or
+    closed). Jobs that can't be sent are retried up to `max_attempts` times
+    (with exponential backoff when flushing); then, their results get an
+    `error` and `on_failure` is called.
+    """
+    DEFAULT_MAX_SIZE = 10  # jobs
+    DEFAULT_MAX_DELAY = 0.5  # seconds
+    DEFAULT_MAX_PENDING = 10000  # jobs
+    DEFAULT_MAX_ATTEMPTS = 3
+    RETRY_BASE_DELAY = 0.1  # seconds
+    RETRY_MAX_DELAY = 5  # seconds
+
+    def __init__(self, broker, max_size=None, max_delay=None, max_pending=None, max_attempts=None,
+                 on_failure=None, block=True, flush_at_exit=True):
+        """
+        Creates a new buffered broker
+
+        :param broker: the standard broker used to send the jobs
+        :param max_size: maximum number of jobs of every batch
+        :param max_delay: maximum time (in seconds) that a job waits to be sent
+        :param max_pending: maximum number of jobs waiting to be sent
+        :param max_attempts: how many times a job is sent before giving up
+        :param on_failure: function called with the result, the queue name and the
+         payload of every job that could not be sent
+        :param block: if there are `max_pending` jobs waiting, `add_job` blocks until
+         some of them are sent. If False, it raises `BufferFull` instead.
+        :param flush_at_exit: send the pending jobs when the interpreter exits
+        """
+        self.broker = broker
+        self.max_size = max_size or self.DEFAULT_MAX_SIZE
+        self.max_delay = max_delay or self.DEFAULT_MAX_DELAY
+        self.max_pending = max_pending or self.DEFAULT_MAX_PENDING
+        self.max_attempts = max_attempts or self.DEFAULT_MAX_ATTEMPTS
+        self.on_failure = on_failure
+        self.block = block
+
+        self._pending = {}  # queue name -> [(result, payload, attempts), ...]
+        self._deadlines = {}  # queue name -> time
+        self._sending = 0  # batches being sent
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+        if flush_at_exit:
+            atexit.register(_close_at_exit, weakref.ref(self))  # Don't keep the broker alive
+
+    def __repr__(self):
+        return 'Broker(Buffered({broker!r}))'.format(broker=self.broker)
+
+    @property
+    def connector(self):
+        return self.broker.connector
+
+    @property
+    def result_backend(self):
+        return getattr(self.broker, 'result_backend', None)
+
+    def add_job(self, job_class, *args, **kwargs):
+        job_name = job_class._task_name()
+        queue_name = kwargs.pop('queue_name', job_class.default_queue_name)
+
+        return self.add_job_by_name(job_name, queue_name, *args, **kwargs)
+
+    def add_job_by_name(self, job_name, queue_name, *args, **kwargs):
+        result = JobResult()
+        result.job_id = self.gen_job_id()
+        result.backend = self.result_backend
+        delay = kwargs.pop('delay', None)
+        dedup_key = kwargs.pop('dedup_key', None)
+
+        payload = self.serialize_job(
+            job_name, result.job_id, args, kwargs, delay=delay, dedup_key=dedup_key
+        )
+        self._add(queue_name, [(result, payload, 0)])
+
+        return result
+
+    def pending(self):
+        """
+        Number of jobs waiting to be sent
+        """
+        with self._condition:
+            return sum(len(entries) for entries in self._pending.values())
+
+    def flush(self):
+        """
+        Sends all the pending jobs right now (retrying the failed ones), and
+        waits for the batches that are being sent in the background
+        """
+        while True:
+            with self._condition:
+                while not self._pending and self._sending:
+                    self._condition.wait()
+
+                queue_names = list(self._pending.keys())
+                attempts = max([
+                    attempts for entries in self._pending.values() for _, _, attempts in entries
+                ] or [0])
+
+            if not queue_names:
+                return
+
+            if attempts:  # Some jobs failed, don't send them again right away
+                time.sleep(backoff(attempts - 1, self.RETRY_BASE_DELAY, self.RETRY_MAX_DELAY))
+
+            for queue_name in queue_names:
+                self._send(queue_name, self._pop(queue_name))
+
+    def close(self):
+        """
+        Stops the background thread and sends all the pending jobs
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self.flush()
+
+    def _add(self, queue_name, entries):
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('The broker is closed')
+
+            while sum(len(pending) for pending in self._pending.values()) >= self.max_pending:
+                if not self.block:
+                    raise BufferFull('%d jobs waiting to be sent' % self.max_pending)
+
+                self._condition.wait()
+
+            if self._thread is None:
+                self._start()
+
+            pending = self._pending.setdefault(queue_name, [])
+            pending.extend(entries)
+
+            if queue_name not in self._deadlines or len(pending) >= self.max_size:
+                self._deadlines.setdefault(queue_name, time.time() + self.max_delay)
+                self._condition.notify_all()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='sqjobs-producer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _pop(self, queue_name):
+        with self._condition:
+            self._deadlines.pop(queue_name, None)
+            pending = self._pending.pop(queue_name, [])
+
+            if pending:
+                self._sending += 1
+
+            self._condition.notify_all()  # There's room for new jobs
+
+            return pending
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._closed:
+                    return
+
+                now = time.time()
+                ready = [
+                    queue_name for queue_name, deadline in self._deadlines.items()
+                    if deadline <= now or len(self._pending[queue_name]) >= self.max_size
+                ]
+
+                if not ready:
+                    timeout = min(self._deadlines.values()) - now if self._deadlines else None
+                    self._condition.wait(timeout)
+                    continue
+
+            for queue_name in ready:
+                self._send(queue_name, self._pop(queue_name))
+
+    def _send(self, queue_name, pending):
+        if not pending:
+            return
+
+        try:
+            for i in range(0, len(pending), self.max_size):
+                chunk = pending[i:i + self.max_size]
+
+                try:
+                    errors = self.connector.enqueue_batch(
+                        queue_name, [payload for _, payload, _ in chunk]
+                    )
+                except Exception as e:
+                    logger.exception(
+                        'Error sending a batch of %d jobs to %s', len(chunk), queue_name
+                    )
+                    errors = [str(e)] * len(chunk)
+
+                self._retry(queue_name, chunk, errors)
+        finally:
+            with self._condition:
+                self._sending -= 1
+                self._condition.notify_all()
+
+    def _retry(self, queue_name, chunk, errors):
+        retries = []
+
+        for (result, payload, attempts), error in zip(chunk, errors):
+            if error is None:
+                continue
+
+            if attempts + 1 < self.max_attempts:
+                retries.append((result, payload, attempts + 1))
+                continue
+
+            logger.error('Giving up job %s of %s: %s', result.job_id, queue_name, error)
+            result.error = error
+
+            if self.on_failure:
+                try:
+                    self.on_failure(result, queue_name, payload)
+                except Exception:
+                    logger.exception('Error in the failure callback of job %s', result.job_id)
+
+        if retries:
+            with self._condition:
+                self._pending.setdefault(queue_name, []).extend(retries)
+                self._deadlines.setdefault(queue_name, time.time() + self.max_delay)
+                self._condition.notify_all()
+
+
+def _close_at_exit(reference):
+    broker = reference()
+
+    if broker is not None:
+        broker.close()
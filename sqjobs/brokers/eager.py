@@ -3,6 +3,10 @@ import six
 
 from .base import Broker
 from ..job import JobResult
+from ..results import ResultBackend
+
+import logging
+logger = logging.getLogger('sqjobs.broker')
 
 
 class Eager(Broker):
@@ -16,6 +20,11 @@ class Eager(Broker):
     def add_job(self, job_class, *args, **kwargs):
         job_id = self.gen_job_id()
 
+        if kwargs.pop('delay', None):
+            logger.debug('Eager mode, executing delayed job %s right now', job_class._task_name())
+
+        kwargs.pop('dedup_key', None)  # Jobs are executed when they're added
+
         eager_job = job_class()
         eager_job.id = job_id
 
@@ -29,5 +38,6 @@ class Eager(Broker):
         job_result = JobResult()
         job_result.job_id = job_id
         job_result.result = result
+        job_result.status = ResultBackend.SUCCESS
 
         return job_result
@@ -1,14 +1,33 @@
+import time
+from collections import OrderedDict, deque
+
 from .base import Broker
 from ..job import Job, JobResult
+from ..poller import QueuePoller
+
+import logging
+logger = logging.getLogger('sqjobs.broker')
 
 
 class Standard(Broker):
     """
     Standard broker to execute jobs in an asynchronous way
     """
+    NON_BLOCKING_MAX_BACKOFF = 1  # seconds
+
+    def __init__(self, connector, result_backend=None):
+        """
+        Creates a new standard broker
 
-    def __init__(self, connector):
+        :param connector: the connector used to send and receive the jobs
+        :param result_backend: where the workers store the results of the jobs, so
+         they can be fetched with the `JobResult` returned when they're added
+        """
         self.connector = connector
+        self.result_backend = result_backend
+
+        self.receives = 0  # Receive calls made by `jobs` and `jobs_from_queues`
+        self.empty_receives = 0
 
     def __repr__(self):
         return 'Broker({connector})'.format(
@@ -23,15 +42,78 @@ class Standard(Broker):
 
     def add_job_by_name(self, job_name, queue_name, *args, **kwargs):
         job_id = self.gen_job_id()
+        delay = kwargs.pop('delay', None)
+        dedup_key = kwargs.pop('dedup_key', None)
 
-        payload = self.serialize_job(job_name, job_id, args, kwargs)
+        payload = self.serialize_job(
+            job_name, job_id, args, kwargs, delay=delay, dedup_key=dedup_key
+        )
         self.connector.enqueue(queue_name, payload)
 
         result = JobResult()
         result.job_id = job_id
+        result.backend = self.result_backend
 
         return result
 
+    def add_jobs(self, jobs):
+        jobs_by_name = []
+
+        for job_class, args, kwargs in jobs:
+            kwargs = dict(kwargs)
+            queue_name = kwargs.pop('queue_name', job_class.default_queue_name)
+            jobs_by_name.append((job_class._task_name(), queue_name, args, kwargs))
+
+        return self.add_jobs_by_name(jobs_by_name)
+
+    def add_jobs_by_name(self, jobs):
+        """
+        Add several jobs to the broker, sending them in batches when the connector allows it
+
+        :param jobs: iterable of (job_name, queue_name, args, kwargs) tuples
+        :return: list with a job result per job. If a job could not be added,
+         the `error` attribute of its result explains why.
+        """
+        results = []
+        queues = OrderedDict()
+
+        for job_name, queue_name, args, kwargs in jobs:
+            result = JobResult()
+            result.job_id = self.gen_job_id()
+            result.backend = self.result_backend
+            results.append(result)
+
+            kwargs = dict(kwargs)
+            delay = kwargs.pop('delay', None)
+            dedup_key = kwargs.pop('dedup_key', None)
+
+            payload = self.serialize_job(
+                job_name, result.job_id, args, kwargs, delay=delay, dedup_key=dedup_key
+            )
+            queues.setdefault(queue_name, []).append((result, payload))
+
+        for queue_name, entries in queues.items():
+            try:
+                errors = self.connector.enqueue_batch(
+                    queue_name, [payload for _, payload in entries]
+                )
+            except Exception as e:
+                # The jobs of the other queues can still be added
+                logger.exception('Error adding %d jobs to %s', len(entries), queue_name)
+                errors = [str(e) or type(e).__name__] * len(entries)
+
+            for (result, _), error in zip(entries, errors):
+                result.error = error
+
+            failed = len([error for error in errors if error is not None])
+
+            if failed:
+                logger.warning(
+                    '%d of %d jobs could not be added to %s', failed, len(entries), queue_name
+                )
+
+        return results
+
     def delete_job(self, job):
         self.connector.delete(job.queue_name, job.broker_id)
 
@@ -41,8 +123,99 @@ class Standard(Broker):
     def set_retry_time(self, job, retry_time):
         self.connector.set_retry_time(job.queue_name, job.broker_id, retry_time)
 
-    def jobs(self, queue_name, timeout=20):
-        while True:
-            payload = self.connector.dequeue(queue_name, wait_time=timeout)
-            if payload or not timeout:
-                yield payload
+    def warm_up(self, queue_names):
+        self.connector.warm_up(queue_names)
+
+    def release(self, queue_name, payloads):
+        """
+        Gives back to the queue some payloads that have been retrieved
+        but are not going to be processed by this broker
+
+        :param queue_name: the name of the queue
+        :param payloads: payloads returned by `jobs`
+        """
+        payloads = [payload for payload in payloads if payload]
+
+        if payloads:
+            self.connector.release(queue_name, payloads)
+
+    def jobs(self, queue_name, timeout=20, prefetch=1):
+        """
+        Generator of the payloads available in a queue
+
+        If `prefetch` is greater than one, messages are retrieved in batches and
+        kept in a local buffer until they are consumed. The messages that are still
+        in the buffer when the generator is closed are released to the queue.
+
+        If `timeout` is zero (non-blocking mode), it yields None when there are no
+        messages. Every empty receive makes the queue idle for up to
+        `NON_BLOCKING_MAX_BACKOFF` seconds, and None is yielded after sleeping
+        until then, so callers that loop on it don't flood the queue with empty
+        receives, nor spin.
+
+        :param queue_name: the name of the queue
+        :param timeout: long polling time (in seconds) of every receive call
+        :param prefetch: maximum number of messages retrieved in every receive call
+        """
+        poller = QueuePoller([queue_name], max_backoff=self.NON_BLOCKING_MAX_BACKOFF)
+        buffer = deque()
+
+        try:
+            while True:
+                if not buffer and (timeout or not poller.idle_time(queue_name)):
+                    buffer.extend(self._receive(queue_name, prefetch, timeout))
+                    poller.report(queue_name, len(buffer))
+
+                if buffer:
+                    yield buffer.popleft()
+                elif not timeout:
+                    time.sleep(poller.idle_time(queue_name))
+                    yield None
+        finally:
+            self.release(queue_name, buffer)
+
+    def jobs_from_queues(self, queues, timeout=20, prefetch=1, strict_priority=False):
+        """
+        Generator of the payloads available in several queues. It yields
+        (queue name, payload) tuples.
+
+        :param queues: list of queue names, or (queue name, weight) tuples
+        :param timeout: maximum long polling time (in seconds) of every receive call
+        :param prefetch: maximum number of messages retrieved in every receive call
+        :param strict_priority: consume always from the first queue with messages
+        """
+        poller = QueuePoller(
+            queues, strict_priority=strict_priority,
+            max_backoff=timeout or self.NON_BLOCKING_MAX_BACKOFF
+        )
+        queue_name, buffer = None, deque()
+
+        try:
+            while True:
+                queue_name, wait_time = poller.next_queue(timeout)
+
+                if not wait_time and poller.idle_time(queue_name):
+                    # All the queues are idle and can't be long polled, wait for the first one
+                    time.sleep(poller.idle_time(queue_name))
+
+                buffer.extend(self._receive(queue_name, prefetch, wait_time))
+                poller.report(queue_name, len(buffer))
+
+                while buffer:
+                    yield queue_name, buffer.popleft()
+        finally:
+            self.release(queue_name, buffer)
+
+    def _receive(self, queue_name, max_messages, wait_time):
+        """
+        Receives a batch of payloads, counting the receive calls that return nothing
+        """
+        payloads = self.connector.dequeue_batch(
+            queue_name, max_messages=max_messages, wait_time=wait_time
+        )
+        self.receives += 1
+
+        if not payloads:
+            self.empty_receives += 1
+
+        return payloads
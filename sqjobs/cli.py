@@ -4,18 +4,47 @@
 SQJobs - Simple Queue Jobs.
 
 Usage:
-  sqjobs <broker> worker [options] <queue_name>
+  sqjobs <broker> worker [options] <queue_name>...
+  sqjobs <broker> scheduler [options]
   sqjobs (-h | --help)
   sqjobs --version
 
 Options:
   --jobs=<module>               Python module where jobs are located [default: .jobs]
+  --prefetch=<n>                Messages retrieved (and buffered) in every receive call
+                                [default: 1]
+  --batch-acks                  Send deletions and retry time changes of messages in batches
+  --heartbeat=<seconds>         Extend the visibility of the messages of running jobs every
+                                N seconds
+  --concurrency=<n>             Number of jobs executed at the same time (in threads)
+                                [default: 1]
+  --asyncio                     Execute the jobs in an asyncio event loop (coroutine jobs run
+                                concurrently)
+  --strict-priority             With several queues, consume always from the first one with
+                                messages (by default, queues are polled using their weights:
+                                queue_name:weight)
+  --processes=<n>               Number of worker processes (forked after importing the jobs)
+                                [default: 1]
+  --max-jobs-per-child=<n>      Replace a worker process after it has processed this number of jobs
+  --max-memory-per-child=<mb>   Replace a worker process after its memory usage reaches this limit
+
+Scheduler Options:
+  --default-queue=<name>        Queue of the periodic jobs not found in --jobs [default: sqjobs]
+
+  The scheduler adds the periodic jobs of the djsqjobs Django app, so the
+  DJANGO_SETTINGS_MODULE environment variable must be set.
 
 AWS SQS Options:
   --aws-access-key=<ak>         Access key to access SQS
   --aws-secret-key=<sk>         Secret key to access SQS
   --aws-region-name=<region>    AWS Region [default: us-west-1]
 
+SQLite Options:
+  --sqlite-path=<path>          Database file of the queues (created if it doesn't exist)
+
+Redis Options:
+  --redis-url=<url>             URL of the Redis server, like redis://localhost:6379/0
+
 Utils:
   --sentry-dsn=<sentry_dsn>     Sentry DSN to report exceptions (raven must be installed)
 
@@ -32,13 +61,30 @@ from docopt import docopt
 
 from .contrib.sentry import create_raven_client, register_sentry
 from .metadata import __version__
-from .utils import create_sqs_worker, get_jobs_from_module
+from .supervisor import Supervisor
+from .utils import (
+    create_redis_broker, create_redis_worker, create_sqlite_broker, create_sqlite_worker,
+    create_sqs_broker, create_sqs_worker, get_jobs_from_module
+)
+from .worker import Worker
 
 import logging
 logger = logging.getLogger('sqjobs.cli')
 
 
 def get_worker_config(broker, arguments):
+    if broker == 'sqlite':
+        if not arguments['--sqlite-path']:
+            raise ValueError('--sqlite-path is mandatory for SQLite')
+
+        return {'path': arguments['--sqlite-path']}
+
+    if broker == 'redis':
+        if not arguments['--redis-url']:
+            raise ValueError('--redis-url is mandatory for Redis')
+
+        return {'url': arguments['--redis-url']}
+
     if broker != 'sqs':
         raise ValueError('Unknown broker: %s' % broker)
 
@@ -54,6 +100,63 @@ def get_worker_config(broker, arguments):
     return config
 
 
+def get_queues(arguments):
+    """
+    Queues of the worker, as a list of names or (name, weight) tuples
+    """
+    queues = []
+
+    for queue in arguments['<queue_name>']:
+        name, _, weight = queue.partition(':')
+        queues.append((name, int(weight)) if weight else name)
+
+    return queues
+
+
+def get_worker_options(arguments):
+    return {
+        'prefetch': int(arguments['--prefetch']),
+        'batch_acks': arguments['--batch-acks'],
+        'concurrency': int(arguments['--concurrency']),
+        'max_jobs': int_or_none(arguments['--max-jobs-per-child']),
+        'max_memory': int_or_none(arguments['--max-memory-per-child']),
+        'strict_priority': arguments['--strict-priority'],
+        'heartbeat': int_or_none(arguments['--heartbeat']),
+    }
+
+
+def get_worker_class(arguments):
+    if arguments['--asyncio']:
+        from .aio import AsyncWorker  # Python 3.5+ only
+        return AsyncWorker
+
+    return Worker
+
+
+def int_or_none(value):
+    return int(value) if value is not None else None
+
+
+def run_scheduler(worker_config, jobs, arguments):
+    import django
+    django.setup()
+
+    from .contrib.django.djsqjobs.scheduler import Scheduler  # It needs the Django models
+
+    if arguments['<broker>'] == 'sqlite':
+        broker = create_sqlite_broker(worker_config['path'])
+    elif arguments['<broker>'] == 'redis':
+        broker = create_redis_broker(worker_config['url'])
+    else:
+        broker = create_sqs_broker(
+            access_key=worker_config['access_key'],
+            secret_key=worker_config['secret_key'],
+            region_name=worker_config['region_name'],
+        )
+
+    Scheduler(broker, jobs=jobs, default_queue_name=arguments['--default-queue']).run()
+
+
 def config_logger(arguments):
     logging.basicConfig(
         format='[%(asctime)s][%(name)s] %(message)s',
@@ -66,27 +169,50 @@ def main():
     arguments = docopt(__doc__, version=__version__)
     config_logger(arguments)
 
-    queue_name = arguments['<queue_name>']
+    queues = get_queues(arguments)
     worker_config = get_worker_config(arguments['<broker>'], arguments)
 
-    worker = create_sqs_worker(
-        queue_name=queue_name,
-        **worker_config
-    )
+    worker_config.update(get_worker_options(arguments))
+    worker_config['worker_class'] = get_worker_class(arguments)
 
     # Add the CWD to the python path
     sys.path.append(os.getcwd())
 
-    for job in get_jobs_from_module(arguments['--jobs']):
-        worker.register_job(job)
+    # Jobs are imported before forking any worker, so they are shared between them
+    jobs = get_jobs_from_module(arguments['--jobs'])
+
+    if arguments['scheduler']:
+        run_scheduler(worker_config, jobs, arguments)
+        return
+
+    factory = {
+        'sqlite': create_sqlite_worker,
+        'redis': create_redis_worker,
+    }.get(arguments['<broker>'], create_sqs_worker)
+
+    def create_worker():
+        worker = factory(
+            queue_name=queues,
+            **worker_config
+        )
+
+        for job in jobs:
+            worker.register_job(job)
+
+        logger.info('%d jobs registered', len(worker.registered_jobs))
+
+        if arguments['--sentry-dsn']:
+            raven_client = create_raven_client(arguments['--sentry-dsn'])
+            register_sentry(raven_client, worker)
 
-    logger.info('%d jobs registered', len(worker.registered_jobs))
+        return worker
 
-    if arguments['--sentry-dsn']:
-        raven_client = create_raven_client(arguments['--sentry-dsn'])
-        register_sentry(raven_client, worker)
+    processes = int(arguments['--processes'])
 
-    worker.run()
+    if processes > 1 or worker_config['max_jobs'] or worker_config['max_memory']:
+        Supervisor(create_worker, processes).run()
+    else:
+        create_worker().run()
 
 
 if __name__ == '__main__':
@@ -1,6 +1,9 @@
 from abc import ABCMeta, abstractmethod
 from six import add_metaclass
 
+import logging
+logger = logging.getLogger('sqjobs.connector')
+
 
 @add_metaclass(ABCMeta)
 class Connector(object):
@@ -11,13 +14,35 @@ class Connector(object):
     @abstractmethod
     def enqueue(self, queue_name, payload):
         """
-        Sends a new message to a queue
+        Sends a new message to a queue. If the payload has an `eta` (a
+        timestamp), the message must not be received before that time.
 
         :param queue_name: the name of the queue
         :param payload: the payload to send inside the message
         """
         raise NotImplementedError
 
+    def enqueue_batch(self, queue_name, payloads):
+        """
+        Sends several messages to a queue. By default it just calls `enqueue` once per
+        message, connectors that support batch sends should overwrite it.
+
+        :param queue_name: the name of the queue
+        :param payloads: list of payloads to send
+        :return: list with one element per payload: None if it was sent or an error message
+        """
+        errors = []
+
+        for payload in payloads:
+            try:
+                self.enqueue(queue_name, payload)
+                errors.append(None)
+            except Exception as e:
+                logger.exception('Error sending message to queue %s', queue_name)
+                errors.append(str(e) or type(e).__name__)
+
+        return errors
+
     @abstractmethod
     def dequeue(self, queue_name, wait_time=20):
         """
@@ -29,6 +54,32 @@ class Connector(object):
         """
         raise NotImplementedError
 
+    def dequeue_batch(self, queue_name, max_messages=10, wait_time=20):
+        """
+        Receives up to `max_messages` messages from a queue in a single call. It
+        returns an empty list if no message is retrieved in `wait_time` seconds.
+        By default it just falls back to `dequeue` (so it blocks until a message
+        is retrieved), connectors that support batch receives should overwrite it.
+
+        :param queue_name: the queue name
+        :param max_messages: maximum number of messages to retrieve
+        :param wait_time: how much time to wait until a new message is retrieved (long polling).
+         If set to zero, connection will return inmediately if no messages exist.
+        """
+        payload = self.dequeue(queue_name, wait_time=wait_time)
+        return [payload] if payload else []
+
+    def release(self, queue_name, payloads):
+        """
+        Gives back to the queue some messages that have been retrieved but
+        not processed, so they can be consumed again as soon as possible
+
+        :param queue_name: the name of the queue
+        :param payloads: the payloads returned by `dequeue`/`dequeue_batch`
+        """
+        for payload in payloads:
+            self.set_retry_time(queue_name, payload['_metadata']['id'], 0)
+
     @abstractmethod
     def delete(self, queue_name, message_id):
         """
@@ -50,6 +101,56 @@ class Connector(object):
         """
         raise NotImplementedError
 
+    def delete_batch(self, queue_name, message_ids):
+        """
+        Deletes several messages from a queue. By default it just calls `delete`
+        once per message, connectors that support batch deletes should overwrite it.
+
+        :param queue_name: the name of the queue
+        :param message_ids: list of message ids
+        :return: list of the message ids that could not be deleted
+        """
+        failed = []
+
+        for message_id in message_ids:
+            try:
+                self.delete(queue_name, message_id)
+            except Exception:
+                logger.exception('Error deleting message from queue %s', queue_name)
+                failed.append(message_id)
+
+        return failed
+
+    def set_retry_time_batch(self, queue_name, entries):
+        """
+        Changes the retry time of several messages of a queue. By default it just calls
+        `set_retry_time` once per message, connectors that support batch changes
+        should overwrite it.
+
+        :param queue_name: the name of the queue
+        :param entries: list of (message_id, delay) tuples
+        :return: list of the entries that could not be changed
+        """
+        failed = []
+
+        for message_id, delay in entries:
+            try:
+                self.set_retry_time(queue_name, message_id, delay)
+            except Exception:
+                logger.exception('Error changing retry time of a message from queue %s', queue_name)
+                failed.append((message_id, delay))
+
+        return failed
+
+    def warm_up(self, queue_names):
+        """
+        Prepares the connector to work with some queues (resolving them,
+        opening connections...) before the first message is processed
+
+        :param queue_names: list of queue names
+        """
+        pass
+
     @abstractmethod
     def serialize_job(self, job_class, job_id, args, kwargs):
         """
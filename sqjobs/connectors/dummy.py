@@ -1,3 +1,7 @@
+import heapq
+import itertools
+import time
+
 from .base import Connector
 
 
@@ -8,6 +12,7 @@ class Dummy(Connector):
 
     def __init__(self):
         self.jobs = {}
+        self.delayed_jobs = {}  # queue name -> heap of (eta, sequence, payload)
         self.deleted_jobs = {}
         self.retried_jobs = {}
 
@@ -15,11 +20,28 @@ class Dummy(Connector):
         self.num_deleted_jobs = 0
         self.num_retried_jobs = 0
 
+        self._sequence = itertools.count()
+
     def enqueue(self, queue_name, payload):
-        self._get_queue(queue_name).append(payload)
+        eta = payload.get('eta')
         self.num_jobs += 1
 
+        if eta and eta > time.time():
+            heapq.heappush(
+                self.delayed_jobs.setdefault(queue_name, []), (eta, next(self._sequence), payload)
+            )
+            return
+
+        self._get_queue(queue_name).append(payload)
+
+    def enqueue_batch(self, queue_name, payloads):
+        for payload in payloads:
+            self.enqueue(queue_name, payload)
+
+        return [None] * len(payloads)
+
     def dequeue(self, queue_name, wait_time=20):
+        self._schedule_due_jobs(queue_name)
         job = None
 
         try:
@@ -30,6 +52,24 @@ class Dummy(Connector):
 
         return job
 
+    def dequeue_batch(self, queue_name, max_messages=10, wait_time=20):
+        jobs = []
+
+        while len(jobs) < max_messages:
+            job = self.dequeue(queue_name, wait_time)
+
+            if job is None:
+                break
+
+            jobs.append(job)
+
+        return jobs
+
+    def release(self, queue_name, payloads):
+        # Push them back in reverse order, so they are dequeued in the same order
+        for payload in reversed(payloads):
+            self.enqueue(queue_name, payload)
+
     def delete(self, queue_name, message_id):
         self.deleted_jobs.setdefault(queue_name, []).append(message_id)
         self.num_deleted_jobs += 1
@@ -59,5 +99,16 @@ class Dummy(Connector):
 
         return job, args, kwargs
 
+    def _schedule_due_jobs(self, queue_name):
+        """
+        Moves the delayed jobs whose eta has been reached to the queue
+        """
+        delayed = self.delayed_jobs.get(queue_name, [])
+        now = time.time()
+
+        while delayed and delayed[0][0] <= now:
+            _, _, payload = heapq.heappop(delayed)
+            self._get_queue(queue_name).append(payload)
+
     def _get_queue(self, name):
         return self.jobs.setdefault(name, [])
@@ -0,0 +1,367 @@
+import copy
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from multiprocessing.managers import BaseManager
+from pytz import timezone
+
+from .base import Connector
+
+import logging
+logger = logging.getLogger('sqjobs.memory')
+
+
+class Memory(Connector):
+    """
+    Manages queues stored in the memory of the process, to be shared by the
+    threads that produce and consume jobs. See `SharedMemory` to share them
+    between processes.
+
+    Messages are received in order (FIFO) and, like SQS, received messages
+    are invisible for `visibility_timeout` seconds: if they are not deleted
+    in that time, they are received again. Consumers waiting for messages
+    sleep on a condition variable until they are added (or become visible).
+    """
+    DEFAULT_VISIBILITY_TIMEOUT = 30  # seconds
+
+    def __init__(self, visibility_timeout=None):
+        """
+        Creates a new memory connector
+
+        :param visibility_timeout: time (in seconds) that received messages are invisible
+        """
+        self.visibility_timeout = visibility_timeout or self.DEFAULT_VISIBILITY_TIMEOUT
+
+        self._queues = {}  # queue name -> MemoryQueue
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def __repr__(self):
+        return 'Memory()'
+
+    def enqueue(self, queue_name, payload):
+        self.enqueue_batch(queue_name, [payload])
+
+    def enqueue_batch(self, queue_name, payloads):
+        now = time.time()
+
+        with self._condition:
+            queue = self._queue(queue_name)
+
+            for payload in payloads:
+                eta = payload.get('eta') if isinstance(payload, dict) else None
+                message = Message(next(self._sequence), copy.deepcopy(payload), now)
+
+                queue.messages[message.id] = message
+
+                if eta and eta > now:
+                    queue.schedule(message, eta)
+                else:
+                    queue.ready.append(message.id)
+
+            self._condition.notify_all()
+
+        logger.debug('Sent %d new messages to %s', len(payloads), queue_name)
+
+        return [None] * len(payloads)
+
+    def dequeue(self, queue_name, wait_time=20):
+        payloads = None
+
+        while not payloads:
+            payloads = self.dequeue_batch(queue_name, max_messages=1, wait_time=wait_time)
+
+            if not payloads and wait_time == 0:
+                return None  # Non-blocking mode
+
+        return payloads[0]
+
+    def dequeue_batch(self, queue_name, max_messages=10, wait_time=20):
+        return self.receive(queue_name, max_messages, wait_time, self.visibility_timeout)
+
+    def receive(self, queue_name, max_messages, wait_time, visibility_timeout):
+        """
+        Receives up to `max_messages` messages, making them invisible for
+        `visibility_timeout` seconds, and waits up to `wait_time` seconds for them
+        """
+        deadline = time.time() + wait_time
+
+        with self._condition:
+            queue = self._queue(queue_name)
+
+            while True:
+                now = time.time()
+                next_visible_at = queue.schedule_due(now)
+                payloads = queue.receive(max_messages, now + visibility_timeout)
+
+                if payloads or now >= deadline:
+                    return payloads
+
+                self._condition.wait(min(deadline, next_visible_at or deadline) - now)
+
+    def release(self, queue_name, payloads):
+        self.set_retry_time_batch(
+            queue_name, [(payload['_metadata']['id'], 0) for payload in payloads]
+        )
+
+    def delete(self, queue_name, message_id):
+        self.delete_batch(queue_name, [message_id])
+
+    def set_retry_time(self, queue_name, message_id, delay):
+        self.set_retry_time_batch(queue_name, [(message_id, delay)])
+
+    def delete_batch(self, queue_name, message_ids):
+        failed = []
+
+        with self._condition:
+            queue = self._queue(queue_name)
+
+            for message_id in message_ids:
+                message = queue.received(message_id)
+
+                if message is None:  # Received again by others, or already deleted
+                    failed.append(message_id)
+                    continue
+
+                del queue.messages[message.id]
+
+        return failed
+
+    def set_retry_time_batch(self, queue_name, entries):
+        failed = []
+        now = time.time()
+
+        with self._condition:
+            queue = self._queue(queue_name)
+
+            for message_id, delay in entries:
+                message = queue.received(message_id)
+
+                if message is None:
+                    failed.append((message_id, delay))
+                    continue
+
+                queue.schedule(message, now + (delay or 0))
+
+            self._condition.notify_all()
+
+        return failed
+
+    def serialize_job(self, job_name, job_id, args, kwargs):
+        return {
+            'id': job_id,
+            'name': job_name,
+            'args': args,
+            'kwargs': kwargs
+        }
+
+    def unserialize_job(self, job_class, queue_name, payload):
+        job = job_class()
+
+        job.id = payload['id']
+        job.queue_name = queue_name
+        job.broker_id = payload['_metadata']['id']
+        job.retries = payload['_metadata']['retries']
+        job.created_on = payload['_metadata']['created_on']
+        args = list(payload['args'] or [])
+        kwargs = payload['kwargs'] or {}
+
+        return job, args, kwargs
+
+    def _queue(self, queue_name):
+        if queue_name not in self._queues:
+            self._queues[queue_name] = MemoryQueue()
+
+        return self._queues[queue_name]
+
+
+class Message(object):
+
+    def __init__(self, id, payload, created_at):
+        self.id = id
+        self.payload = payload
+        self.created_at = created_at
+        self.receipt = None
+        self.receive_count = 0
+        self.visible_at = None  # When a delayed or received message becomes visible
+
+
+class MemoryQueue(object):
+    """
+    Messages of a queue: the ready ones (in order) and the delayed or
+    received ones, in a heap by the time when they become visible
+    """
+
+    def __init__(self):
+        self.messages = {}  # message id -> Message
+        self.ready = deque()  # message ids
+        self.invisible = []  # heap of (visible at, message id)
+
+    def schedule(self, message, visible_at):
+        message.visible_at = visible_at
+        heapq.heappush(self.invisible, (visible_at, message.id))
+
+    def schedule_due(self, now):
+        """
+        Makes ready the messages that have become visible
+
+        :return: when the next invisible message becomes visible (None if there isn't any)
+        """
+        while self.invisible and self.invisible[0][0] <= now:
+            visible_at, message_id = heapq.heappop(self.invisible)
+            message = self.messages.get(message_id)
+
+            # Not deleted or rescheduled
+            if message is not None and message.visible_at == visible_at:
+                message.receipt = message.visible_at = None
+                self.ready.append(message_id)
+
+        return self.invisible[0][0] if self.invisible else None
+
+    def receive(self, max_messages, visible_at):
+        payloads = []
+        receipt = uuid.uuid4().hex
+
+        while self.ready and len(payloads) < max_messages:
+            message = self.messages.get(self.ready.popleft())
+
+            if message is None:
+                continue
+
+            message.receipt = receipt
+            message.receive_count += 1
+            self.schedule(message, visible_at)
+
+            # Received payloads can't change the queued ones
+            payload = copy.deepcopy(message.payload)
+            payload['_metadata'] = {
+                'id': '{id}:{receipt}'.format(id=message.id, receipt=receipt),
+                'retries': message.receive_count,
+                'created_on': datetime.fromtimestamp(message.created_at, tz=timezone('UTC')),
+            }
+            payloads.append(payload)
+
+        return payloads
+
+    def received(self, message_id):
+        """
+        Returns the message of a message id, if its receipt is still valid
+        """
+        id, _, receipt = message_id.partition(':')
+        message = self.messages.get(int(id))
+
+        return message if message is not None and message.receipt == receipt else None
+
+
+class MemoryManager(BaseManager):
+    """
+    Server process that keeps the memory queues shared by `SharedMemory` connectors
+    """
+
+
+MemoryManager.register('Memory', Memory, exposed=[
+    'enqueue_batch', 'receive', 'delete_batch', 'set_retry_time_batch',
+])
+
+
+class SharedMemory(Connector):
+    """
+    Manages memory queues shared by several processes. They are kept in a
+    `Memory` connector that lives in a server process (started when it's
+    created), and used through a proxy.
+
+    The connector must be created before forking (or passed to the processes
+    started with `multiprocessing`), so all of them use the same queues. The
+    server process is shut down when the connector that started it is closed.
+    """
+
+    def __init__(self, visibility_timeout=None):
+        """
+        Creates a new shared memory connector, starting its server process
+
+        :param visibility_timeout: time (in seconds) that received messages are invisible
+        """
+        self.visibility_timeout = visibility_timeout or Memory.DEFAULT_VISIBILITY_TIMEOUT
+
+        self.manager = MemoryManager()
+        self.manager.start()
+        self.queues = self.manager.Memory()
+
+    def __repr__(self):
+        return 'SharedMemory()'
+
+    def __getstate__(self):
+        return {
+            'visibility_timeout': self.visibility_timeout,
+            'queues': self.queues,
+            'manager': None,  # Only the process that started it can shut it down
+        }
+
+    def close(self):
+        """
+        Shuts down the server process, if it was started by this connector
+        """
+        if self.manager is not None:
+            self.manager.shutdown()
+
+    def enqueue(self, queue_name, payload):
+        self.queues.enqueue_batch(queue_name, [payload])
+
+    def enqueue_batch(self, queue_name, payloads):
+        return self.queues.enqueue_batch(queue_name, payloads)
+
+    def dequeue(self, queue_name, wait_time=20):
+        payloads = None
+
+        while not payloads:
+            payloads = self.dequeue_batch(queue_name, max_messages=1, wait_time=wait_time)
+
+            if not payloads and wait_time == 0:
+                return None  # Non-blocking mode
+
+        return payloads[0]
+
+    def dequeue_batch(self, queue_name, max_messages=10, wait_time=20):
+        return self.queues.receive(queue_name, max_messages, wait_time, self.visibility_timeout)
+
+    def release(self, queue_name, payloads):
+        self.queues.set_retry_time_batch(
+            queue_name, [(payload['_metadata']['id'], 0) for payload in payloads]
+        )
+
+    def delete(self, queue_name, message_id):
+        self.queues.delete_batch(queue_name, [message_id])
+
+    def set_retry_time(self, queue_name, message_id, delay):
+        self.queues.set_retry_time_batch(queue_name, [(message_id, delay)])
+
+    def delete_batch(self, queue_name, message_ids):
+        return self.queues.delete_batch(queue_name, message_ids)
+
+    def set_retry_time_batch(self, queue_name, entries):
+        return self.queues.set_retry_time_batch(queue_name, entries)
+
+    def serialize_job(self, job_name, job_id, args, kwargs):
+        return {
+            'id': job_id,
+            'name': job_name,
+            'args': args,
+            'kwargs': kwargs
+        }
+
+    def unserialize_job(self, job_class, queue_name, payload):
+        job = job_class()
+
+        job.id = payload['id']
+        job.queue_name = queue_name
+        job.broker_id = payload['_metadata']['id']
+        job.retries = payload['_metadata']['retries']
+        job.created_on = payload['_metadata']['created_on']
+        args = list(payload['args'] or [])
+        kwargs = payload['kwargs'] or {}
+
+        return job, args, kwargs
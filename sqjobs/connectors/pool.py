@@ -0,0 +1,158 @@
+import os
+import threading
+
+import boto3
+import botocore
+from botocore.config import Config
+
+import logging
+logger = logging.getLogger('sqjobs.pool')
+
+
+_connections = threading.local()  # connection key -> boto3 resource, in every thread
+_pid = os.getpid()
+_lock = threading.Lock()
+
+
+def get_connection(service_name, region_name, access_key, secret_key, endpoint_url=None,
+                   **options):
+    """
+    Returns a boto3 resource shared by all the connectors of the thread with the
+    same parameters, so sessions, credentials and HTTP connections are reused.
+    boto3 resources are not thread-safe, so every thread has its own ones.
+
+    :param service_name: name of the AWS service, like 'sqs'
+    :param region_name: a region name, like 'us-east-1'
+    :param access_key: AWS access key
+    :param secret_key: AWS secret key
+    :param endpoint_url: URL to use a custom region
+    :param options: options of the connection (see `build_config`)
+    """
+    global _pid
+
+    key = (
+        service_name, region_name, endpoint_url, access_key, secret_key,
+        tuple(sorted(options.items())),
+    )
+
+    with _lock:
+        if _pid != os.getpid():  # HTTP connections can't be shared with the parent process
+            _connections.__dict__.clear()
+            _pid = os.getpid()
+
+    connections = _connections.__dict__.setdefault('resources', {})
+
+    if key not in connections:
+        connections[key] = create_connection(
+            service_name, region_name, access_key, secret_key, endpoint_url, **options
+        )
+
+    return connections[key]
+
+
+def create_connection(service_name, region_name, access_key, secret_key, endpoint_url=None,
+                      **options):
+    """
+    Creates a new (not shared) boto3 resource, with its own session (the default
+    session of boto3 is not thread-safe). The parameters are the same as `get_connection`.
+    """
+    config = {
+        'service_name': service_name,
+        'region_name': region_name,
+        'aws_access_key_id': access_key,
+        'aws_secret_access_key': secret_key,
+    }
+
+    if endpoint_url:
+        config['endpoint_url'] = endpoint_url
+
+    if options:
+        config['config'] = build_config(**options)
+
+    with _lock:
+        connection = boto3.session.Session().resource(**config)
+
+    logger.debug('Created a new connection to %s (%s)', service_name, region_name)
+
+    return connection
+
+
+def clear_connections():
+    """
+    Forgets the shared connections of the thread
+    """
+    _connections.__dict__.clear()
+
+
+def build_config(max_pool_connections=None, tcp_keepalive=None, retry_mode=None, max_attempts=None,
+                 connect_timeout=None, read_timeout=None):
+    """
+    Builds the botocore configuration of a connection. Options not given
+    keep their botocore default values, and options not supported by the
+    installed version of botocore are left out (with a warning).
+
+    :param max_pool_connections: maximum number of HTTP connections kept in the pool.
+     It should be at least the number of threads that use the connection.
+    :param tcp_keepalive: enable TCP keep-alive in the HTTP connections
+    :param retry_mode: botocore retry mode ('legacy', 'standard' or 'adaptive')
+    :param max_attempts: maximum number of attempts of every request
+    :param connect_timeout: time (in seconds) to wait for a connection to be established
+    :param read_timeout: time (in seconds) to wait for a response. It must be bigger
+     than the long polling time used to retrieve messages.
+    """
+    supported = supported_options()
+    config = {}
+    retries = {}
+
+    options = [
+        ('max_pool_connections', max_pool_connections),
+        ('tcp_keepalive', tcp_keepalive),
+        ('connect_timeout', connect_timeout),
+        ('read_timeout', read_timeout),
+        ('retry_mode', retry_mode),
+        ('max_attempts', max_attempts),
+    ]
+
+    for name, value in options:
+        if value is None:
+            continue
+
+        if name not in supported:
+            logger.warning(
+                'Option %s is not supported by botocore %s, ignoring it', name, botocore.__version__
+            )
+            continue
+
+        if name == 'retry_mode':
+            retries['mode'] = value
+        elif name == 'max_attempts':
+            retries['max_attempts'] = value
+        else:
+            config[name] = value
+
+    if retries:
+        config['retries'] = retries
+
+    return Config(**config)
+
+
+def supported_options():
+    """
+    Returns the options of `build_config` supported by the installed version of botocore
+    """
+    supported = set(getattr(Config, 'OPTION_DEFAULTS', ()))
+    options = supported & set([
+        'max_pool_connections', 'tcp_keepalive', 'connect_timeout', 'read_timeout'
+    ])
+
+    if 'retries' in supported:
+        options.add('max_attempts')
+
+        if botocore_version() >= (1, 15):  # Retry modes were added in botocore 1.15.0
+            options.add('retry_mode')
+
+    return options
+
+
+def botocore_version():
+    return tuple(int(part) for part in botocore.__version__.split('.')[:2])
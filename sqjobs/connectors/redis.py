@@ -0,0 +1,350 @@
+from __future__ import absolute_import
+
+import json
+import time
+import uuid
+from datetime import datetime
+from pytz import timezone
+
+import six
+
+from .base import Connector
+from ..serializers import Codec
+
+import logging
+logger = logging.getLogger('sqjobs.redis')
+
+
+# Moves the due delayed messages and the messages whose visibility timeout has
+# expired to the ready list, and claims up to ARGV[2] messages from it
+RECEIVE_SCRIPT = """
+local ready, delayed, inflight = KEYS[1], KEYS[2], KEYS[3]
+local messages, receipts, receives = KEYS[4], KEYS[5], KEYS[6]
+local now, limit, deadline, receipt = tonumber(ARGV[1]), tonumber(ARGV[2]), ARGV[3], ARGV[4]
+
+local due = redis.call('ZRANGEBYSCORE', delayed, '-inf', now, 'LIMIT', 0, 1000)
+
+for _, id in ipairs(due) do
+    redis.call('ZREM', delayed, id)
+    redis.call('LPUSH', ready, id)
+end
+
+-- Released and expired messages are received before the new ones
+local expired = redis.call('ZRANGEBYSCORE', inflight, '-inf', now, 'LIMIT', 0, 1000)
+
+for i = #expired, 1, -1 do
+    redis.call('ZREM', inflight, expired[i])
+    redis.call('HDEL', receipts, expired[i])
+    redis.call('RPUSH', ready, expired[i])
+end
+
+local received = {}
+
+while #received < limit * 3 do
+    local id = redis.call('RPOP', ready)
+
+    if not id then
+        break
+    end
+
+    local message = redis.call('HGET', messages, id)
+
+    if message then
+        redis.call('ZADD', inflight, deadline, id)
+        redis.call('HSET', receipts, id, receipt)
+        local count = redis.call('HINCRBY', receives, id, 1)
+
+        table.insert(received, id)
+        table.insert(received, message)
+        table.insert(received, count)
+    end
+end
+
+return received
+"""
+
+# Deletes the messages of the (id, receipt) pairs of ARGV whose receipt is still valid,
+# returning the positions (starting at 0) of the ones that could not be deleted
+DELETE_SCRIPT = """
+local inflight, messages, receipts, receives = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local failed = {}
+
+for i = 1, #ARGV, 2 do
+    local id, receipt = ARGV[i], ARGV[i + 1]
+
+    if redis.call('HGET', receipts, id) == receipt then
+        redis.call('ZREM', inflight, id)
+        redis.call('HDEL', messages, id)
+        redis.call('HDEL', receipts, id)
+        redis.call('HDEL', receives, id)
+    else
+        table.insert(failed, math.floor((i - 1) / 2))
+    end
+end
+
+return failed
+"""
+
+# Changes the visibility deadline of the messages of the (id, receipt, deadline)
+# triplets of ARGV whose receipt is still valid, returning the positions of the other ones
+SET_VISIBILITY_SCRIPT = """
+local inflight, receipts = KEYS[1], KEYS[2]
+local failed = {}
+
+for i = 1, #ARGV, 3 do
+    local id, receipt, deadline = ARGV[i], ARGV[i + 1], ARGV[i + 2]
+
+    if redis.call('HGET', receipts, id) == receipt then
+        redis.call('ZADD', inflight, deadline, id)
+    else
+        table.insert(failed, math.floor((i - 1) / 3))
+    end
+end
+
+return failed
+"""
+
+
+class Redis(Connector):
+    """
+    Manages queues stored in Redis (or any server that speaks its protocol),
+    with the semantics of SQS: received messages are invisible for
+    `visibility_timeout` seconds, and if they are not deleted in that time,
+    they can be received again.
+
+    Every queue is a list of ready messages, a sorted set of delayed messages,
+    a sorted set of received (in flight) messages by visibility deadline and
+    some hashes with their bodies, receipts and receive counts. Messages are
+    received, deleted and retried atomically with Lua scripts, and consumers
+    waiting for messages are woken up by the producers (with a signal list),
+    so new messages are received right away.
+    """
+    DEFAULT_VISIBILITY_TIMEOUT = 30  # seconds
+    DEFAULT_MAX_WAIT = 1  # seconds
+    MAX_SIGNALS = 1000  # pending wake-ups per queue
+
+    def __init__(self, client, prefix='sqjobs:', visibility_timeout=None, max_wait=None,
+                 codec=None):
+        """
+        Creates a new Redis connector
+
+        :param client: a Redis client (like `redis.StrictRedis`). Blocking waits
+         with timeouts smaller than a second need Redis 6 or newer.
+        :param prefix: prefix of the keys of the queues
+        :param visibility_timeout: time (in seconds) that received messages are invisible
+        :param max_wait: maximum time (in seconds) that consumers wait for a signal
+         before looking again for delayed and expired messages
+        :param codec: `Codec` used to encode the messages (plain JSON by default)
+        """
+        self.client = client
+        self.prefix = prefix
+        self.visibility_timeout = visibility_timeout or self.DEFAULT_VISIBILITY_TIMEOUT
+        self.max_wait = max_wait or self.DEFAULT_MAX_WAIT
+        self.codec = codec or Codec(base64=False)
+
+        self._receive_script = client.register_script(RECEIVE_SCRIPT)
+        self._delete_script = client.register_script(DELETE_SCRIPT)
+        self._set_visibility_script = client.register_script(SET_VISIBILITY_SCRIPT)
+
+    def __repr__(self):
+        return 'Redis("{prefix}")'.format(prefix=self.prefix)
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        """
+        Creates a new Redis connector connected to `url`, like 'redis://localhost:6379/0'
+        (the redis package must be installed)
+        """
+        import redis
+
+        return cls(redis.StrictRedis.from_url(url), **kwargs)
+
+    def enqueue(self, queue_name, payload):
+        self.enqueue_batch(queue_name, [payload])
+
+    def enqueue_batch(self, queue_name, payloads):
+        now = time.time()
+        pipeline = self.client.pipeline(transaction=True)
+
+        for payload in payloads:
+            message_id = uuid.uuid4().hex
+            body, tag = self.codec.encode(payload)
+            eta = payload.get('eta') if isinstance(payload, dict) else None
+
+            pipeline.hset(
+                self._key(queue_name, 'messages'), message_id, json.dumps([body, tag, now])
+            )
+
+            if eta and eta > now:
+                pipeline.zadd(self._key(queue_name, 'delayed'), {message_id: eta})
+            else:
+                pipeline.lpush(self._key(queue_name, 'ready'), message_id)
+
+        signal = self._key(queue_name, 'signal')
+        pipeline.lpush(signal, *['1'] * len(payloads))
+        pipeline.ltrim(signal, 0, self.MAX_SIGNALS - 1)
+        pipeline.execute()
+
+        logger.info('Sent %d new messages to %s', len(payloads), queue_name)
+
+        return [None] * len(payloads)
+
+    def dequeue(self, queue_name, wait_time=20):
+        payloads = None
+
+        while not payloads:
+            payloads = self.dequeue_batch(queue_name, max_messages=1, wait_time=wait_time)
+
+            if not payloads and wait_time == 0:
+                return None  # Non-blocking mode
+
+        return payloads[0]
+
+    def dequeue_batch(self, queue_name, max_messages=10, wait_time=20):
+        deadline = time.time() + wait_time
+
+        while True:
+            payloads = self._receive(queue_name, max_messages)
+
+            if payloads:
+                logger.info('%d new messages retrieved from %s', len(payloads), queue_name)
+                return payloads
+
+            remaining = deadline - time.time()
+
+            if remaining <= 0:
+                logger.debug('No message retrieved from %s', queue_name)
+                return []
+
+            self.client.brpop(
+                [self._key(queue_name, 'signal')], timeout=min(remaining, self.max_wait)
+            )
+
+    def release(self, queue_name, payloads):
+        self.set_retry_time_batch(
+            queue_name, [(payload['_metadata']['id'], 0) for payload in payloads]
+        )
+
+        logger.info('Released %d messages to queue %s', len(payloads), queue_name)
+
+    def delete(self, queue_name, message_id):
+        self.delete_batch(queue_name, [message_id])
+
+    def set_retry_time(self, queue_name, message_id, delay):
+        self.set_retry_time_batch(queue_name, [(message_id, delay)])
+
+    def delete_batch(self, queue_name, message_ids):
+        if not message_ids:
+            return []
+
+        args = []
+
+        for message_id in message_ids:
+            args.extend(parse_message_id(message_id))
+
+        failed = [message_ids[int(position)] for position in self._delete_script(
+            keys=[
+                self._key(queue_name, name)
+                for name in ('inflight', 'messages', 'receipts', 'receives')
+            ],
+            args=args,
+        )]
+
+        logger.info('Deleted %d messages from queue %s', len(message_ids) - len(failed), queue_name)
+
+        return failed
+
+    def set_retry_time_batch(self, queue_name, entries):
+        if not entries:
+            return []
+
+        now = time.time()
+        args = []
+
+        for message_id, delay in entries:
+            args.extend(parse_message_id(message_id) + (now + (delay or 0),))
+
+        failed = [entries[int(position)] for position in self._set_visibility_script(
+            keys=[self._key(queue_name, 'inflight'), self._key(queue_name, 'receipts')],
+            args=args,
+        )]
+
+        logger.info(
+            'Changed retry time of %d messages from queue %s',
+            len(entries) - len(failed), queue_name
+        )
+
+        return failed
+
+    def warm_up(self, queue_names):
+        self.client.ping()
+
+    def serialize_job(self, job_name, job_id, args, kwargs):
+        return {
+            'id': job_id,
+            'name': job_name,
+            'args': args,
+            'kwargs': kwargs
+        }
+
+    def unserialize_job(self, job_class, queue_name, payload):
+        job = job_class()
+
+        job.id = payload['id']
+        job.queue_name = queue_name
+        job.broker_id = payload['_metadata']['id']
+        job.retries = payload['_metadata']['retries']
+        job.created_on = payload['_metadata']['created_on']
+        args = payload['args'] or []
+        kwargs = payload['kwargs'] or {}
+
+        return job, args, kwargs
+
+    def _receive(self, queue_name, max_messages):
+        """
+        Claims up to `max_messages` visible messages, making them invisible
+        """
+        now = time.time()
+        receipt = uuid.uuid4().hex
+
+        received = self._receive_script(
+            keys=[
+                self._key(queue_name, name)
+                for name in ('ready', 'delayed', 'inflight', 'messages', 'receipts', 'receives')
+            ],
+            args=[now, max_messages, now + self.visibility_timeout, receipt],
+        )
+
+        return [
+            self._decode(
+                to_text(received[i]), to_text(received[i + 1]), int(received[i + 2]), receipt
+            )
+            for i in range(0, len(received), 3)
+        ]
+
+    def _decode(self, message_id, message, receive_count, receipt):
+        body, tag, created_at = json.loads(message)
+
+        payload = Codec.decode(body, tag)
+        payload['_metadata'] = {
+            'id': '{id}:{receipt}'.format(id=message_id, receipt=receipt),
+            'retries': receive_count,
+            'created_on': datetime.fromtimestamp(created_at, tz=timezone('UTC')),
+        }
+
+        return payload
+
+    def _key(self, queue_name, name):
+        return '{prefix}{queue}:{name}'.format(prefix=self.prefix, queue=queue_name, name=name)
+
+
+def parse_message_id(message_id):
+    """
+    Splits a message id (the id of the message and the receipt of the reception)
+    """
+    message_id, _, receipt = message_id.partition(':')
+    return message_id, receipt
+
+
+def to_text(value):
+    return value.decode('utf-8') if isinstance(value, six.binary_type) else value
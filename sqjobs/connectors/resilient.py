@@ -0,0 +1,393 @@
+import random
+import socket
+import threading
+import time
+
+import botocore.exceptions
+
+from .base import Connector
+from ..exceptions import CircuitOpen
+
+import logging
+logger = logging.getLogger('sqjobs.resilient')
+
+
+# Error codes of the AWS responses that mean that the request can be retried later
+TRANSIENT_ERROR_CODES = frozenset([
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'TooManyRequestsException',
+    'RequestLimitExceeded',
+    'SlowDown',
+    'ServiceUnavailable',
+    'InternalError',
+    'InternalFailure',
+    'KMS.ThrottlingException',
+])
+
+
+class Resilient(Connector):
+    """
+    Wraps a connector so throttling and outages of the broker don't turn into
+    retry storms, nor stop the workers.
+
+    Calls that fail with transient errors (see `is_transient_error`) are retried
+    with exponential backoff and full jitter. Enqueues are not retried, as their
+    messages could have been sent even if they failed, but the failed messages
+    of a batch are sent again. Calls can also be rate limited with a token
+    bucket. After `failure_threshold` consecutive failures the circuit breaker
+    opens for `reset_timeout` seconds: while it's open, producers fail fast
+    with `CircuitOpen` and consumers sleep and receive nothing. Then a single
+    call is let through, and the circuit is closed if it succeeds.
+    """
+    DEFAULT_MAX_ATTEMPTS = 4
+    DEFAULT_BASE_DELAY = 0.1  # seconds
+    DEFAULT_MAX_DELAY = 10  # seconds
+    DEFAULT_FAILURE_THRESHOLD = 5
+    DEFAULT_RESET_TIMEOUT = 30  # seconds
+
+    def __init__(self, connector, max_attempts=None, base_delay=None, max_delay=None,
+                 rate_limit=None, burst=None, failure_threshold=None, reset_timeout=None,
+                 retry_on=None):
+        """
+        Creates a new resilient connector
+
+        :param connector: the connector to wrap
+        :param max_attempts: maximum number of attempts of every call
+        :param base_delay: backoff time (in seconds) after the first failed attempt. It's
+         doubled after every failed attempt, and a random time up to it is slept.
+        :param max_delay: maximum backoff time (in seconds)
+        :param rate_limit: maximum number of calls per second to the broker (unlimited by default)
+        :param burst: maximum number of calls in a burst (the size of the bucket).
+         The rate limit by default.
+        :param failure_threshold: consecutive failed calls that open the circuit
+        :param reset_timeout: time (in seconds) that the circuit stays open
+        :param retry_on: tuple of extra exception classes that are transient errors
+        """
+        self.connector = connector
+        self.max_attempts = max_attempts or self.DEFAULT_MAX_ATTEMPTS
+        self.base_delay = base_delay or self.DEFAULT_BASE_DELAY
+        self.max_delay = max_delay or self.DEFAULT_MAX_DELAY
+        self.retry_on = tuple(retry_on or ())
+
+        self.rate_limiter = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold or self.DEFAULT_FAILURE_THRESHOLD,
+            reset_timeout or self.DEFAULT_RESET_TIMEOUT,
+        )
+
+        self._counters = dict.fromkeys(['calls', 'failures', 'retries', 'rejected'], 0)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'Resilient({connector!r})'.format(connector=self.connector)
+
+    @property
+    def metrics(self):
+        """
+        Counters of the calls to the broker and the state of the circuit breaker
+        and the rate limiter, as a dict
+        """
+        with self._lock:
+            metrics = dict(self._counters)
+
+        metrics.update(self.circuit_breaker.metrics)
+
+        if self.rate_limiter:
+            metrics.update(self.rate_limiter.metrics)
+
+        return metrics
+
+    def enqueue(self, queue_name, payload):
+        # Not retried: the message could have been sent even if the call failed
+        self._attempt('enqueue', queue_name, payload)
+
+    def enqueue_batch(self, queue_name, payloads):
+        """
+        Sends the payloads, retrying only the ones that failed. Like `enqueue`,
+        the whole call is not retried if it raises.
+        """
+        errors = list(self._attempt('enqueue_batch', queue_name, payloads))
+
+        for attempt in range(self.max_attempts - 1):
+            failed = [index for index, error in enumerate(errors) if error]
+
+            if not failed or self.circuit_breaker.is_open:
+                break
+
+            self._wait_before_retry('enqueue_batch', attempt, '%d messages failed' % len(failed))
+
+            try:
+                retried = self._attempt(
+                    'enqueue_batch', queue_name, [payloads[index] for index in failed]
+                )
+            except Exception as e:
+                logger.warning(
+                    'Error sending %d failed messages to %s again: %s', len(failed), queue_name, e
+                )
+                break
+
+            for index, error in zip(failed, retried):
+                errors[index] = error
+
+        return errors
+
+    def dequeue(self, queue_name, wait_time=20):
+        payloads = None
+
+        while not payloads:
+            payloads = self.dequeue_batch(queue_name, max_messages=1, wait_time=wait_time)
+
+            if not payloads and wait_time == 0:
+                return None  # Non-blocking mode
+
+        return payloads[0]
+
+    def dequeue_batch(self, queue_name, max_messages=10, wait_time=20):
+        try:
+            return self._call(
+                'dequeue_batch', queue_name, max_messages=max_messages, wait_time=wait_time
+            )
+        except CircuitOpen:
+            # Don't poll the broker until the circuit can be closed again
+            time.sleep(min(max(self.circuit_breaker.remaining_time(), self.base_delay), wait_time))
+        except Exception as e:
+            if not self.is_transient_error(e):
+                raise
+
+            logger.warning('Error retrieving messages from %s: %s', queue_name, e)
+
+        return []
+
+    def release(self, queue_name, payloads):
+        self._call('release', queue_name, payloads)
+
+    def delete(self, queue_name, message_id):
+        self._call('delete', queue_name, message_id)
+
+    def set_retry_time(self, queue_name, message_id, delay):
+        self._call('set_retry_time', queue_name, message_id, delay)
+
+    def delete_batch(self, queue_name, message_ids):
+        return self._call('delete_batch', queue_name, message_ids)
+
+    def set_retry_time_batch(self, queue_name, entries):
+        return self._call('set_retry_time_batch', queue_name, entries)
+
+    def warm_up(self, queue_names):
+        self._call('warm_up', queue_names)
+
+    def serialize_job(self, job_name, job_id, args, kwargs):
+        return self.connector.serialize_job(job_name, job_id, args, kwargs)
+
+    def unserialize_job(self, job_class, queue_name, payload):
+        return self.connector.unserialize_job(job_class, queue_name, payload)
+
+    def is_transient_error(self, error):
+        """
+        Checks if an error is transient (throttling, unavailability, network
+        errors...), so the call that raised it can be retried
+        """
+        if isinstance(error, botocore.exceptions.ClientError):
+            code = error.response.get('Error', {}).get('Code')
+            status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+
+            return code in TRANSIENT_ERROR_CODES or status >= 500
+
+        return isinstance(error, (
+            botocore.exceptions.HTTPClientError,
+            botocore.exceptions.ConnectionError,
+            socket.error,
+        ) + self.retry_on)
+
+    def _call(self, method, *args, **kwargs):
+        """
+        Calls a method of the wrapped connector, retrying it while it fails with
+        transient errors. It raises `CircuitOpen` if the circuit is open.
+        """
+        for attempt in range(self.max_attempts):
+            try:
+                return self._attempt(method, *args, **kwargs)
+            except Exception as e:
+                last_attempt = attempt + 1 == self.max_attempts
+
+                if not self.is_transient_error(e) or last_attempt or self.circuit_breaker.is_open:
+                    raise
+
+                self._wait_before_retry(method, attempt, e)
+
+    def _attempt(self, method, *args, **kwargs):
+        """
+        Calls a method of the wrapped connector once, through the circuit breaker
+        and the rate limiter. It raises `CircuitOpen` if the circuit is open.
+        """
+        if not self.circuit_breaker.allow():
+            self._count('rejected')
+            raise CircuitOpen('Circuit of {connector!r} is open'.format(connector=self.connector))
+
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+        try:
+            self._count('calls')
+            result = getattr(self.connector, method)(*args, **kwargs)
+        except Exception as e:
+            if self.is_transient_error(e):
+                self._count('failures')
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()  # The broker answered
+
+            raise
+
+        self.circuit_breaker.record_success()
+        return result
+
+    def _wait_before_retry(self, method, attempt, reason):
+        delay = backoff(attempt, self.base_delay, self.max_delay)
+        logger.info(
+            'Transient error calling %s (%s), retrying in %.2f seconds', method, reason, delay
+        )
+
+        self._count('retries')
+        time.sleep(delay)
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+
+class CircuitBreaker(object):
+    """
+    Counts the consecutive failed calls to a service. When they reach
+    `failure_threshold`, the circuit opens and no call is allowed for `reset_timeout`
+    seconds. Then it's half-open: a single call is allowed, that closes the
+    circuit if it succeeds, or opens it again if it fails.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self._opened_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.state == self.OPEN
+
+    @property
+    def metrics(self):
+        with self._lock:
+            return {
+                'circuit_state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'circuit_opened': self.times_opened,
+            }
+
+    def allow(self):
+        """
+        Checks if a call is allowed, half-opening the circuit if its timeout has expired
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN and time.time() >= self._opened_at + self.reset_timeout:
+                logger.info('Circuit half-open, trying a call')
+                self.state = self.HALF_OPEN
+                return True
+
+            return False  # Open, or waiting for the result of the trial call
+
+    def remaining_time(self):
+        """
+        Time (in seconds) until a call is allowed again
+        """
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0
+
+            return max(0, self._opened_at + self.reset_timeout - time.time())
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info('Circuit closed')
+
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(
+                        '%d consecutive failures, opening the circuit', self.consecutive_failures
+                    )
+                    self.times_opened += 1
+
+                self.state = self.OPEN
+                self._opened_at = time.time()
+
+
+class TokenBucket(object):
+    """
+    Rate limiter that allows `rate` calls per second, with bursts of up to `capacity` calls
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = capacity or max(1, self.rate)
+
+        self.throttled = 0  # Calls that had to wait
+        self._tokens = self.capacity
+        self._updated_at = time.time()
+        self._lock = threading.Lock()
+
+    @property
+    def metrics(self):
+        with self._lock:
+            return {
+                'tokens': max(0, self._available(time.time())),
+                'throttled': self.throttled,
+            }
+
+    def acquire(self):
+        """
+        Takes a token, sleeping until there's one available. Tokens are reserved
+        before sleeping, so callers are served in order.
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens = self._available(now) - 1
+            self._updated_at = now
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+
+            if wait:
+                self.throttled += 1
+
+        if wait:
+            time.sleep(wait)
+
+    def _available(self, now):
+        return min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+
+
+def backoff(attempt, base_delay, max_delay):
+    """
+    Time (in seconds) to sleep after a failed attempt: a random time up to the
+    exponential backoff of the attempt (starting at 0), known as full jitter
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
@@ -0,0 +1,275 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pytz import timezone
+
+from .base import Connector
+from ..serializers import Codec
+
+import logging
+logger = logging.getLogger('sqjobs.sqlite')
+
+
+class SQLite(Connector):
+    """
+    Manages a queue stored in a SQLite database. It can be shared by the
+    processes of the same machine.
+
+    Like SQS, received messages are invisible for `visibility_timeout` seconds:
+    if they are not deleted in that time, they can be received again. Messages
+    are claimed in a transaction, using an index on their queue and the time
+    when they become visible, and the database works in WAL mode, so readers
+    don't block writers.
+    """
+    DEFAULT_VISIBILITY_TIMEOUT = 30  # seconds
+    DEFAULT_POLL_INTERVAL = 0.1  # seconds
+    DEFAULT_BUSY_TIMEOUT = 30  # seconds
+    MAX_VARIABLES = 500  # SQLite limits the variables of every query
+
+    def __init__(self, path, visibility_timeout=None, poll_interval=None, busy_timeout=None,
+                 codec=None):
+        """
+        Creates a new SQLite connector
+
+        :param path: path of the database file. It's created if it doesn't exist.
+        :param visibility_timeout: time (in seconds) that received messages are invisible
+        :param poll_interval: time (in seconds) between two polls while waiting for messages
+        :param busy_timeout: time (in seconds) to wait for the locks of other processes
+        :param codec: `Codec` used to encode the messages (plain JSON by default)
+        """
+        self.path = path
+        self.visibility_timeout = visibility_timeout or self.DEFAULT_VISIBILITY_TIMEOUT
+        self.poll_interval = poll_interval or self.DEFAULT_POLL_INTERVAL
+        self.busy_timeout = busy_timeout or self.DEFAULT_BUSY_TIMEOUT
+        self.codec = codec or Codec(base64=False)
+
+        self._cached_connection = None
+        self._connection_pid = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'SQLite("{path}")'.format(path=self.path)
+
+    @property
+    def connection(self):
+        """
+        Creates (and saves in a cache) the connection to the database. A new one
+        is created in forked processes.
+        """
+        if self._cached_connection is None or self._connection_pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=self.busy_timeout, check_same_thread=False, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(
+                'CREATE TABLE IF NOT EXISTS sqjobs_messages ('
+                '  id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                '  queue TEXT NOT NULL,'
+                '  body TEXT NOT NULL,'
+                '  tag TEXT,'
+                '  visible_at REAL NOT NULL,'
+                '  receipt TEXT,'
+                '  receive_count INTEGER NOT NULL DEFAULT 0,'
+                '  created_at REAL NOT NULL'
+                ');'
+                'CREATE INDEX IF NOT EXISTS sqjobs_messages_visible'
+                '  ON sqjobs_messages (queue, visible_at);'
+            )
+
+            self._cached_connection = connection
+            self._connection_pid = os.getpid()
+
+        return self._cached_connection
+
+    def enqueue(self, queue_name, payload):
+        self.enqueue_batch(queue_name, [payload])
+
+    def enqueue_batch(self, queue_name, payloads):
+        now = time.time()
+        rows = []
+
+        for payload in payloads:
+            body, tag = self.codec.encode(payload)
+            eta = payload.get('eta') if isinstance(payload, dict) else None
+            rows.append((queue_name, body, tag, max(now, eta or 0), now))
+
+        with self._transaction() as connection:
+            connection.executemany(
+                'INSERT INTO sqjobs_messages (queue, body, tag, visible_at, created_at)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+
+        logger.info('Sent %d new messages to %s', len(rows), queue_name)
+
+        return [None] * len(rows)
+
+    def dequeue(self, queue_name, wait_time=20):
+        payloads = None
+
+        while not payloads:
+            payloads = self.dequeue_batch(queue_name, max_messages=1, wait_time=wait_time)
+
+            if not payloads and wait_time == 0:
+                return None  # Non-blocking mode
+
+        return payloads[0]
+
+    def dequeue_batch(self, queue_name, max_messages=10, wait_time=20):
+        deadline = time.time() + wait_time
+
+        while True:
+            payloads = self._receive(queue_name, max_messages)
+
+            if payloads:
+                logger.info('%d new messages retrieved from %s', len(payloads), queue_name)
+                return payloads
+
+            if time.time() + self.poll_interval > deadline:
+                logger.debug('No message retrieved from %s', queue_name)
+                return []
+
+            time.sleep(self.poll_interval)
+
+    def release(self, queue_name, payloads):
+        self.set_retry_time_batch(
+            queue_name, [(payload['_metadata']['id'], 0) for payload in payloads]
+        )
+
+        logger.info('Released %d messages to queue %s', len(payloads), queue_name)
+
+    def delete(self, queue_name, message_id):
+        self.delete_batch(queue_name, [message_id])
+
+    def set_retry_time(self, queue_name, message_id, delay):
+        self.set_retry_time_batch(queue_name, [(message_id, delay)])
+
+    def delete_batch(self, queue_name, message_ids):
+        failed = []
+
+        with self._transaction() as connection:
+            for message_id in message_ids:
+                cursor = connection.execute(
+                    'DELETE FROM sqjobs_messages WHERE id = ? AND receipt = ?',
+                    parse_message_id(message_id)
+                )
+
+                if not cursor.rowcount:  # Received again by others, or already deleted
+                    failed.append(message_id)
+
+        logger.info('Deleted %d messages from queue %s', len(message_ids) - len(failed), queue_name)
+
+        return failed
+
+    def set_retry_time_batch(self, queue_name, entries):
+        failed = []
+        now = time.time()
+
+        with self._transaction() as connection:
+            for message_id, delay in entries:
+                cursor = connection.execute(
+                    'UPDATE sqjobs_messages SET visible_at = ? WHERE id = ? AND receipt = ?',
+                    (now + (delay or 0),) + parse_message_id(message_id)
+                )
+
+                if not cursor.rowcount:
+                    failed.append((message_id, delay))
+
+        logger.info(
+            'Changed retry time of %d messages from queue %s',
+            len(entries) - len(failed), queue_name
+        )
+
+        return failed
+
+    def warm_up(self, queue_names):
+        with self._lock:
+            self.connection  # Creates the tables
+
+    def serialize_job(self, job_name, job_id, args, kwargs):
+        return {
+            'id': job_id,
+            'name': job_name,
+            'args': args,
+            'kwargs': kwargs
+        }
+
+    def unserialize_job(self, job_class, queue_name, payload):
+        job = job_class()
+
+        job.id = payload['id']
+        job.queue_name = queue_name
+        job.broker_id = payload['_metadata']['id']
+        job.retries = payload['_metadata']['retries']
+        job.created_on = payload['_metadata']['created_on']
+        args = payload['args'] or []
+        kwargs = payload['kwargs'] or {}
+
+        return job, args, kwargs
+
+    def _receive(self, queue_name, max_messages):
+        """
+        Claims up to `max_messages` visible messages, making them invisible
+        """
+        now = time.time()
+        receipt = uuid.uuid4().hex
+
+        with self._transaction() as connection:
+            rows = connection.execute(
+                'SELECT id, body, tag, receive_count, created_at FROM sqjobs_messages'
+                ' WHERE queue = ? AND visible_at <= ? ORDER BY visible_at LIMIT ?',
+                (queue_name, now, min(max_messages, self.MAX_VARIABLES))
+            ).fetchall()
+
+            if rows:
+                connection.execute(
+                    'UPDATE sqjobs_messages'
+                    ' SET visible_at = ?, receipt = ?, receive_count = receive_count + 1'
+                    ' WHERE id IN ({ids})'.format(ids=', '.join('?' * len(rows))),
+                    [now + self.visibility_timeout, receipt] + [row[0] for row in rows]
+                )
+
+        return [self._decode(row, receipt) for row in rows]
+
+    def _decode(self, row, receipt):
+        message_id, body, tag, receive_count, created_at = row
+
+        payload = Codec.decode(body, tag)
+        payload['_metadata'] = {
+            'id': '{id}:{receipt}'.format(id=message_id, receipt=receipt),
+            'retries': receive_count + 1,
+            'created_on': datetime.fromtimestamp(created_at, tz=timezone('UTC')),
+        }
+
+        return payload
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Runs the queries of a block in a write transaction (BEGIN IMMEDIATE), so
+        the messages can't be claimed by other processes at the same time
+        """
+        with self._lock:
+            connection = self.connection
+            connection.execute('BEGIN IMMEDIATE')
+
+            try:
+                yield connection
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+
+            connection.execute('COMMIT')
+
+
+def parse_message_id(message_id):
+    """
+    Splits a message id (the id of the row and the receipt of the reception)
+    """
+    row_id, _, receipt = message_id.partition(':')
+    return int(row_id), receipt
@@ -1,27 +1,38 @@
-import base64
-import json
-import sys
-from datetime import date, datetime
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
 from pytz import timezone
 
-import boto3
 import botocore
 
 from .base import Connector
+from .pool import create_connection, get_connection
+from ..blobs import LazyPayload
 from ..exceptions import QueueDoesNotExist
+from ..serializers import Codec, json_formatter
 
 import logging
 logger = logging.getLogger('sqjobs.sqs')
 
-is_pypy = '__pypy__' in sys.builtin_module_names
-
 
 class SQS(Connector):
     """
     Manages a single connection to SQS
     """
-
-    def __init__(self, access_key, secret_key, region_name='us-east-1', endpoint_url=None):
+    MAX_BATCH_SIZE = 10  # SQS limit of entries per batch request
+    MAX_MESSAGE_SIZE = 256 * 1024  # SQS limit of bytes per message (and per batch request)
+    MAX_DELAY = 15 * 60  # SQS limit of seconds that a message can be delayed
+    MAX_VISIBILITY_TIMEOUT = 12 * 60 * 60  # SQS limit of seconds that a receipt handle is valid
+    NON_EXISTENT_QUEUE_ERRORS = (
+        'AWS.SimpleQueueService.NonExistentQueue',
+        'QueueDoesNotExist',
+    )
+
+    def __init__(self, access_key, secret_key, region_name='us-east-1', endpoint_url=None,
+                 queue_cache_ttl=None, codec=None, blob_store=None, offload_threshold=None,
+                 shared_connection=True, connection_options=None):
         """
         Creates a new SQS object
 
@@ -29,13 +40,33 @@ class SQS(Connector):
         :param secret_key: secret key with write access to AWS SQS
         :param region_name: a region name, like 'us-east-1'
         :param endpoint_url: URL to use a custom region
+        :param queue_cache_ttl: time (in seconds) that resolved queues are cached.
+         If None, they are cached until SQS reports that they don't exist.
+        :param codec: `Codec` used to encode the messages (JSON + base64 by default)
+        :param blob_store: `BlobStore` where the payloads of the big messages are
+         stored. Messages only carry a reference to them, and they are deleted when
+         the messages are deleted. Blobs of messages that are never deleted (like the
+         ones moved to a dead letter queue) must be expired by the store itself.
+        :param offload_threshold: messages bigger than this size (in bytes) are stored
+         in the blob store. By default, the ones bigger than the SQS limit.
+        :param shared_connection: use the connection shared by all the SQS connectors of
+         the process with the same parameters, instead of creating a new one
+        :param connection_options: dict with the options of the connection, like
+         `max_pool_connections` or `read_timeout` (see `sqjobs.connectors.pool.build_config`)
         """
         self.access_key = access_key
         self.secret_key = secret_key
         self.region_name = region_name
         self.endpoint_url = endpoint_url
+        self.queue_cache_ttl = queue_cache_ttl
+        self.codec = codec
+        self.blob_store = blob_store
+        self.offload_threshold = offload_threshold or self.MAX_MESSAGE_SIZE
+        self.shared_connection = shared_connection
+        self.connection_options = connection_options or {}
 
-        self._cached_connection = None
+        self._local = threading.local()  # boto3 resources can't be shared by threads
+        self._claim_checks = {}  # receipt handle -> (blob key, reception time)
 
     def __repr__(self):
         return 'SQS("{ak}", "{sk}", region_name="{region_name}")'.format(
@@ -47,85 +78,190 @@ class SQS(Connector):
     @property
     def connection(self):
         """
-        Creates (and saves in a cache) a connection to SQS
+        Creates (and saves in a cache) a connection to SQS. Every thread has its own one.
         """
         if self._cached_connection is None:
-            config = {
-                'service_name': 'sqs',
-                'region_name': self.region_name,
-                'aws_access_key_id': self.access_key,
-                'aws_secret_access_key': self.secret_key,
-            }
+            factory = get_connection if self.shared_connection else create_connection
 
-            if self.endpoint_url:
-                config['endpoint_url'] = self.endpoint_url
-
-            self._cached_connection = boto3.resource(**config)
-            logger.debug('Created a new connection to SQS')
+            self._local.connection = factory(
+                'sqs', self.region_name, self.access_key, self.secret_key, self.endpoint_url,
+                **self.connection_options
+            )
 
         return self._cached_connection
 
+    @property
+    def _cached_connection(self):
+        return getattr(self._local, 'connection', None)
+
+    @property
+    def _cached_queues(self):
+        """
+        Queues resolved by the thread: queue name -> (queue, resolution time)
+        """
+        return self._local.__dict__.setdefault('queues', {})
+
     def enqueue(self, queue_name, payload):
-        message = SQSMessage.encode(payload)
-        queue = self._get_queue(queue_name)
+        message = self._build_message(payload)
 
-        if not queue:
-            raise QueueDoesNotExist('The queue %s does not exist' % queue_name)
+        with self._queue(queue_name) as queue:
+            queue.send_message(**message)
 
-        queue.send_message(MessageBody=message)
         logger.info('Sent new message to %s', queue_name)
 
+    def enqueue_batch(self, queue_name, payloads):
+        messages = [self._build_message(payload) for payload in payloads]
+        errors = [None] * len(messages)
+
+        with self._queue(queue_name) as queue:
+            for chunk in self._message_chunks(messages, errors):
+                try:
+                    response = queue.send_message_batch(Entries=[
+                        dict(messages[index], Id=str(n)) for n, index in enumerate(chunk, 1)
+                    ])
+                except Exception as e:
+                    if self._is_non_existent_queue_error(e):
+                        raise
+
+                    # The previous chunks have been sent, report the error only in this one
+                    logger.exception('Error sending a batch of messages to %s', queue_name)
+
+                    for index in chunk:
+                        errors[index] = str(e) or type(e).__name__
+
+                    continue
+
+                for entry in response.get('Failed', []):
+                    errors[chunk[int(entry['Id']) - 1]] = entry.get('Message') or entry.get('Code')
+
+        logger.info(
+            'Sent %d new messages to %s', len([e for e in errors if e is None]), queue_name
+        )
+
+        return errors
+
     def dequeue(self, queue_name, wait_time=20):
-        queue = self._get_queue(queue_name)
-        messages = None
+        payloads = None
 
-        if not queue:
-            raise QueueDoesNotExist('The queue %s does not exist' % queue_name)
+        while not payloads:
+            payloads = self.dequeue_batch(queue_name, max_messages=1, wait_time=wait_time)
 
-        while not messages:
+            if not payloads and wait_time == 0:
+                return None  # Non-blocking mode
+
+        return payloads[0]
+
+    def dequeue_batch(self, queue_name, max_messages=10, wait_time=20):
+        with self._queue(queue_name) as queue:
             messages = queue.receive_messages(
-                MaxNumberOfMessages=1,
+                MaxNumberOfMessages=min(max_messages, self.MAX_BATCH_SIZE),
                 WaitTimeSeconds=wait_time,
                 AttributeNames=['All'],
+                MessageAttributeNames=['All'],
             )
 
-            if not messages:
-                logger.debug('No message retrieved from %s', queue_name)
+        if not messages:
+            logger.debug('No message retrieved from %s', queue_name)
+            return []
 
-                if wait_time == 0:
-                    return None  # Non-blocking mode
+        logger.info('%d new messages retrieved from %s', len(messages), queue_name)
 
-        logger.info('New message retrieved from %s', queue_name)
-        payload = SQSMessage.decode(messages[0])
+        messages = self._postpone_early_messages(queue_name, messages)
+        self._prune_claim_checks()
 
-        return payload
+        return [self._decode_message(message) for message in messages]
 
-    def delete(self, queue_name, message_id):
-        queue = self._get_queue(queue_name)
+    def release(self, queue_name, payloads):
+        with self._queue(queue_name) as queue:
+            for i in range(0, len(payloads), self.MAX_BATCH_SIZE):
+                chunk = payloads[i:i + self.MAX_BATCH_SIZE]
 
-        if not queue:
-            raise QueueDoesNotExist('The queue %s does not exist' % queue_name)
+                queue.change_message_visibility_batch(Entries=[{
+                    'Id': str(n),
+                    'ReceiptHandle': payload['_metadata']['id'],
+                    'VisibilityTimeout': 0
+                } for n, payload in enumerate(chunk, 1)])
+
+        for payload in payloads:  # They will be received again with other receipt handles
+            self._claim_checks.pop(payload['_metadata']['id'], None)
 
-        queue.delete_messages(Entries=[{
-            'Id': '1',
-            'ReceiptHandle': message_id
-        }])
+        logger.info('Released %d messages to queue %s', len(payloads), queue_name)
+
+    def delete(self, queue_name, message_id):
+        with self._queue(queue_name) as queue:
+            queue.delete_messages(Entries=[{
+                'Id': '1',
+                'ReceiptHandle': message_id
+            }])
+
+        self._delete_blobs([message_id])
 
         logger.info('Deleted message from queue %s', queue_name)
 
     def set_retry_time(self, queue_name, message_id, delay):
-        queue = self._get_queue(queue_name)
+        with self._queue(queue_name) as queue:
+            queue.change_message_visibility_batch(Entries=[{
+                'Id': '1',
+                'ReceiptHandle': message_id,
+                'VisibilityTimeout': delay or 0
+            }])
 
-        if not queue:
-            raise QueueDoesNotExist('The queue %s does not exist' % queue_name)
+        logger.info('Changed retry time of a message from queue %s', queue_name)
 
-        queue.change_message_visibility_batch(Entries=[{
-            'Id': '1',
-            'ReceiptHandle': message_id,
-            'VisibilityTimeout': delay or 0
-        }])
+    def delete_batch(self, queue_name, message_ids):
+        failed = []
 
-        logger.info('Changed retry time of a message from queue %s', queue_name)
+        with self._queue(queue_name) as queue:
+            for i in range(0, len(message_ids), self.MAX_BATCH_SIZE):
+                chunk = message_ids[i:i + self.MAX_BATCH_SIZE]
+
+                response = queue.delete_messages(Entries=[{
+                    'Id': str(n),
+                    'ReceiptHandle': message_id
+                } for n, message_id in enumerate(chunk, 1)])
+
+                failed.extend(self._failed_entries(response, chunk))
+
+        self._delete_blobs([message_id for message_id in message_ids if message_id not in failed])
+
+        logger.info('Deleted %d messages from queue %s', len(message_ids) - len(failed), queue_name)
+
+        return failed
+
+    def set_retry_time_batch(self, queue_name, entries):
+        failed = []
+
+        with self._queue(queue_name) as queue:
+            for i in range(0, len(entries), self.MAX_BATCH_SIZE):
+                chunk = entries[i:i + self.MAX_BATCH_SIZE]
+
+                response = queue.change_message_visibility_batch(Entries=[{
+                    'Id': str(n),
+                    'ReceiptHandle': message_id,
+                    'VisibilityTimeout': delay or 0
+                } for n, (message_id, delay) in enumerate(chunk, 1)])
+
+                failed.extend(self._failed_entries(response, chunk))
+
+        logger.info(
+            'Changed retry time of %d messages from queue %s',
+            len(entries) - len(failed), queue_name
+        )
+
+        return failed
+
+    def warm_up(self, queue_names):
+        for queue_name in queue_names:
+            with self._queue(queue_name):
+                logger.debug('Queue %s resolved', queue_name)
+
+    def invalidate_queue(self, queue_name):
+        """
+        Removes a queue from the cache, so it's resolved again the next time it's used
+
+        :param queue_name: the name of the queue
+        """
+        self._cached_queues.pop(queue_name, None)
 
     def serialize_job(self, job_name, job_id, args, kwargs):
         return {
@@ -148,49 +284,332 @@ class SQS(Connector):
 
         return job, args, kwargs
 
+    def _build_message(self, payload):
+        """
+        Builds a new message, storing its payload in the blob store if it's too big
+        """
+        message = SQSMessage.build(payload, self.codec)
+
+        if self.blob_store and SQSMessage.size(message) > self.offload_threshold:
+            key = self.blob_store.put(message['MessageBody'].encode('utf-8'))
+            logger.debug('Payload stored in blob %s', key)
+
+            message = SQSMessage.claim_check(message, key)
+
+        eta = payload.get('eta') if isinstance(payload, dict) else None
+
+        if eta:
+            message = self._delay_message(message, eta)
+
+        return message
+
+    def _delay_message(self, message, eta):
+        """
+        Delays a message until `eta`. SQS can't delay messages more than
+        MAX_DELAY seconds, so longer delays are completed by sending the
+        message again every time it's received too early.
+        """
+        delay = int(math.ceil(eta - time.time()))
+
+        if delay <= 0:
+            return message
+
+        if delay > self.MAX_DELAY:
+            message = SQSMessage.with_eta(message, eta)
+
+        return dict(message, DelaySeconds=min(delay, self.MAX_DELAY))
+
+    def _postpone_early_messages(self, queue_name, messages):
+        """
+        Sends again (delayed) the messages received before their eta, and
+        returns the rest of them
+        """
+        now, due, postponed = time.time(), [], 0
+
+        for message in messages:
+            eta = SQSMessage.eta(message)
+
+            if eta is None or eta <= now:
+                due.append(message)
+                continue
+
+            with self._queue(queue_name) as queue:
+                queue.send_message(**self._delay_message(SQSMessage.rebuild(message), eta))
+                queue.delete_messages(
+                    Entries=[{'Id': '1', 'ReceiptHandle': message.receipt_handle}]
+                )
+
+            postponed += 1
+
+        if postponed:
+            logger.info('%d messages of %s postponed until their eta', postponed, queue_name)
+
+        return due
+
+    def _decode_message(self, message):
+        payload = SQSMessage.decode(message, self.blob_store)
+
+        if isinstance(payload, LazyPayload):
+            self._claim_checks[message.receipt_handle] = (SQSMessage.blob_key(message), time.time())
+
+        return payload
+
+    def _delete_blobs(self, message_ids):
+        """
+        Deletes the blobs of the messages (if any)
+        """
+        for message_id in message_ids:
+            claim_check = self._claim_checks.pop(message_id, None)
+
+            if not claim_check:
+                continue
+
+            try:
+                self.blob_store.delete(claim_check[0])
+            except Exception:
+                logger.exception('Error deleting blob %s', claim_check[0])
+
+    def _prune_claim_checks(self):
+        """
+        Forgets the claim checks of the messages whose receipt handles have expired
+        """
+        expiration = time.time() - self.MAX_VISIBILITY_TIMEOUT
+
+        for message_id, (_, received) in list(self._claim_checks.items()):
+            if received < expiration:
+                self._claim_checks.pop(message_id, None)
+
+    def _message_chunks(self, messages, errors):
+        """
+        Splits the messages in chunks (lists of indexes) that can be sent in a single
+        batch request. Messages bigger than the SQS limit are marked in `errors`.
+        """
+        chunk, chunk_size = [], 0
+
+        for index, message in enumerate(messages):
+            size = SQSMessage.size(message)
+
+            if size > self.MAX_MESSAGE_SIZE:
+                errors[index] = 'Message too large (%d bytes)' % size
+                continue
+
+            if len(chunk) == self.MAX_BATCH_SIZE or chunk_size + size > self.MAX_MESSAGE_SIZE:
+                yield chunk
+                chunk, chunk_size = [], 0
+
+            chunk.append(index)
+            chunk_size += size
+
+        if chunk:
+            yield chunk
+
+    def _failed_entries(self, response, chunk):
+        """
+        Returns the elements of `chunk` reported as failed in the response of a batch request
+        """
+        failed = []
+
+        for entry in response.get('Failed', []):
+            logger.warning('Batch entry failed: %s (%s)', entry.get('Message'), entry.get('Code'))
+            failed.append(chunk[int(entry['Id']) - 1])
+
+        return failed
+
+    @contextmanager
+    def _queue(self, queue_name):
+        """
+        Context manager that returns the queue resource and converts the errors
+        of missing queues in `QueueDoesNotExist` exceptions
+        """
+        queue = self._get_queue(queue_name)
+
+        if not queue:
+            raise QueueDoesNotExist('The queue %s does not exist' % queue_name)
+
+        try:
+            yield queue
+        except botocore.exceptions.ClientError as e:
+            if not self._is_non_existent_queue_error(e):
+                raise
+
+            self.invalidate_queue(queue_name)
+            raise QueueDoesNotExist('The queue %s does not exist' % queue_name)
+
+    def _is_non_existent_queue_error(self, error):
+        return (
+            isinstance(error, botocore.exceptions.ClientError) and
+            error.response.get('Error', {}).get('Code') in self.NON_EXISTENT_QUEUE_ERRORS
+        )
+
     def _get_queue(self, name):
+        cached = self._cached_queues.get(name)
+
+        fresh = cached and (
+            self.queue_cache_ttl is None or time.time() - cached[1] < self.queue_cache_ttl
+        )
+
+        if fresh:
+            return cached[0]
+
         try:
-            return self.connection.get_queue_by_name(QueueName=name)
-        except botocore.exceptions.ClientError:
+            queue = self.connection.get_queue_by_name(QueueName=name)
+        except botocore.exceptions.ClientError as e:
+            if not self._is_non_existent_queue_error(e):
+                raise
+
+            self.invalidate_queue(name)
             return None
 
+        self._cached_queues[name] = (queue, time.time())
+        logger.debug('Queue %s resolved to %s', name, getattr(queue, 'url', None))
+
+        return queue
+
 
 class SQSMessage(object):
+    CODEC_ATTRIBUTE = 'sqjobs-codec'
+    BLOB_ATTRIBUTE = 'sqjobs-blob'
+    ETA_ATTRIBUTE = 'sqjobs-eta'
+    DEFAULT_CODEC = Codec()
 
     @staticmethod
-    def encode(payload):
-        payload_str = json.dumps(payload, default=SQSMessage.json_formatter)
-        payload_encoded = base64.b64encode(payload_str.encode('utf-8'))
-        return payload_encoded.decode('utf-8')
+    def build(payload, codec=None):
+        """
+        Builds the body and the attributes of a new message
+
+        :param payload: the payload of the message
+        :param codec: codec used to encode the payload (JSON + base64 by default)
+        :return: a dict with the MessageBody and MessageAttributes of the message
+        """
+        body, tag = (codec or SQSMessage.DEFAULT_CODEC).encode(payload)
+        message = {'MessageBody': body}
+
+        if tag:
+            message['MessageAttributes'] = {
+                SQSMessage.CODEC_ATTRIBUTE: {'DataType': 'String', 'StringValue': tag}
+            }
+
+        return message
 
     @staticmethod
-    def decode(message):
-        body = message.body
+    def claim_check(message, key):
+        """
+        Replaces the body of a message built with `build` with a reference to the
+        blob where it has been stored
+
+        :param message: the message
+        :param key: the key of the blob
+        """
+        message = SQSMessage.with_attribute(message, SQSMessage.BLOB_ATTRIBUTE, key)
+        message['MessageBody'] = key
+
+        return message
+
+    @staticmethod
+    def with_eta(message, eta):
+        """
+        Adds the time when a message built with `build` can be processed
+        """
+        return SQSMessage.with_attribute(message, SQSMessage.ETA_ATTRIBUTE, '%.3f' % eta)
+
+    @staticmethod
+    def with_attribute(message, name, value):
+        """
+        Returns a copy of a message built with `build` with a new string attribute
+        """
+        attributes = dict(message.get('MessageAttributes', {}))
+        attributes[name] = {'DataType': 'String', 'StringValue': value}
+
+        return dict(message, MessageAttributes=attributes)
+
+    @staticmethod
+    def rebuild(message):
+        """
+        Builds a new message with the body and the attributes of a received message
+        """
+        attributes = getattr(message, 'message_attributes', None) or {}
+        rebuilt = {'MessageBody': message.body}
+
+        if attributes:
+            rebuilt['MessageAttributes'] = dict(
+                (name, {'DataType': attribute['DataType'], 'StringValue': attribute['StringValue']})
+                for name, attribute in attributes.items()
+            )
+
+        return rebuilt
+
+    @staticmethod
+    def eta(message):
+        """
+        Time when a received message can be processed (None if it can be processed right now)
+        """
+        attributes = getattr(message, 'message_attributes', None) or {}
+        eta = attributes.get(SQSMessage.ETA_ATTRIBUTE, {}).get('StringValue')
+
+        return float(eta) if eta else None
+
+    @staticmethod
+    def blob_key(message):
+        """
+        Key of the blob with the payload of a received message (None if it has no blob)
+        """
+        attributes = getattr(message, 'message_attributes', None) or {}
+        return attributes.get(SQSMessage.BLOB_ATTRIBUTE, {}).get('StringValue')
+
+    @staticmethod
+    def size(message):
+        """
+        Size (in bytes) of a message built with `build`, as computed by SQS
+        """
+        size = len(message['MessageBody'].encode('utf-8'))
 
-        if is_pypy:
-            body = body.encode("utf-8")
+        for name, attribute in message.get('MessageAttributes', {}).items():
+            size += len(name) + len(attribute['DataType'])
+            size += len(attribute['StringValue'].encode('utf-8'))
 
-        payload_decoded = base64.b64decode(body)
-        payload = json.loads(payload_decoded.decode("utf-8"))
+        return size
+
+    @staticmethod
+    def encode(payload, codec=None):
+        return SQSMessage.build(payload, codec)['MessageBody']
+
+    @staticmethod
+    def decode(message, blob_store=None):
+        """
+        Decodes a received message. If its payload is stored in a blob, it returns a
+        `LazyPayload` that only retrieves it from `blob_store` when it's accessed.
+        """
+        attributes = getattr(message, 'message_attributes', None) or {}
+        tag = attributes.get(SQSMessage.CODEC_ATTRIBUTE, {}).get('StringValue')
+        key = SQSMessage.blob_key(message)
 
         retries = int(message.attributes['ApproximateReceiveCount'])
         created_on = int(message.attributes['SentTimestamp'])
 
-        payload['_metadata'] = {
+        metadata = {
             'id': message.receipt_handle,
             'retries': retries,
             'created_on': datetime.fromtimestamp(created_on / 1000, tz=timezone('UTC')),
         }
 
+        if key:
+            def load():
+                if blob_store is None:
+                    raise ValueError(
+                        'Message payload stored in blob %s, but no blob store available' % key
+                    )
+
+                return Codec.decode(blob_store.get(key), tag)
+
+            return LazyPayload(load, metadata)
+
+        payload = Codec.decode(message.body, tag)
+        payload['_metadata'] = metadata
+
         logging.debug('Message payload: %s', str(payload))
 
         return payload
 
     @staticmethod
     def json_formatter(obj):
-        if isinstance(obj, datetime):
-            return obj.strftime('%Y-%m-%d %H:%M:%S')
-        elif isinstance(obj, date):
-            return obj.strftime('%Y-%m-%d')
-
-        return None
+        return json_formatter(obj)
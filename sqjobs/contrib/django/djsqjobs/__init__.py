@@ -1,7 +1,10 @@
-from .utils import get_broker, get_worker, add_job
+from .utils import get_broker, reset_broker, get_worker, get_scheduler, add_job, add_job_on_commit
 
 __all__ = [
     'get_broker',
+    'reset_broker',
     'get_worker',
+    'get_scheduler',
     'add_job',
+    'add_job_on_commit',
 ]
@@ -3,7 +3,7 @@ from __future__ import absolute_import
 from django.core.management.base import BaseCommand
 
 from sqjobs.contrib.django.djsqjobs.finders import register_all_jobs
-from sqjobs.contrib.django.djsqjobs.utils import get_worker
+from sqjobs.contrib.django.djsqjobs.utils import get_scheduler, get_worker
 
 
 class Command(BaseCommand):
@@ -11,18 +11,26 @@ class Command(BaseCommand):
     args = True
 
     def handle(self, *args, **options):
-        if len(args) != 3 or args[0] != 'sqs' or args[1] != 'worker':
+        if len(args) == 2 and args[0] == 'sqs' and args[1] == 'scheduler':
+            self._execute_scheduler()
+            return
+
+        if len(args) < 3 or args[0] != 'sqs' or args[1] != 'worker':
             self.help_text()
             return
 
-        self._execute_worker(args[2])
+        self._execute_worker(list(args[2:]))
 
-    def _execute_worker(self, queue_name):
-        worker = get_worker(queue_name)
+    def _execute_worker(self, queue_names):
+        worker = get_worker(queue_names)
 
         register_all_jobs(worker)
         worker.run()
 
+    def _execute_scheduler(self):
+        get_scheduler().run()
+
     def help_text(self):
         self.stdout.write('Use:')
-        self.stdout.write('./manage.py sqjobs sqs worker QUEUE_NAME')
+        self.stdout.write('./manage.py sqjobs sqs worker QUEUE_NAME [QUEUE_NAME...]')
+        self.stdout.write('./manage.py sqjobs sqs scheduler')
@@ -0,0 +1,43 @@
+from __future__ import absolute_import
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sqjobs.contrib.django.djsqjobs.models import JobStatus
+
+
+class Command(BaseCommand):
+    help = 'Deletes the old job statuses, in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=30,
+            help='Delete the statuses created more than DAYS days ago (30 by default)'
+        )
+        parser.add_argument(
+            '--status', default=JobStatus.SUCCESS,
+            choices=[status for status, _ in JobStatus.statuses],
+            help='Status of the deleted statuses (SUCCESS by default)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Maximum number of rows deleted at the same time (1000 by default)'
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to wait between chunks (0 by default)'
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+
+        deleted = JobStatus.delete_old(
+            before,
+            status=options['status'],
+            chunk_size=options['chunk_size'],
+            pause=options['pause'],
+        )
+
+        self.stdout.write('{deleted} job statuses deleted'.format(deleted=deleted))
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobStatus',
+            fields=[
+                ('id', models.AutoField(
+                    auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                )),
+                ('job_id', models.CharField(max_length=255, unique=True, verbose_name='job id')),
+                ('job_name', models.CharField(max_length=255, verbose_name='job name')),
+                ('status', models.CharField(
+                    choices=[
+                        ('PENDING', 'PENDING'), ('SUCCESS', 'SUCCESS'), ('FAILURE', 'FAILURE')
+                    ],
+                    default='PENDING', max_length=7, verbose_name='status'
+                )),
+                ('result', models.TextField(blank=True, verbose_name='result')),
+                ('traceback', models.TextField(blank=True, verbose_name='traceback')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='started at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='done at')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PeriodicJob',
+            fields=[
+                ('id', models.AutoField(
+                    auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                )),
+                ('name', models.CharField(max_length=255, verbose_name='name')),
+                ('task', models.CharField(max_length=255, verbose_name='task')),
+                ('args', models.TextField(blank=True, verbose_name='args')),
+                ('kwargs', models.TextField(blank=True, verbose_name='kwargs')),
+                ('schedule', models.CharField(max_length=255, verbose_name='schedule')),
+                ('timezone', models.CharField(
+                    default='UTC', max_length=63, verbose_name='timezone'
+                )),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('next_execution', models.DateTimeField(verbose_name='next execution on')),
+                ('enabled', models.BooleanField(default=True, verbose_name='enabled')),
+                ('skip_delayed_jobs_next_time', models.BooleanField(
+                    default=True, verbose_name='skip jobs if delayed'
+                )),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djsqjobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='jobstatus',
+            index_together=set([('status', 'created_at'), ('job_name', 'status', 'created_at')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='periodicjob',
+            index_together=set([('enabled', 'next_execution')]),
+        ),
+    ]
@@ -1,4 +1,5 @@
 import pytz
+import time
 from datetime import datetime, timedelta
 
 from croniter.croniter import croniter
@@ -29,6 +30,12 @@ class JobStatus(models.Model):
     created_at = models.DateTimeField(_('started at'), auto_now_add=True)
     updated_at = models.DateTimeField(_('done at'), auto_now=True)
 
+    class Meta:
+        index_together = [
+            ('status', 'created_at'),  # Cleanup of old jobs
+            ('job_name', 'status', 'created_at'),  # Status of the jobs of a kind
+        ]
+
     def __repr__(self):
         return '<JobStatus ({name}): {id} status->{status}>'.format(
             name=self.job_name,
@@ -36,6 +43,38 @@ class JobStatus(models.Model):
             status=self.status
         )
 
+    @classmethod
+    def delete_old(cls, before, status=SUCCESS, chunk_size=1000, pause=0):
+        """
+        Deletes the statuses created before a date, in chunks of `chunk_size` rows
+        (every one in its own transaction), so tables are not locked for long
+
+        :param before: datetime, statuses created before it are deleted
+        :param status: only statuses with this status are deleted (all of them if None)
+        :param chunk_size: maximum number of rows deleted at the same time
+        :param pause: time (in seconds) to wait between chunks
+        :return: number of deleted statuses
+        """
+        queryset = cls.objects.filter(created_at__lt=before)
+        deleted = 0
+
+        if status:
+            queryset = queryset.filter(status=status)
+
+        while True:
+            ids = list(queryset.values_list('pk', flat=True)[:chunk_size])
+
+            if not ids:
+                return deleted
+
+            cls.objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
+
+            if len(ids) < chunk_size:
+                return deleted
+
+            time.sleep(pause)
+
 
 class PeriodicJob(models.Model):
     """
@@ -58,6 +97,11 @@ class PeriodicJob(models.Model):
     enabled = models.BooleanField(_('enabled'), default=True)
     skip_delayed_jobs_next_time = models.BooleanField(_('skip jobs if delayed'), default=True)
 
+    class Meta:
+        index_together = [
+            ('enabled', 'next_execution'),  # Due jobs lookup of the scheduler
+        ]
+
     def save(self, *args, **kwargs):
         self.next_execution = self.get_next_utc_execution()
         super(PeriodicJob, self).save(*args, **kwargs)
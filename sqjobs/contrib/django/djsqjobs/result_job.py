@@ -4,6 +4,7 @@ from six import add_metaclass
 from datetime import datetime
 
 from django.db import IntegrityError
+from django.utils import timezone
 
 from sqjobs import Job
 from sqjobs.contrib.django.djsqjobs.models import JobStatus
@@ -13,7 +14,14 @@ from sqjobs.contrib.django.djsqjobs.models import JobStatus
 class ResultJob(Job):
     """
     A job that stores the result of the execution in the DB
+
+    Class attributes:
+        * combine_writes: If True, the result and the final status are stored
+          in a single UPDATE (when the job succeeds or fails), and retries of
+          failed jobs don't load their status. It takes 2 queries per execution
+          instead of 3-4, but `job_status` only has the fields set by the job.
     """
+    combine_writes = False
 
     def __init__(self):
         self.properly_setup = False
@@ -39,10 +47,14 @@ class ResultJob(Job):
             self.job_status.save(force_insert=True)
             self.properly_setup = True
         except IntegrityError:
+            if self.combine_writes:
+                self._retry_failed_status(task_id)
+                return
+
             self.job_status = JobStatus.objects.get(job_id=task_id)
             if self.job_status.status == JobStatus.FAILURE:
                 self.job_status.status = JobStatus.PENDING
-                self.job_status.save()
+                self.job_status.save(update_fields=['status', 'updated_at'])
                 self.properly_setup = True
             else:
                 self.repeated_task = True
@@ -50,18 +62,46 @@ class ResultJob(Job):
     def post_run(self, *args, **kwargs):
         self.job_status.date_done = datetime.now()
         self.job_status.result = json.dumps(self.result)
-        self.job_status.save(force_update=True)
+
+        if not self.combine_writes:  # Stored with the final status
+            self.job_status.save(update_fields=['result', 'updated_at'])
+
         super(ResultJob, self).post_run(*args, **kwargs)
 
     def on_success(self, *args, **kwargs):
         if not self.repeated_task:
             self.job_status.status = JobStatus.SUCCESS
-            self.job_status.save(force_update=True)
+            self._save_final_status()
             super(ResultJob, self).on_success(*args, **kwargs)
 
     def on_failure(self):
         if not self.repeated_task:
             if self.properly_setup:
                 self.job_status.status = JobStatus.FAILURE
-                self.job_status.save(force_update=True)
+                self._save_final_status()
             super(ResultJob, self).on_failure()
+
+    def _retry_failed_status(self, task_id):
+        """
+        Sets back to PENDING the status of a failed job, without loading it
+        """
+        updated = JobStatus.objects.filter(job_id=task_id, status=JobStatus.FAILURE).update(
+            status=JobStatus.PENDING,
+            updated_at=timezone.now(),
+        )
+
+        self.job_status.status = JobStatus.PENDING
+        self.properly_setup = bool(updated)
+        self.repeated_task = not updated
+
+    def _save_final_status(self):
+        if not self.combine_writes:
+            self.job_status.save(update_fields=['status', 'updated_at'])
+            return
+
+        fields = {'status': self.job_status.status, 'updated_at': timezone.now()}
+
+        if self.job_status.result:
+            fields['result'] = self.job_status.result
+
+        JobStatus.objects.filter(job_id=self.job_status.job_id).update(**fields)
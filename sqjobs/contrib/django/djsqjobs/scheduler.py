@@ -0,0 +1,198 @@
+import heapq
+import json
+import signal
+import threading
+from datetime import datetime
+
+import pytz
+from django.db import close_old_connections, transaction
+
+from sqjobs.job import Job
+from sqjobs.contrib.django.djsqjobs.models import PeriodicJob
+
+import logging
+logger = logging.getLogger('sqjobs.scheduler')
+
+
+class Scheduler(object):
+    """
+    Adds the periodic jobs to the broker when their next execution is due.
+
+    The next executions of the enabled periodic jobs are kept in a min-heap,
+    so the scheduler sleeps until the next one instead of polling the database.
+    The heap is loaded again every `max_sleep` seconds, to find the periodic
+    jobs added or changed by others.
+
+    Due periodic jobs are locked (SELECT ... FOR UPDATE) while they are added
+    and their next execution is updated, so several schedulers can run at the
+    same time without adding the same job twice.
+    """
+    DEFAULT_MAX_SLEEP = 60  # seconds
+    DEFAULT_BATCH_SIZE = 100  # jobs
+    ERROR_SLEEP = 5  # seconds
+
+    def __init__(self, broker, jobs=None, default_queue_name=None, max_sleep=None, batch_size=None):
+        """
+        Creates a new scheduler
+
+        :param broker: the broker where the jobs are added
+        :param jobs: job classes, used to know the queue of every periodic job
+        :param default_queue_name: queue of the periodic jobs whose class is unknown
+        :param max_sleep: maximum time (in seconds) between two loads of the next executions
+        :param batch_size: maximum number of periodic jobs locked and added at the same time
+        """
+        self.broker = broker
+        self.queue_names = dict((job._task_name(), job.default_queue_name) for job in jobs or [])
+        self.default_queue_name = default_queue_name or Job.default_queue_name
+        self.max_sleep = max_sleep or self.DEFAULT_MAX_SLEEP
+        self.batch_size = batch_size or self.DEFAULT_BATCH_SIZE
+
+        self._heap = []  # (next execution, periodic job id)
+        self._loaded_at = None
+        self._stopped = threading.Event()
+
+    def __repr__(self):
+        return 'Scheduler({broker!r})'.format(broker=self.broker)
+
+    def run(self):
+        logger.info('Running scheduler...')
+
+        signal.signal(signal.SIGINT, self._exit_gracefully)
+        signal.signal(signal.SIGTERM, self._exit_gracefully)
+
+        while not self._stopped.is_set():
+            try:
+                self.tick()
+            except Exception:
+                # Lost connections, throttling, deadlocks... Try again later
+                logger.exception('Error adding the periodic jobs')
+                close_old_connections()
+                self._stopped.wait(min(self.ERROR_SLEEP, self.max_sleep))
+                continue
+
+            self._stopped.wait(self.time_to_next_execution())
+
+    def stop(self):
+        self._stopped.set()
+
+    def tick(self, now=None):
+        """
+        Adds the due periodic jobs and updates the heap of next executions
+
+        :return: number of jobs added
+        """
+        now = now or utc_now()
+
+        if self._loaded_at is None or (now - self._loaded_at).total_seconds() >= self.max_sleep:
+            self.load(now)
+
+        if not self._heap or self._heap[0][0] > now:
+            return 0
+
+        while self._heap and self._heap[0][0] <= now:
+            heapq.heappop(self._heap)
+
+        added = 0
+
+        while True:
+            fired = self.add_due_jobs(now)
+            added += len(fired)
+
+            for periodic_job in fired:
+                heapq.heappush(self._heap, (periodic_job.next_execution, periodic_job.pk))
+
+            if len(fired) < self.batch_size:
+                return added
+
+    def load(self, now=None):
+        """
+        Loads the next executions of all the enabled periodic jobs
+        """
+        self._heap = list(
+            PeriodicJob.objects.filter(enabled=True).values_list('next_execution', 'pk')
+        )
+        heapq.heapify(self._heap)
+        self._loaded_at = now or utc_now()
+
+        logger.debug('%d periodic jobs loaded', len(self._heap))
+
+    def time_to_next_execution(self, now=None):
+        """
+        Time (in seconds) until the next execution, or the next load of the heap
+        """
+        now = now or utc_now()
+        wait = self.max_sleep - (now - (self._loaded_at or now)).total_seconds()
+
+        if self._heap:
+            wait = min(wait, (self._heap[0][0] - now).total_seconds())
+
+        return max(0, wait)
+
+    def add_due_jobs(self, now=None):
+        """
+        Adds (in a single batch) the due periodic jobs and updates their next execution
+
+        :return: list of the periodic jobs added
+        """
+        now = now or utc_now()
+
+        with transaction.atomic():
+            due = list(
+                PeriodicJob.objects.select_for_update()
+                .filter(enabled=True, next_execution__lte=now)
+                .order_by('next_execution')[:self.batch_size]
+            )
+
+            if not due:
+                return []
+
+            jobs = [
+                (periodic_job.task, self._queue_name(periodic_job), loads(periodic_job.args, []),
+                 loads(periodic_job.kwargs, {}))
+                for periodic_job in due
+            ]
+
+            try:
+                results = self.broker.add_jobs_by_name(jobs)
+                errors = [getattr(result, 'error', None) for result in results]
+            except Exception as e:
+                logger.exception('Error adding %d periodic jobs', len(due))
+                errors = [str(e)] * len(due)
+
+            fired = []
+
+            for periodic_job, error in zip(due, errors):
+                if error:
+                    logger.error('Periodic job %s could not be added: %s', periodic_job.name, error)
+                    continue
+
+                try:
+                    # In its own savepoint, so the next executions of the others are saved
+                    with transaction.atomic():
+                        periodic_job.save()  # Calculates its next execution
+                except Exception:
+                    logger.exception(
+                        'Error updating the next execution of periodic job %s', periodic_job.name
+                    )
+                    continue
+
+                fired.append(periodic_job)
+
+        logger.info('%d periodic jobs added', len(fired))
+
+        return fired
+
+    def _queue_name(self, periodic_job):
+        return self.queue_names.get(periodic_job.task, self.default_queue_name)
+
+    def _exit_gracefully(self, signum, frame):
+        logger.info('Shutting down the scheduler...')
+        self.stop()
+
+
+def loads(value, default):
+    return json.loads(value) if value else default
+
+
+def utc_now():
+    return datetime.now(pytz.utc)
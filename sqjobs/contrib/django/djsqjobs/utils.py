@@ -1,14 +1,61 @@
+import os
+import threading
+
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.dispatch import receiver
 
 from sqjobs import create_sqs_broker, create_sqs_worker
 
+import logging
+logger = logging.getLogger('sqjobs.django')
+
+
+_broker = None
+_broker_pid = None
+_broker_lock = threading.Lock()
+
 
 def get_broker():
+    """
+    Returns the broker of the current process. It's created the first time
+    it's needed, and created again in forked processes.
+    """
+    global _broker, _broker_pid
+
+    with _broker_lock:
+        if _broker is None or _broker_pid != os.getpid():
+            _broker = create_broker()
+            _broker_pid = os.getpid()
+
+        return _broker
+
+
+def reset_broker():
+    """
+    Forgets the broker of the current process, so a new one is created
+    with the current settings the next time it's needed
+    """
+    global _broker
+
+    with _broker_lock:
+        _broker = None
+
+
+@receiver(setting_changed)
+def _reset_broker_on_setting_changed(setting, **kwargs):
+    if setting.startswith('SQJOBS_'):
+        reset_broker()
+
+
+def create_broker():
     return create_sqs_broker(
         access_key=settings.SQJOBS_SQS_ACCESS_KEY,
         secret_key=settings.SQJOBS_SQS_SECRET_KEY,
         region_name=settings.SQJOBS_SQS_REGION_NAME,
         endpoint_url=getattr(settings, 'SQJOBS_SQS_ENDPOINT_URL', None),
+        connection_options=getattr(settings, 'SQJOBS_SQS_CONNECTION_OPTIONS', None),
     )
 
 
@@ -22,5 +69,120 @@ def get_worker(queue_name):
     )
 
 
+def get_scheduler():
+    from .finders import get_all_jobs
+    from .scheduler import Scheduler  # It needs the models
+
+    return Scheduler(
+        get_broker(),
+        jobs=get_all_jobs(),
+        default_queue_name=getattr(settings, 'SQJOBS_SCHEDULER_DEFAULT_QUEUE', None),
+    )
+
+
 def add_job(job_class, *args, **kwargs):
-    get_broker().add_job(job_class, *args, **kwargs)
+    """
+    Adds a new job. If the SQJOBS_ENQUEUE_ON_COMMIT setting is enabled, it's
+    deferred until the current transaction is committed (see `add_job_on_commit`).
+    """
+    if getattr(settings, 'SQJOBS_ENQUEUE_ON_COMMIT', False):
+        return add_job_on_commit(job_class, *args, **kwargs)
+
+    return get_broker().add_job(job_class, *args, **kwargs)
+
+
+def add_job_on_commit(job_class, *args, **kwargs):
+    """
+    Adds a new job when the current transaction is committed. All the jobs
+    added in the same transaction are sent in batches when it's committed,
+    and discarded if it's rolled back (or if the savepoint where they were
+    added is rolled back).
+
+    Outside of a transaction, the job is added immediately.
+
+    :param using: alias of the database of the transaction (the default one by default)
+    :return: the result of the job if it's added immediately, None if it's deferred
+    """
+    using = kwargs.pop('using', None) or DEFAULT_DB_ALIAS
+    connection = transaction.get_connection(using)
+
+    if not connection.in_atomic_block:
+        return get_broker().add_job(job_class, *args, **kwargs)
+
+    batch = _current_batch(connection, using)
+    job = _DeferredJob(batch, job_class, args, kwargs)
+    batch.jobs.append(job)
+
+    # Every job is a commit hook too, in case its batch is never sent (see `_DeferredJob`)
+    transaction.on_commit(job, using=using)
+
+
+_batches = threading.local()  # database alias -> {savepoint ids: batch of the jobs added there}
+
+
+def _current_batch(connection, using):
+    """
+    Returns the batch of the jobs added in the current savepoint (or in the
+    transaction, outside of savepoints). Every batch is a commit hook of its
+    savepoint, so Django discards it if the savepoint is rolled back.
+    """
+    savepoint_ids = tuple(connection.savepoint_ids)
+    batches = _batches.__dict__.setdefault(using, {})
+
+    # Savepoint ids are never reused, so the batches of the savepoints that have been
+    # exited are not needed anymore (Django keeps the hooks of the released ones)
+    for key in [key for key in batches if savepoint_ids[:len(key)] != key]:
+        del batches[key]
+
+    batch = batches.get(savepoint_ids)
+
+    if batch is None or batch.sent:
+        batch = batches[savepoint_ids] = _DeferredBatch()
+        transaction.on_commit(batch, using=using)
+
+    return batch
+
+
+class _DeferredJob(object):
+    """
+    Commit hook of a job added with `add_job_on_commit`. Its batch is registered
+    before it in the same savepoint, so it has been sent when this hook is called.
+
+    If not, the batch was created in a transaction that was rolled back (its hook
+    was discarded, but it was left in `_batches`), so the job is sent alone and the
+    batch is forgotten.
+    """
+
+    def __init__(self, batch, job_class, args, kwargs):
+        self.batch = batch
+        self.job = (job_class, args, kwargs)
+
+    def __call__(self):
+        if self.batch.sent:
+            return
+
+        for batches in _batches.__dict__.values():
+            for key, batch in list(batches.items()):
+                if batch is self.batch:
+                    del batches[key]
+
+        get_broker().add_jobs([self.job])
+
+
+class _DeferredBatch(object):
+    """
+    Commit hook that sends the jobs added in a savepoint (or in a transaction), in a batch
+    """
+
+    def __init__(self):
+        self.jobs = []  # `_DeferredJob` hooks
+        self.sent = False
+
+    def __call__(self):
+        self.sent = True
+
+        if not self.jobs:
+            return
+
+        logger.debug('Sending %d jobs added in the committed transaction', len(self.jobs))
+        get_broker().add_jobs([job.job for job in self.jobs])
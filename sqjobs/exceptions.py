@@ -14,3 +14,27 @@ class QueueDoesNotExist(SQJobsException):
     """
     A queue does not exist in the broker
     """
+
+
+class BufferFull(SQJobsException):
+    """
+    There's no room for more jobs in the buffer of a broker
+    """
+
+
+class JobFailed(SQJobsException):
+    """
+    A job whose result was requested has failed
+    """
+
+
+class ResultTimeout(SQJobsException):
+    """
+    The result of a job was not available in time
+    """
+
+
+class CircuitOpen(SQJobsException):
+    """
+    The circuit breaker of a connector is open, so the broker is not called
+    """
@@ -0,0 +1,186 @@
+import threading
+import time
+
+import logging
+logger = logging.getLogger('sqjobs.flusher')
+
+
+class Flusher(object):
+    """
+    Collects the deletions and the retry time changes of messages and sends
+    them to the connector in batches.
+
+    A batch is sent when it reaches `max_size` entries, when its oldest entry
+    has been waiting for `max_delay` seconds (only if the flusher has been
+    started) or when the flusher is closed. Entries reported as failed by
+    the connector are retried up to `max_attempts` times.
+    """
+    DEFAULT_MAX_SIZE = 10
+    DEFAULT_MAX_DELAY = 1  # seconds
+    DEFAULT_MAX_ATTEMPTS = 3
+
+    DELETE = 'delete'
+    RETRY_TIME = 'retry_time'
+
+    def __init__(self, connector, max_size=None, max_delay=None, max_attempts=None):
+        """
+        Creates a new flusher
+
+        :param connector: connector where the batches will be sent
+        :param max_size: maximum number of entries of every batch
+        :param max_delay: maximum time (in seconds) that an entry waits to be sent
+        :param max_attempts: how many times an entry is sent before giving up
+        """
+        self.connector = connector
+        self.max_size = max_size or self.DEFAULT_MAX_SIZE
+        self.max_delay = max_delay or self.DEFAULT_MAX_DELAY
+        self.max_attempts = max_attempts or self.DEFAULT_MAX_ATTEMPTS
+
+        self._pending = {}  # (action, queue_name) -> [(entry, attempts), ...]
+        self._deadlines = {}  # (action, queue_name) -> time
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def __repr__(self):
+        return 'Flusher({connector})'.format(
+            connector=type(self.connector).__name__
+        )
+
+    def delete(self, queue_name, message_id):
+        """
+        Schedules the deletion of a message
+
+        :param queue_name: the name of the queue
+        :param message_id: the message id
+        """
+        self._add((self.DELETE, queue_name), [(message_id, 0)])
+
+    def set_retry_time(self, queue_name, message_id, delay):
+        """
+        Schedules the change of the retry time of a message
+
+        :param queue_name: the name of the queue
+        :param message_id: the message id
+        :param delay: delay (in seconds) when the next retry will be attempted
+        """
+        self._add((self.RETRY_TIME, queue_name), [((message_id, delay), 0)])
+
+    def pending(self):
+        """
+        Number of entries waiting to be sent
+        """
+        with self._condition:
+            return sum(len(entries) for entries in self._pending.values())
+
+    def start(self):
+        """
+        Starts a background thread that sends the batches when their deadline expires
+        """
+        if self._thread is None:
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, name='sqjobs-flusher')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def flush(self):
+        """
+        Sends all the pending entries right now (retrying the failed ones)
+        """
+        while True:
+            with self._condition:
+                keys = list(self._pending.keys())
+
+            if not keys:
+                return
+
+            for key in keys:
+                self._send(key, self._pop(key))
+
+    def close(self):
+        """
+        Stops the background thread and sends all the pending entries
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self.flush()
+
+    def _add(self, key, entries):
+        with self._condition:
+            pending = self._pending.setdefault(key, [])
+            pending.extend(entries)
+
+            if key not in self._deadlines:
+                self._deadlines[key] = time.time() + self.max_delay
+                self._condition.notify_all()
+
+            full = len(pending) >= self.max_size
+
+        if full:
+            self._send(key, self._pop(key))
+
+    def _pop(self, key):
+        with self._condition:
+            self._deadlines.pop(key, None)
+            return self._pending.pop(key, [])
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._closed:
+                    return
+
+                now = time.time()
+                expired = [key for key, deadline in self._deadlines.items() if deadline <= now]
+
+                if not expired:
+                    timeout = min(self._deadlines.values()) - now if self._deadlines else None
+                    self._condition.wait(timeout)
+                    continue
+
+            for key in expired:
+                self._send(key, self._pop(key))
+
+    def _send(self, key, pending):
+        action, queue_name = key
+
+        for i in range(0, len(pending), self.max_size):
+            chunk = pending[i:i + self.max_size]
+            entries = [entry for entry, _ in chunk]
+
+            try:
+                if action == self.DELETE:
+                    failed = self.connector.delete_batch(queue_name, entries)
+                else:
+                    failed = self.connector.set_retry_time_batch(queue_name, entries)
+            except Exception:
+                logger.exception(
+                    'Error sending a batch of %d entries to %s', len(entries), queue_name
+                )
+                failed = entries
+
+            self._retry(key, chunk, failed)
+
+    def _retry(self, key, chunk, failed):
+        retries = []
+
+        for entry, attempts in chunk:
+            if entry not in failed:
+                continue
+
+            if attempts + 1 < self.max_attempts:
+                retries.append((entry, attempts + 1))
+            else:
+                logger.error('Giving up %s of %s in %s', key[0], entry, key[1])
+
+        if retries:
+            with self._condition:
+                self._pending.setdefault(key, []).extend(retries)
+                self._deadlines.setdefault(key, time.time() + self.max_delay)
+                self._condition.notify_all()
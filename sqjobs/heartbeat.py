@@ -0,0 +1,118 @@
+import threading
+
+import logging
+logger = logging.getLogger('sqjobs.heartbeat')
+
+
+class Heartbeat(object):
+    """
+    Extends periodically the visibility timeout of the messages of the running
+    jobs, so they are not delivered again while they are being processed.
+
+    The messages of all the running jobs of a queue are extended in a
+    single batch call every `interval` seconds.
+    """
+
+    def __init__(self, connector, interval, visibility_timeout=None):
+        """
+        Creates a new heartbeat
+
+        :param connector: connector used to change the visibility of the messages
+        :param interval: time (in seconds) between heartbeats
+        :param visibility_timeout: new visibility timeout (in seconds) of the messages
+         in every heartbeat. By default, three times the interval.
+        """
+        self.connector = connector
+        self.interval = interval
+        self.visibility_timeout = visibility_timeout or interval * 3
+
+        self._jobs = {}  # (queue name, broker id) -> job
+        self._extending = set()  # (queue name, broker id) of the heartbeat being sent
+        self._lock = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __repr__(self):
+        return 'Heartbeat({interval}s)'.format(interval=self.interval)
+
+    def add(self, job):
+        """
+        Starts extending the visibility of the message of a job
+        """
+        with self._lock:
+            self._jobs[(job.queue_name, job.broker_id)] = job
+
+    def remove(self, job):
+        """
+        Stops extending the visibility of the message of a job. If a heartbeat
+        is being sent, it waits until it finishes, so the visibility of the
+        message can be safely changed after calling this method.
+        """
+        key = (job.queue_name, job.broker_id)
+
+        with self._lock:
+            self._jobs.pop(key, None)
+
+            while key in self._extending:
+                self._lock.wait()
+
+    def running_jobs(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def beat(self):
+        """
+        Extends the visibility of the messages of all the running jobs
+        """
+        with self._lock:
+            keys = list(self._jobs)
+            self._extending.update(keys)
+
+        # The connector is called without the lock, so jobs can be added meanwhile
+        try:
+            queues = {}
+
+            for queue_name, broker_id in keys:
+                queues.setdefault(queue_name, []).append((broker_id, self.visibility_timeout))
+
+            for queue_name, entries in queues.items():
+                try:
+                    failed = self.connector.set_retry_time_batch(queue_name, entries)
+                except Exception:
+                    logger.exception('Error extending the visibility of %d messages', len(entries))
+                    continue
+
+                if failed:
+                    logger.warning(
+                        'Visibility of %d messages of %s not extended', len(failed), queue_name
+                    )
+
+                logger.debug('Visibility of %d messages of %s extended', len(entries), queue_name)
+        finally:
+            with self._lock:
+                self._extending.difference_update(keys)
+                self._lock.notify_all()
+
+    def start(self):
+        """
+        Starts a background thread that sends the heartbeats
+        """
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='sqjobs-heartbeat')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def close(self):
+        """
+        Stops the background thread
+        """
+        self._stopped.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.beat()
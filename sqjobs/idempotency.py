@@ -0,0 +1,253 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import six
+
+import logging
+logger = logging.getLogger('sqjobs.idempotency')
+
+
+class IdempotencyStore(object):
+    """
+    Remembers the jobs that have been executed, so the workers don't execute
+    twice the messages delivered more than once.
+
+    Jobs are claimed before being executed. A claim lasts `running_ttl` seconds
+    while the job runs (so a duplicate isn't executed at the same time), and
+    `ttl` seconds once the job has been executed. Claims of jobs that fail are
+    released, so they can be retried.
+    """
+    CLAIMED = 'CLAIMED'  # The job can be executed
+    RUNNING = 'RUNNING'  # The job is being executed
+    DONE = 'DONE'  # The job has been executed
+
+    DEFAULT_TTL = 24 * 60 * 60  # seconds
+    DEFAULT_RUNNING_TTL = 60 * 60  # seconds
+
+    def __init__(self, ttl=None, running_ttl=None):
+        """
+        Creates a new idempotency store
+
+        :param ttl: time (in seconds) that executed jobs are remembered
+        :param running_ttl: maximum time (in seconds) that a job is considered to be running
+        """
+        self.ttl = ttl or self.DEFAULT_TTL
+        self.running_ttl = running_ttl or self.DEFAULT_RUNNING_TTL
+
+    def claim(self, key):
+        """
+        Claims the execution of a job (atomically)
+
+        :param key: the deduplication key of the job
+        :return: CLAIMED if the job can be executed, or RUNNING or DONE if it was
+         already claimed
+        """
+        raise NotImplementedError
+
+    def complete(self, key):
+        """
+        Marks a claimed job as executed
+
+        :param key: the deduplication key of the job
+        """
+        raise NotImplementedError
+
+    def release(self, key):
+        """
+        Releases the claim of a job, so it can be executed again
+
+        :param key: the deduplication key of the job
+        """
+        raise NotImplementedError
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """
+    Remembers the last `max_size` jobs executed by the current process
+    """
+    DEFAULT_MAX_SIZE = 100000  # jobs
+
+    def __init__(self, ttl=None, running_ttl=None, max_size=None):
+        super(InMemoryIdempotencyStore, self).__init__(ttl, running_ttl)
+
+        self.max_size = max_size or self.DEFAULT_MAX_SIZE
+
+        self._claims = OrderedDict()  # key -> (state, expiration time), least recently used first
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'InMemoryIdempotencyStore(max_size={max_size})'.format(max_size=self.max_size)
+
+    def claim(self, key):
+        now = time.time()
+
+        with self._lock:
+            state, expires_at = self._claims.pop(key, (None, 0))
+
+            if expires_at < now:
+                state, expires_at = self.CLAIMED, now + self.running_ttl
+
+            self._claims[key] = (self.RUNNING if state == self.CLAIMED else state, expires_at)
+
+            while len(self._claims) > self.max_size:
+                self._claims.popitem(last=False)
+
+        return state
+
+    def complete(self, key):
+        with self._lock:
+            self._claims.pop(key, None)
+            self._claims[key] = (self.DONE, time.time() + self.ttl)
+
+    def release(self, key):
+        with self._lock:
+            self._claims.pop(key, None)
+
+
+class SQLiteIdempotencyStore(IdempotencyStore):
+    """
+    Remembers the executed jobs in a SQLite database, shared by the workers of
+    the same machine. Expired claims are deleted at most once every `purge_interval` seconds.
+    """
+    DEFAULT_PURGE_INTERVAL = 60  # seconds
+
+    def __init__(self, path, ttl=None, running_ttl=None, purge_interval=None):
+        """
+        Creates a new SQLite idempotency store
+
+        :param path: path of the database file. It's created if it doesn't exist.
+        :param ttl: time (in seconds) that executed jobs are remembered
+        :param running_ttl: maximum time (in seconds) that a job is considered to be running
+        :param purge_interval: minimum time (in seconds) between two purges of expired claims
+        """
+        super(SQLiteIdempotencyStore, self).__init__(ttl, running_ttl)
+
+        self.path = path
+        self.purge_interval = purge_interval or self.DEFAULT_PURGE_INTERVAL
+
+        self._cached_connection = None
+        self._connection_pid = None
+        self._purged_at = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'SQLiteIdempotencyStore("{path}")'.format(path=self.path)
+
+    @property
+    def connection(self):
+        """
+        Creates (and saves in a cache) the connection to the database. A new one
+        is created in forked processes.
+        """
+        if self._cached_connection is None or self._connection_pid != os.getpid():
+            self._cached_connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            self._cached_connection.executescript(
+                'CREATE TABLE IF NOT EXISTS sqjobs_claims ('
+                '  key TEXT PRIMARY KEY, state TEXT NOT NULL, expires_at REAL NOT NULL'
+                ');'
+                'CREATE INDEX IF NOT EXISTS sqjobs_claims_expires_at ON sqjobs_claims (expires_at);'
+            )
+            self._connection_pid = os.getpid()
+
+        return self._cached_connection
+
+    def claim(self, key):
+        now = time.time()
+
+        with self._lock:
+            connection = self.connection
+            connection.execute('BEGIN IMMEDIATE')  # Other processes can't claim it at the same time
+
+            try:
+                row = connection.execute(
+                    'SELECT state FROM sqjobs_claims WHERE key = ? AND expires_at >= ?', (key, now)
+                ).fetchone()
+
+                if row is None:
+                    self._set(key, self.RUNNING, now + self.running_ttl)
+
+                if now - self._purged_at >= self.purge_interval:
+                    connection.execute('DELETE FROM sqjobs_claims WHERE expires_at < ?', (now,))
+                    self._purged_at = now
+
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+
+        return row[0] if row else self.CLAIMED
+
+    def complete(self, key):
+        with self._lock:
+            self._set(key, self.DONE, time.time() + self.ttl)
+
+    def release(self, key):
+        with self._lock:
+            self.connection.execute('DELETE FROM sqjobs_claims WHERE key = ?', (key,))
+
+    def _set(self, key, state, expires_at):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO sqjobs_claims (key, state, expires_at) VALUES (?, ?, ?)',
+            (key, state, expires_at)
+        )
+
+
+class RedisIdempotencyStore(IdempotencyStore):
+    """
+    Remembers the executed jobs in Redis (or any server that speaks its protocol).
+    Jobs are claimed with SET NX, and claims expire using the TTL of their keys.
+    """
+
+    def __init__(self, client, prefix='sqjobs:claim:', ttl=None, running_ttl=None):
+        """
+        Creates a new Redis idempotency store
+
+        :param client: a Redis client (like `redis.StrictRedis`)
+        :param prefix: prefix of the keys of the claims
+        :param ttl: time (in seconds) that executed jobs are remembered
+        :param running_ttl: maximum time (in seconds) that a job is considered to be running
+        """
+        super(RedisIdempotencyStore, self).__init__(ttl, running_ttl)
+
+        self.client = client
+        self.prefix = prefix
+
+    def __repr__(self):
+        return 'RedisIdempotencyStore("{prefix}")'.format(prefix=self.prefix)
+
+    @classmethod
+    def from_url(cls, url, prefix='sqjobs:claim:', ttl=None, running_ttl=None):
+        """
+        Creates a new Redis idempotency store connected to `url`, like 'redis://localhost:6379/0'
+        (the redis package must be installed)
+        """
+        import redis
+
+        return cls(redis.StrictRedis.from_url(url), prefix=prefix, ttl=ttl, running_ttl=running_ttl)
+
+    def claim(self, key):
+        while True:
+            px = milliseconds(self.running_ttl)
+
+            if self.client.set(self.prefix + key, self.RUNNING, nx=True, px=px):
+                return self.CLAIMED
+
+            state = self.client.get(self.prefix + key)
+
+            if state is not None:  # Or it has just expired, try again
+                return state.decode('utf-8') if isinstance(state, six.binary_type) else state
+
+    def complete(self, key):
+        self.client.set(self.prefix + key, self.DONE, px=milliseconds(self.ttl))
+
+    def release(self, key):
+        self.client.delete(self.prefix + key)
+
+
+def milliseconds(seconds):
+    return max(1, int(seconds * 1000))
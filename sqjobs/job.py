@@ -1,7 +1,9 @@
+import time
 from abc import ABCMeta, abstractmethod
 from six import add_metaclass
 
-from .exceptions import RetryException
+from .exceptions import JobFailed, ResultTimeout, RetryException
+from .results import ResultBackend
 
 
 @add_metaclass(ABCMeta)
@@ -17,6 +19,9 @@ class Job(object):
         * abstract: Jobs marked as abstract will not be included by workers.
         * retry_time: Time (in seconds) used to define how long the message will be locked
           until other worker could retry the job. If None, it will use the queue's default value.
+        * max_retries: Maximum number of executions of the job. When the last one fails, the
+          job is given up: its message is deleted and its failure is stored. If None, failed
+          jobs are retried until the queue moves them to its dead-letter queue (if any).
 
     Object attributes:
         * id: Unique ID of the job.
@@ -24,11 +29,13 @@ class Job(object):
         * queue_name: Queue where the job has been added.
         * retries: How many retries has been done by the job.
         * created_on: When the job was enqueued for the first time.
+        * dedup_key: Key used to detect duplicated deliveries of the job (its ID by default).
     """
     name = None
     default_queue_name = 'sqjobs'
     abstract = False
     retry_time = None
+    max_retries = None
 
     def __init__(self):
         self.id = None
@@ -36,6 +43,7 @@ class Job(object):
         self.queue_name = None
         self.retries = 0
         self.created_on = None
+        self.dedup_key = None
 
     def __repr__(self):
         return '{0}()'.format(type(self).__name__)
@@ -72,6 +80,12 @@ class Job(object):
     def next_retry_time(self):
         return self.retry_time
 
+    def gives_up(self):
+        """
+        Returns True if a failure of the current execution is final (see `max_retries`)
+        """
+        return self.max_retries is not None and self.retries >= self.max_retries
+
     @classmethod
     def _task_name(cls):
         return cls.name or cls.__name__
@@ -84,10 +98,102 @@ class JobResult(object):
     Object attributes:
         * job_id: Unique ID of the job.
         * broker_id: Unique ID of the job given by the broker.
-        * result: Result of the execution (used by Eager mode).
+        * result: Result of the execution (used by Eager mode, or fetched by `get`).
+        * error: Why the job could not be added to the broker (None if it was added).
+        * status: SUCCESS or FAILURE once the job has finished (None until it's known). It's
+          RETRY while a failed job is going to be retried, with its last error as `result`.
+        * backend: Result backend where the result of the execution is stored.
     """
+    DEFAULT_INTERVAL = 0.1  # seconds
 
     def __init__(self):
         self.job_id = None
         self.broker_id = None
         self.result = None
+        self.error = None
+        self.status = None
+        self.backend = None
+
+    def ready(self):
+        """
+        Returns True if the job has finished (successfully or not)
+        """
+        if not self._finished():
+            self._check_backend()
+            self._set(self.backend.fetch(self.job_id))
+
+        return self._finished()
+
+    def get(self, timeout=None, interval=None):
+        """
+        Waits for the result of the job, polling the result backend
+
+        :param timeout: maximum time (in seconds) to wait (forever if None)
+        :param interval: time (in seconds) between two polls
+        :return: the result of the job
+        :raises JobFailed: if the job failed
+        :raises ResultTimeout: if the job has not finished after `timeout` seconds
+        """
+        return self.get_many([self], timeout=timeout, interval=interval)[0]
+
+    @staticmethod
+    def get_many(results, timeout=None, interval=None):
+        """
+        Waits for the results of several jobs. The pending results of every result
+        backend are fetched in a single call every poll.
+
+        :param results: list of job results
+        :param timeout: maximum time (in seconds) to wait (forever if None)
+        :param interval: time (in seconds) between two polls
+        :return: list with the result of every job
+        :raises JobFailed: if any of the jobs failed
+        :raises ResultTimeout: if any of the jobs has not finished after `timeout` seconds
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        interval = interval or JobResult.DEFAULT_INTERVAL
+
+        while True:
+            pending = [result for result in results if not result._finished()]
+
+            for result in pending:
+                result._check_backend()
+
+            for backend in set(result.backend for result in pending):
+                fetched = backend.fetch_many([
+                    result.job_id for result in pending if result.backend is backend
+                ])
+
+                for result in pending:
+                    if result.backend is backend:
+                        result._set(fetched.get(result.job_id))
+
+            pending = [result for result in pending if not result._finished()]
+
+            if not pending:
+                break
+
+            if deadline is not None and time.time() + interval > deadline:
+                raise ResultTimeout('%d jobs have not finished' % len(pending))
+
+            time.sleep(interval)
+
+        for result in results:
+            if result.status == ResultBackend.FAILURE:
+                raise JobFailed('Job {job_id} failed: {error}'.format(
+                    job_id=result.job_id, error=result.result
+                ))
+
+        return [result.result for result in results]
+
+    def _finished(self):
+        return self.status in (ResultBackend.SUCCESS, ResultBackend.FAILURE)
+
+    def _check_backend(self):
+        if self.backend is None:
+            raise RuntimeError(
+                'The result of job %s is not stored, the broker has no result backend' % self.job_id
+            )
+
+    def _set(self, fetched):
+        if fetched is not None:
+            self.status, self.result = fetched
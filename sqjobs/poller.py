@@ -0,0 +1,119 @@
+import time
+
+import logging
+logger = logging.getLogger('sqjobs.poller')
+
+
+class QueuePoller(object):
+    """
+    Decides which queue must be polled next when consuming from several queues.
+
+    Queues are polled using a smooth weighted round-robin (or in strict order
+    if `strict_priority` is set). Every empty receive makes the queue idle for an
+    exponentially growing time (up to `max_backoff` seconds), so idle queues are
+    not polled again until then. Queues are short-polled while other queues have
+    work, and long-polled when there's nothing else to do.
+    """
+    DEFAULT_MAX_BACKOFF = 20  # seconds
+
+    def __init__(self, queues, strict_priority=False, max_backoff=None):
+        """
+        Creates a new poller
+
+        :param queues: list of queue names, or (queue name, weight) tuples
+        :param strict_priority: poll always the first queue with work (in the given order)
+        :param max_backoff: maximum time (in seconds) that an idle queue is not polled
+        """
+        self.queues = []
+        self.weights = {}
+
+        for queue in queues:
+            name, weight = queue if isinstance(queue, (list, tuple)) else (queue, 1)
+            self.queues.append(name)
+            self.weights[name] = weight
+
+        self.strict_priority = strict_priority
+        self.max_backoff = max_backoff or self.DEFAULT_MAX_BACKOFF
+
+        self._current = dict((name, 0) for name in self.queues)
+        self._idle_until = dict((name, 0) for name in self.queues)
+        self._empty_receives = dict((name, 0) for name in self.queues)
+
+    def __repr__(self):
+        return 'QueuePoller({queues})'.format(queues=', '.join(self.queues))
+
+    def next_queue(self, timeout, now=None):
+        """
+        Returns the next queue to poll and how long (in seconds) it must be polled
+
+        :param timeout: maximum long polling time
+        """
+        now = time.time() if now is None else now
+        active = [name for name in self.queues if self._idle_until[name] <= now]
+
+        if not active:
+            # Nothing to do: long poll the queue that will be active sooner
+            queue_name = min(self.queues, key=lambda name: self._idle_until[name])
+            return queue_name, self._wait_time(queue_name, timeout, now)
+
+        if self.strict_priority:
+            queue_name = active[0]
+        else:
+            queue_name = self._weighted_choice(active)
+
+        if len(active) > 1:
+            return queue_name, 0  # Other queues have work, don't block
+
+        return queue_name, self._wait_time(queue_name, timeout, now)
+
+    def idle_time(self, queue_name, now=None):
+        """
+        Time (in seconds) until an idle queue is polled again (zero if it's active)
+
+        :param queue_name: the name of the queue
+        """
+        now = time.time() if now is None else now
+        return max(0, self._idle_until[queue_name] - now)
+
+    def report(self, queue_name, received, now=None):
+        """
+        Reports the number of messages retrieved from a queue
+
+        :param queue_name: the name of the queue
+        :param received: number of messages retrieved
+        """
+        now = time.time() if now is None else now
+
+        if received:
+            self._empty_receives[queue_name] = 0
+            self._idle_until[queue_name] = 0
+            return
+
+        self._empty_receives[queue_name] += 1
+        backoff = min(self.max_backoff, 2 ** (self._empty_receives[queue_name] - 1))
+        self._idle_until[queue_name] = now + backoff
+
+        logger.debug('Queue %s is idle, next poll in %d seconds', queue_name, backoff)
+
+    def _weighted_choice(self, active):
+        total = 0
+
+        for name in active:
+            self._current[name] += self.weights[name]
+            total += self.weights[name]
+
+        queue_name = max(active, key=lambda name: self._current[name])
+        self._current[queue_name] -= total
+
+        return queue_name
+
+    def _wait_time(self, queue_name, timeout, now):
+        """
+        Long poll time of a queue, without delaying the next poll of the other queues
+        """
+        others = [self._idle_until[name] for name in self.queues if name != queue_name]
+
+        if not others:
+            return timeout
+
+        return int(max(0, min(timeout, min(others) - now)))
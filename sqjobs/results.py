@@ -0,0 +1,280 @@
+import heapq
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import six
+
+from .serializers import json_formatter
+
+import logging
+logger = logging.getLogger('sqjobs.results')
+
+
+class ResultBackend(object):
+    """
+    Stores the results of the jobs executed by the workers, so the ones
+    who added them can wait for them (see `JobResult.get`).
+
+    Results are JSON encoded and they expire after `ttl` seconds.
+    """
+    SUCCESS = 'SUCCESS'
+    FAILURE = 'FAILURE'
+    RETRY = 'RETRY'  # The job failed, but it will be retried (not final)
+
+    DEFAULT_TTL = 24 * 60 * 60  # seconds
+
+    def __init__(self, ttl=None):
+        """
+        Creates a new result backend
+
+        :param ttl: time (in seconds) that the results are kept
+        """
+        self.ttl = ttl or self.DEFAULT_TTL
+
+    def store(self, job_id, status, value):
+        """
+        Stores the result of a job
+
+        :param job_id: the ID of the job
+        :param status: SUCCESS, FAILURE or RETRY
+        :param value: the result of the job (or the error, if it failed)
+        """
+        raise NotImplementedError
+
+    def fetch(self, job_id):
+        """
+        Returns the result of a job, as a (status, value) tuple, or None if
+        it's not available (the job has not finished or its result has expired)
+
+        :param job_id: the ID of the job
+        """
+        raise NotImplementedError
+
+    def fetch_many(self, job_ids):
+        """
+        Returns the available results of several jobs
+
+        :param job_ids: the IDs of the jobs
+        :return: dict with a (status, value) tuple per job ID with result
+        """
+        results = {}
+
+        for job_id in job_ids:
+            result = self.fetch(job_id)
+
+            if result is not None:
+                results[job_id] = result
+
+        return results
+
+    @staticmethod
+    def encode(status, value):
+        try:
+            return json.dumps({'status': status, 'value': value}, default=json_formatter)
+        except (TypeError, ValueError) as e:
+            # Stored as a failure, so the ones waiting for the result don't wait forever
+            logger.error('Result can not be encoded: %s', e)
+            return json.dumps({
+                'status': ResultBackend.FAILURE,
+                'value': 'The result can not be encoded: {error}'.format(error=e),
+            })
+
+    @staticmethod
+    def decode(data):
+        if isinstance(data, six.binary_type):
+            data = data.decode('utf-8')
+
+        result = json.loads(data)
+        return result['status'], result['value']
+
+
+class InMemoryResultBackend(ResultBackend):
+    """
+    Stores the results in the memory of the process. Useful for tests and
+    for workers running in threads of the same process.
+    """
+
+    def __init__(self, ttl=None):
+        super(InMemoryResultBackend, self).__init__(ttl)
+
+        self._results = {}  # job id -> (expiration time, encoded result)
+        self._expirations = []  # heap of (expiration time, job id)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'InMemoryResultBackend()'
+
+    def store(self, job_id, status, value):
+        data = self.encode(status, value)
+        now = time.time()
+
+        with self._lock:
+            self._purge(now)
+            self._results[job_id] = (now + self.ttl, data)
+            heapq.heappush(self._expirations, (now + self.ttl, job_id))
+
+    def fetch(self, job_id):
+        with self._lock:
+            expires_at, data = self._results.get(job_id, (0, None))
+
+        if expires_at < time.time():
+            return None
+
+        return self.decode(data)
+
+    def _purge(self, now):
+        while self._expirations and self._expirations[0][0] < now:
+            expires_at, job_id = heapq.heappop(self._expirations)
+
+            if self._results.get(job_id, (None,))[0] == expires_at:  # Not stored again
+                del self._results[job_id]
+
+
+class SQLiteResultBackend(ResultBackend):
+    """
+    Stores the results in a SQLite database, shared by the processes of the
+    same machine. Results are looked up by their primary key, and the expired
+    ones are deleted (using an index) at most once every `purge_interval` seconds.
+    """
+    DEFAULT_PURGE_INTERVAL = 60  # seconds
+    MAX_VARIABLES = 500  # SQLite limits the variables of every query
+
+    def __init__(self, path, ttl=None, purge_interval=None):
+        """
+        Creates a new SQLite result backend
+
+        :param path: path of the database file. It's created if it doesn't exist.
+        :param ttl: time (in seconds) that the results are kept
+        :param purge_interval: minimum time (in seconds) between two purges of expired results
+        """
+        super(SQLiteResultBackend, self).__init__(ttl)
+
+        self.path = path
+        self.purge_interval = purge_interval or self.DEFAULT_PURGE_INTERVAL
+
+        self._cached_connection = None
+        self._connection_pid = None
+        self._purged_at = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'SQLiteResultBackend("{path}")'.format(path=self.path)
+
+    @property
+    def connection(self):
+        """
+        Creates (and saves in a cache) the connection to the database. A new one
+        is created in forked processes.
+        """
+        if self._cached_connection is None or self._connection_pid != os.getpid():
+            self._cached_connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            self._cached_connection.executescript(
+                'CREATE TABLE IF NOT EXISTS sqjobs_results ('
+                '  job_id TEXT PRIMARY KEY, result TEXT NOT NULL, expires_at REAL NOT NULL'
+                ');'
+                'CREATE INDEX IF NOT EXISTS sqjobs_results_expires_at'
+                '  ON sqjobs_results (expires_at);'
+            )
+            self._connection_pid = os.getpid()
+
+        return self._cached_connection
+
+    def store(self, job_id, status, value):
+        data = self.encode(status, value)
+        now = time.time()
+
+        with self._lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO sqjobs_results (job_id, result, expires_at)'
+                ' VALUES (?, ?, ?)',
+                (job_id, data, now + self.ttl)
+            )
+
+            if now - self._purged_at >= self.purge_interval:
+                self.connection.execute('DELETE FROM sqjobs_results WHERE expires_at < ?', (now,))
+                self._purged_at = now
+
+    def fetch(self, job_id):
+        return self.fetch_many([job_id]).get(job_id)
+
+    def fetch_many(self, job_ids):
+        job_ids = list(job_ids)
+        results = {}
+        now = time.time()
+
+        with self._lock:
+            for i in range(0, len(job_ids), self.MAX_VARIABLES):
+                chunk = job_ids[i:i + self.MAX_VARIABLES]
+                rows = self.connection.execute(
+                    'SELECT job_id, result FROM sqjobs_results'
+                    ' WHERE job_id IN ({ids}) AND expires_at >= ?'.format(
+                        ids=', '.join('?' * len(chunk))
+                    ),
+                    chunk + [now]
+                ).fetchall()
+
+                results.update((job_id, self.decode(data)) for job_id, data in rows)
+
+        return results
+
+
+class RedisResultBackend(ResultBackend):
+    """
+    Stores the results in Redis (or any server that speaks its protocol).
+    Results expire using the TTL of their keys.
+    """
+
+    def __init__(self, client, prefix='sqjobs:result:', ttl=None):
+        """
+        Creates a new Redis result backend
+
+        :param client: a Redis client (like `redis.StrictRedis`)
+        :param prefix: prefix of the keys of the results
+        :param ttl: time (in seconds) that the results are kept
+        """
+        super(RedisResultBackend, self).__init__(ttl)
+
+        self.client = client
+        self.prefix = prefix
+
+    def __repr__(self):
+        return 'RedisResultBackend("{prefix}")'.format(prefix=self.prefix)
+
+    @classmethod
+    def from_url(cls, url, prefix='sqjobs:result:', ttl=None):
+        """
+        Creates a new Redis result backend connected to `url`, like 'redis://localhost:6379/0'
+        (the redis package must be installed)
+        """
+        import redis
+
+        return cls(redis.StrictRedis.from_url(url), prefix=prefix, ttl=ttl)
+
+    def store(self, job_id, status, value):
+        self.client.set(
+            self._key(job_id), self.encode(status, value), px=max(1, int(self.ttl * 1000))
+        )
+
+    def fetch(self, job_id):
+        data = self.client.get(self._key(job_id))
+        return self.decode(data) if data is not None else None
+
+    def fetch_many(self, job_ids):
+        job_ids = list(job_ids)
+
+        if not job_ids:
+            return {}
+
+        values = self.client.mget([self._key(job_id) for job_id in job_ids])
+
+        return dict(
+            (job_id, self.decode(data)) for job_id, data in zip(job_ids, values) if data is not None
+        )
+
+    def _key(self, job_id):
+        return self.prefix + job_id
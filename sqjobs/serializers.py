@@ -0,0 +1,269 @@
+import base64
+import json
+import zlib
+from datetime import date, datetime
+
+import six
+
+import logging
+logger = logging.getLogger('sqjobs.serializers')
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import lz4.frame as lz4
+except ImportError:  # pragma: no cover
+    lz4 = None
+
+
+SERIALIZERS = {}  # name -> serializer
+DECODERS = {}  # format -> serializer used to decode it
+COMPRESSORS = {}
+
+
+def json_formatter(obj):
+    """
+    Formats the objects that are not JSON serializable by default
+    """
+    if isinstance(obj, datetime):
+        return obj.strftime('%Y-%m-%d %H:%M:%S')
+    elif isinstance(obj, date):
+        return obj.strftime('%Y-%m-%d')
+
+    return None
+
+
+class Serializer(object):
+    """
+    Converts payloads to bytes and back.
+
+    Class attributes:
+        * name: Name of the serializer.
+        * format: Format of the serialized payloads, used to tag the messages. Payloads
+          are decoded with the last registered serializer of their format.
+        * binary: If True, the serialized payloads are not valid text.
+    """
+    name = None
+    format = None
+    binary = False
+
+    def dumps(self, payload):
+        raise NotImplementedError
+
+    def loads(self, data):
+        raise NotImplementedError
+
+
+class JSONSerializer(Serializer):
+    name = 'json'
+    format = 'json'
+
+    def dumps(self, payload):
+        return json.dumps(payload, default=json_formatter).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data.decode('utf-8'))
+
+
+class FastJSONSerializer(Serializer):
+    """
+    JSON serializer using orjson. Its output can be read by `JSONSerializer` and vice versa.
+    """
+    name = 'orjson'
+    format = 'json'
+
+    def dumps(self, payload):
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        return orjson.dumps(payload, default=json_formatter, option=options)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class MsgPackSerializer(Serializer):
+    name = 'msgpack'
+    format = 'msgpack'
+    binary = True
+
+    def dumps(self, payload):
+        return msgpack.packb(payload, default=json_formatter, use_bin_type=True)
+
+    def loads(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+
+class Compressor(object):
+    """
+    Compresses serialized payloads
+    """
+    name = None
+
+    def compress(self, data):
+        raise NotImplementedError
+
+    def decompress(self, data):
+        raise NotImplementedError
+
+
+class ZlibCompressor(Compressor):
+    name = 'zlib'
+
+    def compress(self, data):
+        return zlib.compress(data)
+
+    def decompress(self, data):
+        return zlib.decompress(data)
+
+
+class LZ4Compressor(Compressor):
+    name = 'lz4'
+
+    def compress(self, data):
+        return lz4.compress(data)
+
+    def decompress(self, data):
+        return lz4.decompress(data)
+
+
+def register_serializer(serializer):
+    SERIALIZERS[serializer.name] = serializer
+    DECODERS[serializer.format] = serializer
+
+
+def register_compressor(compressor):
+    COMPRESSORS[compressor.name] = compressor
+
+
+def get_serializer(name):
+    try:
+        return SERIALIZERS[name]
+    except KeyError:
+        raise ValueError('Unknown serializer: %s' % name)
+
+
+def get_decoder(format):
+    try:
+        return DECODERS[format]
+    except KeyError:
+        raise ValueError('Unknown serialization format: %s' % format)
+
+
+def get_compressor(name):
+    try:
+        return COMPRESSORS[name]
+    except KeyError:
+        raise ValueError('Unknown compressor: %s' % name)
+
+
+register_serializer(JSONSerializer())
+register_compressor(ZlibCompressor())
+
+if orjson is not None:
+    register_serializer(FastJSONSerializer())
+
+if msgpack is not None:
+    register_serializer(MsgPackSerializer())
+
+if lz4 is not None:
+    register_compressor(LZ4Compressor())
+
+
+class Codec(object):
+    """
+    Encodes payloads into message bodies (text) and back.
+
+    Every encoded message has a tag (like 'msgpack+zlib/b64') that describes how
+    it was encoded, so it can be decoded by any consumer independently of its
+    own codec. The default codec (JSON + base64) has no tag, to be compatible
+    with the messages sent by previous versions.
+    """
+    DEFAULT_COMPRESS_THRESHOLD = 1024  # bytes
+
+    def __init__(self, serializer='json', compression=None, compress_threshold=None, base64=True):
+        """
+        Creates a new codec
+
+        :param serializer: name of the serializer
+        :param compression: name of the compressor, if payloads must be compressed
+        :param compress_threshold: only payloads bigger than this size (in bytes) are compressed
+        :param base64: encode the messages in base64. Binary (and compressed)
+         messages are always encoded in base64.
+        """
+        self.serializer = get_serializer(serializer)
+        self.compressor = get_compressor(compression) if compression else None
+        self.compress_threshold = compress_threshold or self.DEFAULT_COMPRESS_THRESHOLD
+        self.base64 = base64
+
+    def __repr__(self):
+        return 'Codec({tag})'.format(tag=self._tag(self.compressor, self.base64))
+
+    def encode(self, payload):
+        """
+        Encodes a payload
+
+        :param payload: the payload to encode
+        :return: a tuple with the message body and its tag (None for the default encoding)
+        """
+        data = self.serializer.dumps(payload)
+        compressor, use_base64 = None, self.base64 or self.serializer.binary
+
+        if self.compressor and len(data) > self.compress_threshold:
+            compressor, use_base64 = self.compressor, True
+            data = compressor.compress(data)
+
+        if use_base64:
+            data = base64.b64encode(data)
+
+        return data.decode('utf-8'), self._tag(compressor, use_base64)
+
+    @staticmethod
+    def decode(body, tag=None):
+        """
+        Decodes a message body
+
+        :param body: the message body
+        :param tag: the tag of the message (None for the default encoding)
+        """
+        format, compressor_name, use_base64 = Codec._parse_tag(tag)
+        data = body.encode('utf-8') if isinstance(body, six.text_type) else body
+
+        if use_base64:
+            data = base64.b64decode(data)
+
+        if compressor_name:
+            data = get_compressor(compressor_name).decompress(data)
+
+        return get_decoder(format).loads(data)
+
+    def _tag(self, compressor, use_base64):
+        if self.serializer.format == 'json' and not compressor and use_base64:
+            return None  # Default encoding
+
+        tag = self.serializer.format
+
+        if compressor:
+            tag += '+' + compressor.name
+
+        if use_base64:
+            tag += '/b64'
+
+        return tag
+
+    @staticmethod
+    def _parse_tag(tag):
+        if not tag:
+            return 'json', None, True
+
+        use_base64 = tag.endswith('/b64')
+        tag = tag[:-len('/b64')] if use_base64 else tag
+        format, _, compressor_name = tag.partition('+')
+
+        return format, compressor_name or None, use_base64
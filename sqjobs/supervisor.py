@@ -0,0 +1,107 @@
+import errno
+import os
+import signal
+import time
+
+import logging
+logger = logging.getLogger('sqjobs.supervisor')
+
+
+class Supervisor(object):
+    """
+    Forks several worker processes and keeps them running.
+
+    The workers are created in the child processes by `worker_factory`, so
+    everything imported before calling `run` (like the jobs modules) is shared
+    with the parent. Children that exit (because they crashed or because they
+    reached their max jobs or max memory limits) are replaced by new ones.
+    """
+    MIN_CHILD_LIFETIME = 1  # seconds
+
+    def __init__(self, worker_factory, processes):
+        """
+        Creates a new supervisor
+
+        :param worker_factory: callable that returns a new worker, called in every child
+        :param processes: number of child processes
+        """
+        self.worker_factory = worker_factory
+        self.processes = processes
+        self.children = {}  # pid -> start time
+        self._shutting_down = False
+
+    def __repr__(self):
+        return 'Supervisor({processes})'.format(processes=self.processes)
+
+    def run(self):
+        logger.info('Running supervisor with %d processes...', self.processes)
+
+        signal.signal(signal.SIGINT, self._exit_gracefully)
+        signal.signal(signal.SIGTERM, self._exit_gracefully)
+
+        for _ in range(self.processes):
+            self._spawn()
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except OSError as e:
+                if e.errno == errno.EINTR:  # Python 2 doesn't retry interrupted calls
+                    continue
+                raise
+
+            started_on = self.children.pop(pid, None)
+
+            if started_on is None:
+                continue
+
+            if status:
+                logger.error('Worker %d died unexpectedly (status %d)', pid, status)
+            else:
+                logger.info('Worker %d finished', pid)
+
+            if self._shutting_down:
+                continue
+
+            if time.time() - started_on < self.MIN_CHILD_LIFETIME:
+                # Don't respawn crashing workers in a tight loop
+                time.sleep(self.MIN_CHILD_LIFETIME)
+
+            self._spawn()
+
+        logger.info('All the workers finished')
+
+    def _spawn(self):
+        pid = os.fork()
+
+        if pid:
+            logger.info('Started worker %d', pid)
+            self.children[pid] = time.time()
+            return pid
+
+        # Child process: it never returns
+        status = 0
+
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+            self.worker_factory().run()
+        except:
+            logger.exception('Error running the worker')
+            status = 1
+        finally:
+            os._exit(status)
+
+    def _exit_gracefully(self, signum, frame):
+        if self._shutting_down:
+            return
+
+        logger.info('Shutting down the supervisor...')
+        self._shutting_down = True
+
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
@@ -0,0 +1,185 @@
+import asyncio
+import threading
+
+import mock
+
+from sqjobs import Job, RetryException
+from ..aio import AsyncConnector, AsyncWorker
+from ..brokers.standard import Standard as StandardBroker
+from ..connectors.dummy import Dummy as DummyConnector
+from ..idempotency import InMemoryIdempotencyStore
+from .fixtures import Adder
+from .worker_test import payload
+
+
+class SleepyJob(Job):
+    name = 'sleepy'
+    running = 0
+    max_running = 0
+    finished = 0
+
+    async def run(self, seconds):
+        SleepyJob.running += 1
+        SleepyJob.max_running = max(SleepyJob.max_running, SleepyJob.running)
+        await asyncio.sleep(seconds)
+        SleepyJob.running -= 1
+
+    async def on_success(self):
+        SleepyJob.finished += 1
+
+    @classmethod
+    def reset(cls):
+        cls.running = cls.max_running = cls.finished = 0
+
+
+class BlockingHooksJob(Job):
+    name = 'blocking_hooks'
+    threads = []
+
+    async def run(self):
+        BlockingHooksJob.threads.append(threading.current_thread())
+
+    def on_success(self):
+        BlockingHooksJob.threads.append(threading.current_thread())
+
+
+class AsyncRetryJob(Job):
+    name = 'async_retry'
+    retry_time = 30
+
+    async def run(self):
+        raise RetryException
+
+
+def run_until_empty(worker):
+    connector = worker.broker.connector
+    dequeue_batch = connector.dequeue_batch
+
+    def dequeue_or_stop(queue_name, max_messages=10, wait_time=20):
+        payloads = dequeue_batch(queue_name, max_messages, wait_time)
+
+        if not payloads:
+            worker._shutting_down = True
+
+        return payloads
+
+    connector.dequeue_batch = dequeue_or_stop
+    worker.run()
+
+
+class TestAsyncWorker(object):
+
+    @property
+    def broker(self):
+        return StandardBroker(DummyConnector())
+
+    def test_async_connector_wraps_the_methods(self):
+        connector = DummyConnector()
+        async_connector = AsyncConnector(connector)
+
+        async def enqueue_and_dequeue():
+            await async_connector.enqueue('sqjobs', {'id': 1})
+            return await async_connector.dequeue('sqjobs')
+
+        loop = asyncio.new_event_loop()
+        result = loop.run_until_complete(enqueue_and_dequeue())
+        loop.close()
+
+        assert repr(async_connector) == 'AsyncConnector(Dummy)'
+        assert result == {'id': 1}
+        assert async_connector.num_jobs == 0
+
+    def test_coroutine_jobs_run_concurrently(self):
+        broker = self.broker
+        worker = AsyncWorker(broker, 'sqjobs', concurrency=5, prefetch=10)
+        worker.register_job(SleepyJob)
+        SleepyJob.reset()
+
+        for _ in range(10):
+            broker.connector.enqueue('sqjobs', payload('sleepy', 0.05))
+
+        run_until_empty(worker)
+
+        assert SleepyJob.finished == 10
+        assert SleepyJob.max_running == 5
+        assert broker.connector.num_deleted_jobs == 10
+
+    def test_normal_jobs_run_in_the_executor(self):
+        broker = self.broker
+        worker = AsyncWorker(broker, 'sqjobs', concurrency=2)
+        worker.register_job(Adder)
+
+        for i in range(3):
+            broker.connector.enqueue('sqjobs', payload('adder', i, i))
+
+        run_until_empty(worker)
+
+        assert broker.connector.num_deleted_jobs == 3
+
+    def test_coroutine_jobs_can_be_retried(self):
+        broker = self.broker
+        worker = AsyncWorker(broker, 'sqjobs')
+        worker.register_job(AsyncRetryJob)
+        broker.connector.enqueue('sqjobs', payload('async_retry'))
+
+        run_until_empty(worker)
+
+        assert broker.connector.num_deleted_jobs == 0
+        assert broker.connector.retried_jobs == {
+            'sqjobs': [('async_retry', 30), ('async_retry', 30)]
+        }
+
+    def test_prefetched_jobs_are_released_on_shutdown(self):
+        broker = self.broker
+        worker = AsyncWorker(broker, 'sqjobs', concurrency=1, prefetch=3, max_jobs=1)
+        worker.register_job(Adder)
+
+        for i in range(3):
+            broker.connector.enqueue('sqjobs', payload('adder', i, i))
+
+        worker.run()
+
+        assert broker.connector.num_deleted_jobs == 1
+        assert broker.connector.num_jobs == 2
+
+    def test_executed_jobs_stay_done_if_they_can_not_be_deleted(self):
+        broker = self.broker
+        store = InMemoryIdempotencyStore()
+        worker = AsyncWorker(broker, 'sqjobs', idempotency_store=store)
+        worker.register_job(Adder)
+        broker.connector.delete = mock.Mock(side_effect=Exception('Throttled'))
+        broker.connector.enqueue('sqjobs', payload('adder', 1, 2))
+
+        run_until_empty(worker)
+
+        assert broker.connector.delete.call_count == 1
+        assert store.claim('adder') == store.DONE
+
+    def test_normal_hooks_of_coroutine_jobs_run_in_the_executor(self):
+        broker = self.broker
+        worker = AsyncWorker(broker, 'sqjobs')
+        worker.register_job(BlockingHooksJob)
+        BlockingHooksJob.threads = []
+        broker.connector.enqueue('sqjobs', payload('blocking_hooks'))
+
+        run_until_empty(worker)
+
+        loop_thread, hook_thread = BlockingHooksJob.threads
+        assert loop_thread is threading.current_thread()
+        assert hook_thread is not loop_thread
+
+    def test_idle_queues_are_not_polled_in_a_loop_in_non_blocking_mode(self):
+        broker = self.broker
+        worker = AsyncWorker(broker, 'sqjobs', timeout=0)
+        slept = []
+
+        async def sleep(seconds):
+            slept.append(seconds)
+            worker._shutting_down = len(slept) == 2
+
+        with mock.patch.object(asyncio, 'sleep', sleep):
+            worker.run()
+
+        assert worker.timeout == 0
+        assert slept[0] == 0  # The queue was active
+        assert 0 < slept[1] <= 1  # Idle after the empty receive
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from ..blobs import FileSystemBlobStore, LazyPayload
+
+
+class TestFileSystemBlobStore(object):
+
+    def test_blobs_are_stored_and_deleted(self, tmpdir):
+        store = FileSystemBlobStore(str(tmpdir.join('blobs')))
+
+        key = store.put(b'payload')
+
+        assert store.get(key) == b'payload'
+
+        store.delete(key)
+        store.delete(key)  # Not an error
+
+        with pytest.raises(IOError):
+            store.get(key)
+
+    def test_no_temporary_files_are_left(self, tmpdir):
+        store = FileSystemBlobStore(str(tmpdir))
+
+        key = store.put(b'payload')
+
+        assert os.listdir(str(tmpdir)) == [key]
+
+
+class TestLazyPayload(object):
+
+    def test_metadata_does_not_load_the_payload(self):
+        payload = LazyPayload(lambda: pytest.fail('Payload loaded'), {'id': '1'})
+
+        assert payload
+        assert payload['_metadata'] == {'id': '1'}
+        assert not payload.loaded
+
+    def test_payload_is_loaded_once(self):
+        loads = []
+
+        def load():
+            loads.append(1)
+            return {'name': 'adder'}
+
+        payload = LazyPayload(load, {'id': '1'})
+
+        assert payload['name'] == 'adder'
+        assert payload == {'name': 'adder', '_metadata': {'id': '1'}}
+        assert len(loads) == 1
@@ -1,3 +1,6 @@
+import time
+
+import mock
 import pytest
 
 from .fixtures import Adder, Divider
@@ -5,6 +8,7 @@ from ..brokers.standard import Standard as StandardBroker
 from ..brokers.eager import Eager as EagerBroker
 from ..brokers.base import Broker as BaseBroker
 from ..connectors.dummy import Dummy as DummyConnector
+from ..exceptions import QueueDoesNotExist
 
 
 class TestBrokerInterface(object):
@@ -118,6 +122,180 @@ class TestStandardBroker(object):
         assert jobs[0] == {'id': job_ids[1].job_id, 'args': (2, 2), 'kwargs': {}, 'name': 'adder'}
         assert jobs[1] == {'id': job_ids[0].job_id, 'args': (1, 1), 'kwargs': {}, 'name': 'adder'}
 
+    def test_jobs_are_prefetched_in_batches(self):
+        broker = StandardBroker(self.connector)
+
+        for i in range(3):
+            broker.add_job(Adder, i, i)
+
+        gen = broker.jobs('sqjobs', prefetch=2)
+        first = next(gen)
+
+        assert first['args'] == (2, 2)
+        assert broker.connector.num_jobs == 1  # One message is still in the buffer
+
+        second = next(gen)
+        assert second['args'] == (1, 1)
+
+    def test_prefetched_jobs_are_released_when_closed(self):
+        broker = StandardBroker(self.connector)
+
+        for i in range(3):
+            broker.add_job(Adder, i, i)
+
+        gen = broker.jobs('sqjobs', prefetch=3)
+        next(gen)
+        gen.close()
+
+        assert broker.connector.num_jobs == 2
+        assert [job['args'] for job in broker.connector.jobs['sqjobs']] == [(0, 0), (1, 1)]
+
+    def test_non_blocking_jobs_yield_none_if_empty(self):
+        broker = StandardBroker(self.connector)
+        gen = broker.jobs('sqjobs', timeout=0, prefetch=5)
+
+        with mock.patch('time.sleep') as sleep:
+            assert next(gen) is None
+
+        assert sleep.call_count == 1
+        assert 0 < sleep.call_args[0][0] <= 1  # The queue is idle after the empty receive
+
+    def test_non_blocking_jobs_back_off_after_empty_receives(self):
+        broker = StandardBroker(self.connector)
+        now = time.time()
+        jobs = broker.jobs('sqjobs', timeout=0)
+
+        with mock.patch('time.time', return_value=now), mock.patch('time.sleep') as sleep:
+            assert next(jobs) is None
+            broker.add_job(Adder, 1, 2)
+            assert next(jobs) is None  # The queue is not polled again yet
+
+        assert (broker.receives, broker.empty_receives) == (1, 1)
+        assert sleep.call_args_list == [mock.call(1), mock.call(1)]
+
+        with mock.patch('time.time', return_value=now + 1):
+            assert next(jobs)['args'] == (1, 2)
+
+        assert (broker.receives, broker.empty_receives) == (2, 1)
+
+    def test_add_several_jobs_to_broker(self):
+        broker = StandardBroker(self.connector)
+        results = broker.add_jobs([
+            (Adder, (1, 2), {}),
+            (Divider, (4,), {'num2': 2}),
+            (Adder, (), {'num1': 3, 'num2': 4, 'queue_name': 'other'}),
+        ])
+
+        assert len(results) == 3
+        assert len(set(result.job_id for result in results)) == 3
+        assert all(result.error is None for result in results)
+
+        assert broker.connector.num_jobs == 3
+        assert [job['id'] for job in broker.connector.jobs['sqjobs']] == [results[0].job_id]
+        math_operations = broker.connector.jobs['math_operations']
+        assert [job['id'] for job in math_operations] == [results[1].job_id]
+        assert broker.connector.jobs['other'][0] == {
+            'id': results[2].job_id, 'args': (), 'kwargs': {'num1': 3, 'num2': 4}, 'name': 'adder'
+        }
+
+    def test_add_several_jobs_by_name_reports_failures(self):
+        broker = StandardBroker(self.connector)
+        broker.connector.enqueue_batch = lambda queue_name, payloads: [None, 'Throttled']
+
+        results = broker.add_jobs_by_name([
+            ('adder', 'sqjobs', (1, 2), {}),
+            ('adder', 'sqjobs', (3, 4), {}),
+        ])
+
+        assert results[0].error is None
+        assert results[1].error == 'Throttled'
+
+    def test_add_several_jobs_by_name_reports_the_errors_of_every_queue(self):
+        broker = StandardBroker(self.connector)
+        enqueue_batch = broker.connector.enqueue_batch
+
+        def enqueue_batch_or_fail(queue_name, payloads):
+            if queue_name == 'missing':
+                raise QueueDoesNotExist('missing')
+
+            return enqueue_batch(queue_name, payloads)
+
+        broker.connector.enqueue_batch = enqueue_batch_or_fail
+
+        results = broker.add_jobs_by_name([
+            ('adder', 'missing', (1, 2), {}),
+            ('adder', 'sqjobs', (3, 4), {}),
+        ])
+
+        assert results[0].error == 'missing'
+        assert results[1].error is None
+        assert broker.connector.num_jobs == 1
+
+    def test_jobs_from_several_queues(self):
+        broker = StandardBroker(self.connector)
+        broker.add_job(Adder, 1, 1)
+        broker.add_job(Divider, 2, 2)
+        broker.add_job(Adder, 3, 3, queue_name='other')
+
+        gen = broker.jobs_from_queues(['sqjobs', 'math_operations', 'other'], timeout=0)
+        jobs = [next(gen) for _ in range(3)]
+
+        assert sorted((queue_name, job['args']) for queue_name, job in jobs) == [
+            ('math_operations', (2, 2)), ('other', (3, 3)), ('sqjobs', (1, 1))
+        ]
+
+    def test_jobs_from_several_idle_queues_wait_instead_of_polling(self):
+        broker = StandardBroker(self.connector)
+        gen = broker.jobs_from_queues(['sqjobs', 'other'], timeout=0)
+
+        def add_job(seconds):
+            broker.add_job(Adder, 1, 2)
+
+        with mock.patch('time.sleep', side_effect=add_job) as sleep:
+            queue_name, job = next(gen)
+
+        assert (queue_name, job['args']) == ('sqjobs', (1, 2))
+        assert sleep.call_count == 1
+        assert broker.empty_receives == 2
+
+    def test_jobs_from_several_queues_are_released_when_closed(self):
+        broker = StandardBroker(self.connector)
+
+        for i in range(3):
+            broker.add_job(Adder, i, i)
+
+        gen = broker.jobs_from_queues(['sqjobs', 'other'], prefetch=3)
+        assert next(gen)[0] == 'sqjobs'
+        gen.close()
+
+        assert broker.connector.num_jobs == 2
+
+    def test_delayed_jobs_are_not_dequeued_before_their_eta(self):
+        broker = StandardBroker(self.connector)
+        now = time.time()
+
+        with mock.patch('time.time', return_value=now):
+            broker.add_job(Adder, 1, 2, delay=3600)
+            broker.add_jobs([(Adder, (3, 4), {'delay': 60})])
+            broker.add_job(Adder, 5, 6)
+
+        jobs = broker.jobs('sqjobs', timeout=0)
+
+        with mock.patch('time.sleep'):
+            with mock.patch('time.time', return_value=now + 1):
+                assert next(jobs)['args'] == (5, 6)
+                assert next(jobs) is None
+
+            with mock.patch('time.time', return_value=now + 60):
+                job = next(jobs)
+                assert job['args'] == (3, 4)
+                assert job['kwargs'] == {}
+                assert job['eta'] == now + 60
+                assert next(jobs) is None
+
+            with mock.patch('time.time', return_value=now + 3600):
+                assert next(jobs)['args'] == (1, 2)
+
 
 class TestEagerBroker(object):
 
@@ -135,3 +313,14 @@ class TestEagerBroker(object):
 
         with pytest.raises(ZeroDivisionError):
             assert broker.add_job(Divider, 2, 0)
+
+    def test_execute_several_jobs_eager_mode(self):
+        broker = EagerBroker()
+        results = broker.add_jobs([(Adder, (2, 3), {}), (Adder, (), {'num1': 1, 'num2': 1})])
+
+        assert [result.result for result in results] == [5, 2]
+
+    def test_delay_is_ignored_in_eager_mode(self):
+        broker = EagerBroker()
+        result = broker.add_job(Adder, 2, 3, delay=60)
+        assert result.result == 5
@@ -0,0 +1,170 @@
+import gc
+import threading
+import time
+import weakref
+
+import mock
+import pytest
+
+from ..brokers.buffered import Buffered
+from ..brokers.standard import Standard
+from ..connectors.dummy import Dummy as DummyConnector
+from ..exceptions import BufferFull
+from .fixtures import Adder
+
+
+class EnqueueBatchConnector(DummyConnector):
+
+    def __init__(self, errors=None):
+        super(EnqueueBatchConnector, self).__init__()
+        self.errors = list(errors or [])
+        self.batches = []
+        self.sent = threading.Event()
+
+    def enqueue_batch(self, queue_name, payloads):
+        self.batches.append((queue_name, [payload['args'][0] for payload in payloads]))
+        self.sent.set()
+
+        if self.errors:
+            error = self.errors.pop(0)
+
+            if isinstance(error, Exception):
+                raise error
+
+            return [error] + [None] * (len(payloads) - 1)
+
+        return super(EnqueueBatchConnector, self).enqueue_batch(queue_name, payloads)
+
+
+def create_broker(connector, **kwargs):
+    kwargs.setdefault('flush_at_exit', False)
+    return Buffered(Standard(connector), **kwargs)
+
+
+class TestBufferedBroker(object):
+
+    def test_add_job_returns_immediately(self):
+        connector = EnqueueBatchConnector()
+        broker = create_broker(connector, max_delay=60)
+
+        result = broker.add_job(Adder, 1, 2)
+
+        assert result.job_id is not None
+        assert broker.pending() == 1
+        assert connector.batches == []
+
+        broker.close()
+
+        assert connector.batches == [('sqjobs', [1])]
+        assert connector.jobs['sqjobs'][0]['id'] == result.job_id
+
+    def test_jobs_are_sent_in_batches(self):
+        connector = EnqueueBatchConnector()
+        broker = create_broker(connector, max_size=3, max_delay=60)
+
+        for i in range(7):
+            broker.add_job(Adder, i, 0)
+
+        broker.add_job(Adder, 7, 0, queue_name='other')
+        broker.flush()
+
+        sent = sorted((queue_name, job) for queue_name, jobs in connector.batches for job in jobs)
+
+        assert sent == [('other', 7)] + [('sqjobs', i) for i in range(7)]
+        assert max(len(jobs) for _, jobs in connector.batches) == 3
+        assert broker.pending() == 0
+
+        broker.close()
+
+    def test_jobs_are_sent_in_the_background(self):
+        connector = EnqueueBatchConnector()
+        broker = create_broker(connector, max_delay=0.01)
+
+        broker.add_job(Adder, 1, 2)
+
+        assert connector.sent.wait(5)
+        broker.close()
+
+        assert connector.batches == [('sqjobs', [1])]
+
+    def test_failed_jobs_are_retried(self):
+        connector = EnqueueBatchConnector(errors=['Throttled', ValueError('Network error')])
+        broker = create_broker(connector, max_delay=60, max_attempts=3)
+
+        broker.add_job(Adder, 1, 2)
+        broker.add_job(Adder, 3, 4)
+        broker.close()
+
+        assert connector.batches == [('sqjobs', [1, 3]), ('sqjobs', [1]), ('sqjobs', [1])]
+        assert connector.num_jobs == 1
+
+    def test_failed_jobs_are_retried_with_backoff_when_flushing(self):
+        connector = EnqueueBatchConnector(errors=['Throttled', 'Throttled'])
+        broker = create_broker(connector, max_delay=60, max_attempts=3)
+
+        broker.add_job(Adder, 1, 2)
+
+        with mock.patch('random.uniform', side_effect=lambda low, high: high):
+            with mock.patch('time.sleep') as sleep:
+                broker.close()
+
+        assert connector.num_jobs == 1
+        assert [args[0] for args, _ in sleep.call_args_list] == [
+            Buffered.RETRY_BASE_DELAY, Buffered.RETRY_BASE_DELAY * 2
+        ]
+
+    def test_failure_callback_is_called_when_giving_up(self):
+        failures = []
+        connector = EnqueueBatchConnector(errors=['Throttled', 'Throttled'])
+        broker = create_broker(
+            connector, max_delay=60, max_attempts=2, on_failure=lambda *args: failures.append(args)
+        )
+
+        result = broker.add_job(Adder, 1, 2)
+        broker.close()
+
+        assert result.error == 'Throttled'
+        assert len(failures) == 1
+        assert failures[0][0] is result
+        assert failures[0][1] == 'sqjobs'
+        assert failures[0][2]['args'] == (1, 2)
+
+    def test_buffer_is_bounded(self):
+        broker = create_broker(EnqueueBatchConnector(), max_delay=60, max_pending=2, block=False)
+
+        broker.add_job(Adder, 1, 2)
+        broker.add_job(Adder, 3, 4)
+
+        with pytest.raises(BufferFull):
+            broker.add_job(Adder, 5, 6)
+
+        broker.close()
+
+    def test_add_job_blocks_while_buffer_is_full(self):
+        connector = EnqueueBatchConnector()
+        broker = create_broker(connector, max_delay=0.05, max_pending=1)
+
+        start = time.time()
+        broker.add_job(Adder, 1, 2)
+        broker.add_job(Adder, 3, 4)  # Waits until the first job is sent
+
+        assert time.time() - start >= 0.04
+        broker.close()
+
+        assert connector.num_jobs == 2
+
+    def test_closed_broker_does_not_accept_jobs(self):
+        broker = create_broker(EnqueueBatchConnector())
+        broker.close()
+
+        with pytest.raises(RuntimeError):
+            broker.add_job(Adder, 1, 2)
+
+    def test_flush_at_exit_does_not_keep_the_broker_alive(self):
+        broker = create_broker(EnqueueBatchConnector(), flush_at_exit=True)
+        reference = weakref.ref(broker)
+
+        del broker
+        gc.collect()
+
+        assert reference() is None
@@ -0,0 +1,15 @@
+import sys
+
+import pytest
+
+from sqjobs.connectors.pool import clear_connections
+
+collect_ignore = []
+
+if sys.version_info < (3, 5):
+    collect_ignore.append('aio_test.py')  # async/await syntax
+
+
+@pytest.fixture(autouse=True)
+def no_shared_connections():
+    clear_connections()  # Connections are mocked by every test
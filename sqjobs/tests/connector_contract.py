@@ -0,0 +1,129 @@
+import threading
+import time
+
+from ..brokers.standard import Standard
+from .fixtures import Adder
+
+
+def payload(job_id, **kwargs):
+    return dict({'id': job_id, 'name': 'adder', 'args': [], 'kwargs': {}}, **kwargs)
+
+
+class ConnectorContract(object):
+    """
+    Tests that every connector with SQS semantics (visibility timeouts, receive
+    counts, delays and batches) must pass. Test classes provide a `connector`
+    fixture with a visibility timeout of 60 seconds.
+    """
+
+    def new_connector(self, connector):
+        """
+        Creates another connector to the same queues
+        """
+        raise NotImplementedError
+
+    def test_messages_are_received_in_order(self, connector):
+        connector.enqueue('sqjobs', payload('1'))
+        connector.enqueue_batch('sqjobs', [payload('2'), payload('3')])
+        connector.enqueue('other', payload('4'))
+
+        payloads = connector.dequeue_batch('sqjobs', max_messages=10, wait_time=0)
+
+        assert [p['id'] for p in payloads] == ['1', '2', '3']
+        assert payloads[0]['_metadata']['retries'] == 1
+        assert connector.dequeue_batch('sqjobs', wait_time=0) == []
+
+    def test_received_messages_are_invisible_until_timeout(self, connector):
+        connector.visibility_timeout = 0.05
+        connector.enqueue('sqjobs', payload('1'))
+
+        connector.dequeue('sqjobs', wait_time=0)
+
+        assert connector.dequeue('sqjobs', wait_time=0) is None
+
+        received = connector.dequeue('sqjobs', wait_time=1)
+
+        assert received['id'] == '1'
+        assert received['_metadata']['retries'] == 2
+
+    def test_deleted_messages_are_not_received_again(self, connector):
+        connector.visibility_timeout = 0.01
+        connector.enqueue_batch('sqjobs', [payload('1'), payload('2')])
+
+        message_ids = [p['_metadata']['id'] for p in connector.dequeue_batch('sqjobs', wait_time=0)]
+
+        assert connector.delete_batch('sqjobs', message_ids) == []
+
+        time.sleep(0.02)
+
+        assert connector.dequeue_batch('sqjobs', wait_time=0) == []
+
+    def test_messages_received_again_can_not_be_deleted_with_old_ids(self, connector):
+        connector.visibility_timeout = 0.01
+        connector.enqueue('sqjobs', payload('1'))
+
+        old = connector.dequeue('sqjobs', wait_time=0)
+        time.sleep(0.02)
+        new = connector.dequeue('sqjobs', wait_time=0)
+
+        old_id = old['_metadata']['id']
+
+        assert connector.delete_batch('sqjobs', [old_id]) == [old_id]
+        assert connector.delete_batch('sqjobs', [new['_metadata']['id']]) == []
+
+    def test_released_messages_are_received_again(self, connector):
+        connector.enqueue('sqjobs', payload('1'))
+
+        connector.release('sqjobs', connector.dequeue_batch('sqjobs', wait_time=0))
+
+        assert connector.dequeue('sqjobs', wait_time=0)['id'] == '1'
+
+    def test_retry_time_of_messages_can_be_changed(self, connector):
+        connector.enqueue('sqjobs', payload('1'))
+        received = connector.dequeue('sqjobs', wait_time=0)
+
+        connector.set_retry_time('sqjobs', received['_metadata']['id'], 0)
+
+        assert connector.dequeue('sqjobs', wait_time=0)['id'] == '1'
+
+    def test_delayed_messages_are_received_after_their_eta(self, connector):
+        connector.enqueue('sqjobs', payload('1', eta=time.time() + 0.05))
+
+        assert connector.dequeue('sqjobs', wait_time=0) is None
+        assert connector.dequeue('sqjobs', wait_time=1)['id'] == '1'
+
+    def test_queues_are_shared_between_connectors(self, connector):
+        connector.enqueue_batch('sqjobs', [payload(str(i)) for i in range(200)])
+        received = []
+
+        def consume():
+            consumer = self.new_connector(connector)
+
+            while True:
+                payloads = consumer.dequeue_batch('sqjobs', max_messages=7, wait_time=0)
+
+                if not payloads:
+                    return
+
+                received.extend(p['id'] for p in payloads)
+
+        threads = [threading.Thread(target=consume) for _ in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        assert sorted(received) == sorted(str(i) for i in range(200))
+
+    def test_jobs_are_added_and_unserialized(self, connector):
+        broker = Standard(connector)
+        broker.add_job(Adder, 1, 2)
+
+        payload = connector.dequeue('sqjobs', wait_time=0)
+        job, args, kwargs = broker.unserialize_job(Adder, 'sqjobs', payload)
+
+        assert isinstance(job, Adder)
+        assert job.retries == 1
+        assert (args, kwargs) == ([1, 2], {})
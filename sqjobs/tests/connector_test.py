@@ -1,3 +1,5 @@
+import time
+
 import boto3
 import botocore
 from datetime import datetime
@@ -9,6 +11,8 @@ from sqjobs.exceptions import QueueDoesNotExist
 from ..connectors.sqs import SQS, SQSMessage
 from ..connectors.base import Connector
 from ..connectors.dummy import Dummy
+from ..blobs import FileSystemBlobStore, LazyPayload
+from ..serializers import Codec
 from .fixtures import Adder
 
 QUEUE_NAME = 'my_queue'
@@ -42,14 +46,27 @@ class TestConnectorInterface(object):
         with pytest.raises(NotImplementedError):
             Connector.unserialize_job(dummy, dummy, 'demo', 'payload')
 
+    def test_default_enqueue_batch_reports_errors(self):
+        dummy = Dummy()
+        dummy.enqueue = mock.Mock(side_effect=[None, ValueError('Invalid payload')])
+
+        errors = Connector.enqueue_batch(dummy, 'demo', [{}, {}])
+
+        assert errors == [None, 'Invalid payload']
+
 
 class SQSMock(object):
-    def __init__(self, raise_queue_not_found=False):
+    def __init__(self, raise_queue_not_found=False,
+                 error_code='AWS.SimpleQueueService.NonExistentQueue'):
         self.raise_queue_not_found = raise_queue_not_found
+        self.error_code = error_code
+        self.resolved_queues = 0
 
     def get_queue_by_name(self, QueueName):
+        self.resolved_queues += 1
+
         if self.raise_queue_not_found:
-            error_response = {'Error': {}}
+            error_response = {'Error': {'Code': self.error_code}}
 
             raise botocore.exceptions.ClientError(
                 error_response=error_response,
@@ -63,7 +80,11 @@ class SQSQueueMock(object):
     def send_message(self, MessageBody):
         pass
 
-    def receive_messages(self, MaxNumberOfMessages, WaitTimeSeconds, AttributeNames):
+    def send_message_batch(self, Entries):
+        pass
+
+    def receive_messages(self, MaxNumberOfMessages, WaitTimeSeconds, AttributeNames,
+                         MessageAttributeNames):
         pass
 
     def delete_messages(self):
@@ -75,8 +96,10 @@ class SQSQueueMock(object):
 
 class SQSMessageMock(object):
 
-    def __init__(self, receipt_handle="1"):
-        self.body = SQSMessage.encode({'key': 'value'})
+    def __init__(self, receipt_handle="1", codec=None, message=None):
+        message = message or SQSMessage.build({'key': 'value'}, codec)
+        self.body = message['MessageBody']
+        self.message_attributes = message.get('MessageAttributes')
         self.receipt_handle = receipt_handle
         self.attributes = {
             "ApproximateReceiveCount": 0,
@@ -100,7 +123,7 @@ class TestSQSConnector(object):
         sqs_connector.endpoint_url = ENDPOINT_URL
         return sqs_connector
 
-    @mock.patch.object(boto3, 'resource')
+    @mock.patch.object(boto3.session.Session, 'resource')
     def test_connection_is_cached(self, sqs_mock):
         sqs_mock.return_value = SQSMock()
         sqs_connector = self.create_sqs_connector()
@@ -109,7 +132,7 @@ class TestSQSConnector(object):
 
         assert sqs_connector._cached_connection is not None
 
-    @mock.patch.object(boto3, 'resource')
+    @mock.patch.object(boto3.session.Session, 'resource')
     def test_connection_created_with_aws_parameters(self, sqs_mock):
         sqs_mock.return_value = SQSMock()
         sqs_connector = self.create_sqs_connector()
@@ -123,7 +146,7 @@ class TestSQSConnector(object):
             service_name=SQS_SERVICE_NAME
         )
 
-    @mock.patch.object(boto3, 'resource')
+    @mock.patch.object(boto3.session.Session, 'resource')
     def test_connection_created_with_endpoint_url_if_provided(self, sqs_mock):
         sqs_mock.return_value = SQSMock()
         sqs_connector = self.create_sqs_connector_with_endpoint_url()
@@ -184,7 +207,7 @@ class TestSQSConnector(object):
         assert args == [1, 'second_arg']
         assert kwargs == {'first_kwarg': 1, 'second_kwarg': '2'}
 
-    @mock.patch.object(boto3, 'resource')
+    @mock.patch.object(boto3.session.Session, 'resource')
     def test_connection_enqueue_message_goes_ok(self, sqs_mock):
         sqs_mock.return_value = SQSMock()
         sqs_connector = self.create_sqs_connector()
@@ -195,14 +218,192 @@ class TestSQSConnector(object):
                 MessageBody="Insna2V5JzogdmFsdWV9Ig=="
             )
 
-    @mock.patch.object(boto3, 'resource')
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_enqueue_message_with_codec_is_tagged(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+        sqs_connector.codec = Codec(base64=False)
+
+        with mock.patch.object(SQSQueueMock, 'send_message') as send_message_mock:
+            sqs_connector.enqueue(queue_name=QUEUE_NAME, payload={'key': 'value'})
+            send_message_mock.assert_called_with(
+                MessageBody='{"key": "value"}',
+                MessageAttributes={
+                    'sqjobs-codec': {'DataType': 'String', 'StringValue': 'json'}
+                }
+            )
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_dequeue_message_with_codec(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+        codec = Codec(compression='zlib', compress_threshold=1)
+
+        with mock.patch.object(SQSQueueMock, 'receive_messages') as receive_messages_mock:
+            receive_messages_mock.return_value = [SQSMessageMock(codec=codec)]
+
+            payload = sqs_connector.dequeue(QUEUE_NAME)
+
+        assert payload['key'] == 'value'
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_enqueue_big_message_is_offloaded(self, sqs_mock, tmpdir):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+        sqs_connector.blob_store = FileSystemBlobStore(str(tmpdir))
+        sqs_connector.offload_threshold = 1024
+
+        with mock.patch.object(SQSQueueMock, 'send_message') as send_message_mock:
+            sqs_connector.enqueue(queue_name=QUEUE_NAME, payload={'data': 'x' * 1024})
+            sqs_connector.enqueue(queue_name=QUEUE_NAME, payload={'data': 'x'})
+
+        big, small = [call[1] for call in send_message_mock.call_args_list]
+        key = big['MessageAttributes']['sqjobs-blob']['StringValue']
+
+        assert big['MessageBody'] == key
+        assert tmpdir.listdir() == [tmpdir.join(key)]
+        assert 'MessageAttributes' not in small
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_offloaded_message_is_lazily_fetched_and_deleted(self, sqs_mock, tmpdir):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+        sqs_connector.blob_store = mock.Mock(wraps=FileSystemBlobStore(str(tmpdir)))
+        sqs_connector.offload_threshold = 1
+        message = sqs_connector._build_message({'key': 'value'})
+
+        with mock.patch.object(SQSQueueMock, 'receive_messages') as receive_messages_mock:
+            receive_messages_mock.return_value = [
+                SQSMessageMock(receipt_handle='1', message=message)
+            ]
+            payload = sqs_connector.dequeue(QUEUE_NAME)
+
+        assert isinstance(payload, LazyPayload)
+        assert payload['_metadata']['id'] == '1'
+        assert not sqs_connector.blob_store.get.called
+
+        assert payload['key'] == 'value'
+
+        with mock.patch.object(SQSQueueMock, 'delete_messages'):
+            sqs_connector.delete(QUEUE_NAME, '1')
+
+        assert tmpdir.listdir() == []
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_enqueue_delayed_messages(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+        now = time.time()
+
+        with mock.patch.object(SQSQueueMock, 'send_message') as send_message_mock:
+            with mock.patch('time.time', return_value=now):
+                sqs_connector.enqueue(QUEUE_NAME, {'eta': now + 60})
+                sqs_connector.enqueue(QUEUE_NAME, {'eta': now + 3600})
+                sqs_connector.enqueue(QUEUE_NAME, {'eta': now - 60})
+
+        short, long, past = [call[1] for call in send_message_mock.call_args_list]
+
+        assert short['DelaySeconds'] == 60
+        assert 'MessageAttributes' not in short
+        assert long['DelaySeconds'] == SQS.MAX_DELAY
+        assert long['MessageAttributes']['sqjobs-eta']['StringValue'] == '%.3f' % (now + 3600)
+        assert 'DelaySeconds' not in past
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_early_messages_are_postponed(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+        now = time.time()
+
+        with mock.patch('time.time', return_value=now):
+            message = sqs_connector._build_message({'key': 'value', 'eta': now + 3600})
+
+        with mock.patch.object(SQSQueueMock, 'receive_messages') as receive_messages_mock, \
+                mock.patch.object(SQSQueueMock, 'send_message') as send_message_mock, \
+                mock.patch.object(SQSQueueMock, 'delete_messages') as delete_messages_mock:
+            receive_messages_mock.return_value = [
+                SQSMessageMock(receipt_handle='1', message=message)
+            ]
+
+            with mock.patch('time.time', return_value=now + SQS.MAX_DELAY):
+                payloads = sqs_connector.dequeue_batch(QUEUE_NAME)
+
+            assert payloads == []
+            send_message_mock.assert_called_with(
+                MessageBody=message['MessageBody'],
+                MessageAttributes=message['MessageAttributes'],
+                DelaySeconds=SQS.MAX_DELAY,
+            )
+            delete_messages_mock.assert_called_with(Entries=[{'Id': '1', 'ReceiptHandle': '1'}])
+
+            with mock.patch('time.time', return_value=now + 3601):
+                payloads = sqs_connector.dequeue_batch(QUEUE_NAME)
+
+            assert payloads[0]['key'] == 'value'
+
+    @mock.patch.object(boto3.session.Session, 'resource')
     def test_connection_enqueue_message_fails_if_no_queue_found(self, sqs_mock):
         sqs_mock.return_value = SQSMock(raise_queue_not_found=True)
         sqs_connector = self.create_sqs_connector()
 
         pytest.raises(QueueDoesNotExist, sqs_connector.enqueue, queue_name=QUEUE_NAME, payload="{}")
 
-    @mock.patch.object(boto3, 'resource')
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_enqueue_batch_in_chunks(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+
+        with mock.patch.object(SQSQueueMock, 'send_message_batch') as send_batch_mock:
+            send_batch_mock.return_value = {'Failed': [{'Id': '2', 'Message': 'Throttled'}]}
+
+            errors = sqs_connector.enqueue_batch(QUEUE_NAME, [{'n': i} for i in range(12)])
+
+            assert send_batch_mock.call_count == 2
+            send_batch_mock.assert_called_with(Entries=[
+                {'Id': '1', 'MessageBody': SQSMessage.encode({'n': 10})},
+                {'Id': '2', 'MessageBody': SQSMessage.encode({'n': 11})},
+            ])
+
+        assert errors == [None, 'Throttled'] + [None] * 9 + ['Throttled']
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_enqueue_batch_reports_errors_of_failed_chunks(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+        throttled = botocore.exceptions.ClientError(
+            {'Error': {'Code': 'RequestThrottled'}}, 'SendMessageBatch'
+        )
+
+        with mock.patch.object(SQSQueueMock, 'send_message_batch') as send_batch_mock:
+            send_batch_mock.side_effect = [{}, throttled, {}]
+
+            errors = sqs_connector.enqueue_batch(QUEUE_NAME, [{'n': i} for i in range(25)])
+
+            assert send_batch_mock.call_count == 3
+
+        assert errors[:10] == [None] * 10
+        assert all('RequestThrottled' in error for error in errors[10:20])
+        assert errors[20:] == [None] * 5
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_enqueue_batch_respects_size_limit(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+        big = 'x' * 100 * 1024
+        payloads = [{'data': big}, {'data': big}, {'data': big}, {'data': big * 3}]
+
+        with mock.patch.object(SQSQueueMock, 'send_message_batch') as send_batch_mock:
+            send_batch_mock.return_value = {}
+
+            errors = sqs_connector.enqueue_batch(QUEUE_NAME, payloads)
+
+            # Base64 inflates the payloads, so only one fits in every request
+            assert send_batch_mock.call_count == 3
+
+        assert errors[:3] == [None, None, None]
+        assert errors[3].startswith('Message too large')
+
+    @mock.patch.object(boto3.session.Session, 'resource')
     def test_connection_dequeue_message_goes_ok(self, sqs_mock):
         sqs_mock.return_value = SQSMock()
         sqs_connector = self.create_sqs_connector()
@@ -226,20 +427,21 @@ class TestSQSConnector(object):
 
             receive_messages_mock.assert_called_with(
                 AttributeNames=['All'],
+                MessageAttributeNames=['All'],
                 MaxNumberOfMessages=1,
                 WaitTimeSeconds=20
             )
 
         assert payload == expected_payload
 
-    @mock.patch.object(boto3, 'resource')
+    @mock.patch.object(boto3.session.Session, 'resource')
     def test_connection_dequeue_message_fails_if_no_queue_found(self, sqs_mock):
         sqs_mock.return_value = SQSMock(raise_queue_not_found=True)
         sqs_connector = self.create_sqs_connector()
 
         pytest.raises(QueueDoesNotExist, sqs_connector.dequeue, queue_name=QUEUE_NAME)
 
-    @mock.patch.object(boto3, 'resource')
+    @mock.patch.object(boto3.session.Session, 'resource')
     def test_connection_dequeue_message_with_wait_time(self, sqs_mock):
         sqs_mock.return_value = SQSMock()
         sqs_connector = self.create_sqs_connector()
@@ -251,11 +453,12 @@ class TestSQSConnector(object):
 
             receive_messages_mock.assert_called_with(
                 AttributeNames=['All'],
+                MessageAttributeNames=['All'],
                 MaxNumberOfMessages=1,
                 WaitTimeSeconds=10
             )
 
-    @mock.patch.object(boto3, 'resource')
+    @mock.patch.object(boto3.session.Session, 'resource')
     def test_connection_dequeue_message_non_blocking_mode(self, sqs_mock):
         sqs_mock.return_value = SQSMock()
         sqs_connector = self.create_sqs_connector()
@@ -267,7 +470,67 @@ class TestSQSConnector(object):
 
             assert payload is None
 
-    @mock.patch.object(boto3, 'resource')
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_dequeue_batch_of_messages(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+
+        with mock.patch.object(SQSQueueMock, 'receive_messages') as receive_messages_mock:
+            receive_messages_mock.return_value = [
+                SQSMessageMock(receipt_handle="1"),
+                SQSMessageMock(receipt_handle="2")
+            ]
+
+            payloads = sqs_connector.dequeue_batch(QUEUE_NAME, max_messages=25)
+
+            receive_messages_mock.assert_called_with(
+                AttributeNames=['All'],
+                MessageAttributeNames=['All'],
+                MaxNumberOfMessages=10,
+                WaitTimeSeconds=20
+            )
+
+        assert [payload['_metadata']['id'] for payload in payloads] == ['1', '2']
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_dequeue_batch_non_blocking_mode(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+
+        with mock.patch.object(SQSQueueMock, 'receive_messages') as receive_messages_mock:
+            receive_messages_mock.return_value = []
+
+            assert sqs_connector.dequeue_batch(QUEUE_NAME, wait_time=0) == []
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_dequeue_batch_does_a_single_receive(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+
+        with mock.patch.object(SQSQueueMock, 'receive_messages') as receive_messages_mock:
+            receive_messages_mock.return_value = []
+
+            assert sqs_connector.dequeue_batch(QUEUE_NAME, wait_time=20) == []
+            assert receive_messages_mock.call_count == 1
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_release_messages_in_batches(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+        payloads = [{'_metadata': {'id': str(i)}} for i in range(12)]
+
+        with mock.patch.object(SQSQueueMock, 'change_message_visibility_batch') as change_mock:
+            sqs_connector.release(QUEUE_NAME, payloads)
+
+            assert change_mock.call_count == 2
+            change_mock.assert_called_with(
+                Entries=[
+                    {'Id': '1', 'ReceiptHandle': '10', 'VisibilityTimeout': 0},
+                    {'Id': '2', 'ReceiptHandle': '11', 'VisibilityTimeout': 0},
+                ]
+            )
+
+    @mock.patch.object(boto3.session.Session, 'resource')
     def test_connection_delete_message_goes_ok(self, sqs_mock):
         sqs_mock.return_value = SQSMock()
         sqs_connector = self.create_sqs_connector()
@@ -285,14 +548,54 @@ class TestSQSConnector(object):
                 ]
             )
 
-    @mock.patch.object(boto3, 'resource')
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_delete_batch_returns_failed_messages(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+
+        with mock.patch.object(SQSQueueMock, 'delete_messages') as delete_messages_mock:
+            delete_messages_mock.return_value = {
+                'Failed': [{'Id': '2', 'Code': 'ReceiptHandleIsInvalid'}]
+            }
+
+            failed = sqs_connector.delete_batch(QUEUE_NAME, ['a', 'b', 'c'])
+
+            delete_messages_mock.assert_called_with(
+                Entries=[
+                    {'Id': '1', 'ReceiptHandle': 'a'},
+                    {'Id': '2', 'ReceiptHandle': 'b'},
+                    {'Id': '3', 'ReceiptHandle': 'c'},
+                ]
+            )
+
+        assert failed == ['b']
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_retry_batch_returns_failed_messages(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+        entries = [(str(i), i) for i in range(11)]
+
+        with mock.patch.object(SQSQueueMock, 'change_message_visibility_batch') as change_mock:
+            change_mock.return_value = {'Failed': [{'Id': '1'}]}
+
+            failed = sqs_connector.set_retry_time_batch(QUEUE_NAME, entries)
+
+            assert change_mock.call_count == 2
+            change_mock.assert_called_with(
+                Entries=[{'Id': '1', 'ReceiptHandle': '10', 'VisibilityTimeout': 10}]
+            )
+
+        assert failed == [('0', 0), ('10', 10)]
+
+    @mock.patch.object(boto3.session.Session, 'resource')
     def test_connection_delete_message_fails_if_no_queue_found(self, sqs_mock):
         sqs_mock.return_value = SQSMock(raise_queue_not_found=True)
         sqs_connector = self.create_sqs_connector()
 
         pytest.raises(QueueDoesNotExist, sqs_connector.delete, queue_name=QUEUE_NAME, message_id=1)
 
-    @mock.patch.object(boto3, 'resource')
+    @mock.patch.object(boto3.session.Session, 'resource')
     def test_connection_retry_message_goes_ok(self, sqs_mock):
         sqs_mock.return_value = SQSMock()
         sqs_connector = self.create_sqs_connector()
@@ -323,7 +626,7 @@ class TestSQSConnector(object):
                 ]
             )
 
-    @mock.patch.object(boto3, 'resource')
+    @mock.patch.object(boto3.session.Session, 'resource')
     def test_connection_retry_message_fails_if_no_queue_found(self, sqs_mock):
         sqs_mock.return_value = SQSMock(raise_queue_not_found=True)
         sqs_connector = self.create_sqs_connector()
@@ -335,3 +638,88 @@ class TestSQSConnector(object):
             message_id=1,
             delay=1
         )
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_queues_are_cached(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+
+        sqs_connector.enqueue(QUEUE_NAME, {})
+        sqs_connector.enqueue(QUEUE_NAME, {})
+
+        assert sqs_mock.return_value.resolved_queues == 1
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_cached_queues_expire(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+        sqs_connector.queue_cache_ttl = 60
+
+        with mock.patch('time.time') as time_mock:
+            time_mock.return_value = 1000
+            sqs_connector.enqueue(QUEUE_NAME, {})
+
+            time_mock.return_value = 1059
+            sqs_connector.enqueue(QUEUE_NAME, {})
+            assert sqs_mock.return_value.resolved_queues == 1
+
+            time_mock.return_value = 1060
+            sqs_connector.enqueue(QUEUE_NAME, {})
+            assert sqs_mock.return_value.resolved_queues == 2
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_cached_queue_is_invalidated_if_it_does_not_exist(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+        sqs_connector.warm_up([QUEUE_NAME])
+
+        error = botocore.exceptions.ClientError(
+            error_response={'Error': {'Code': 'AWS.SimpleQueueService.NonExistentQueue'}},
+            operation_name='SendMessage'
+        )
+
+        with mock.patch.object(SQSQueueMock, 'send_message', side_effect=error):
+            pytest.raises(
+                QueueDoesNotExist, sqs_connector.enqueue, queue_name=QUEUE_NAME, payload={}
+            )
+
+        assert QUEUE_NAME not in sqs_connector._cached_queues
+
+        sqs_connector.enqueue(QUEUE_NAME, {})
+        assert sqs_mock.return_value.resolved_queues == 2
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_other_client_errors_are_not_converted(self, sqs_mock):
+        sqs_mock.return_value = SQSMock()
+        sqs_connector = self.create_sqs_connector()
+
+        error = botocore.exceptions.ClientError(
+            error_response={'Error': {'Code': 'AccessDenied'}},
+            operation_name='SendMessage'
+        )
+
+        with mock.patch.object(SQSQueueMock, 'send_message', side_effect=error):
+            pytest.raises(
+                botocore.exceptions.ClientError, sqs_connector.enqueue,
+                queue_name=QUEUE_NAME, payload={}
+            )
+
+        assert QUEUE_NAME in sqs_connector._cached_queues
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_other_errors_resolving_the_queue_are_not_converted(self, sqs_mock):
+        sqs_mock.return_value = SQSMock(raise_queue_not_found=True, error_code='RequestThrottled')
+        sqs_connector = self.create_sqs_connector()
+
+        pytest.raises(
+            botocore.exceptions.ClientError, sqs_connector.enqueue,
+            queue_name=QUEUE_NAME, payload={}
+        )
+        pytest.raises(botocore.exceptions.ClientError, sqs_connector.warm_up, [QUEUE_NAME])
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_warm_up_fails_if_no_queue_found(self, sqs_mock):
+        sqs_mock.return_value = SQSMock(raise_queue_not_found=True)
+        sqs_connector = self.create_sqs_connector()
+
+        pytest.raises(QueueDoesNotExist, sqs_connector.warm_up, [QUEUE_NAME])
@@ -22,3 +22,8 @@ class ResultDivider(ResultJob):
         super_on_failure = super(ResultDivider, self).on_failure(*args, **kwargs)
         self.err = 'ZeroDivisionError'
         return super_on_failure
+
+
+class CombinedResultDivider(ResultDivider):
+    name = 'combinedresultdivider'
+    combine_writes = True
@@ -1,18 +1,22 @@
-from django.test import TestCase
+from django.db import DatabaseError, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.core.management import call_command
+from sqjobs.contrib.django import djsqjobs
 from sqjobs.brokers.standard import Standard
+from sqjobs.connectors.dummy import Dummy
+from sqjobs.contrib.django.djsqjobs.scheduler import Scheduler
 from sqjobs.brokers.eager import Eager
 from sqjobs.contrib.django.djsqjobs.models import PeriodicJob
 from sqjobs.contrib.django.djsqjobs.models import JobStatus
 
 
 from ...fixtures import Adder, Divider
-from .django_fixtures import ResultDivider
+from .django_fixtures import CombinedResultDivider, ResultDivider
 
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytz
 
-from mock.mock import patch
+from mock.mock import Mock, call, patch
 
 
 class DjangoTestCase(TestCase):
@@ -56,3 +60,265 @@ class ResultJobsTests(DjangoTestCase):
         result_divider.post_run()
         self.assertLessEqual(result_divider.job_status.date_done, datetime.now())
         self.assertEqual(result_divider.job_status.result, '3')
+
+
+class CombinedResultJobsTests(TransactionTestCase):
+
+    def _execute(self, job_id, *args):
+        job = CombinedResultDivider()
+        job.id = job_id
+
+        try:
+            job.execute(*args)
+        except ZeroDivisionError:
+            job.on_failure()
+        else:
+            job.on_success()
+
+        return job
+
+    def test_result_and_status_are_stored_together(self):
+        with self.assertNumQueries(2):
+            self._execute('1234', 3, 1)
+
+        job_status = JobStatus.objects.get(job_id='1234')
+        self.assertEqual(job_status.status, JobStatus.SUCCESS)
+        self.assertEqual(job_status.result, '3')
+
+    def test_failed_jobs_are_retried_without_loading_their_status(self):
+        self._execute('1234', 3, 0)
+        self.assertEqual(JobStatus.objects.get(job_id='1234').status, JobStatus.FAILURE)
+
+        with self.assertNumQueries(3):
+            job = self._execute('1234', 3, 1)
+
+        self.assertFalse(job.repeated_task)
+        self.assertEqual(JobStatus.objects.get(job_id='1234').status, JobStatus.SUCCESS)
+
+    def test_successful_jobs_are_not_repeated(self):
+        self._execute('1234', 3, 1)
+
+        with self.assertNumQueries(2):
+            job = self._execute('1234', 4, 1)
+
+        self.assertTrue(job.repeated_task)
+        self.assertEqual(JobStatus.objects.get(job_id='1234').result, '3')
+
+
+@override_settings(
+    SQJOBS_SQS_ACCESS_KEY='ACCESS_KEY',
+    SQJOBS_SQS_SECRET_KEY='SECRET_KEY',
+    SQJOBS_SQS_REGION_NAME='us-east-1',
+)
+class BrokerTests(TransactionTestCase):
+
+    def setUp(self):
+        djsqjobs.reset_broker()
+
+    def test_broker_is_memoized(self):
+        self.assertIs(djsqjobs.get_broker(), djsqjobs.get_broker())
+
+    def test_broker_is_reset_when_settings_change(self):
+        broker = djsqjobs.get_broker()
+
+        with override_settings(SQJOBS_SQS_REGION_NAME='eu-west-1'):
+            self.assertIsNot(djsqjobs.get_broker(), broker)
+            self.assertEqual(djsqjobs.get_broker().connector.region_name, 'eu-west-1')
+
+    def test_broker_is_not_shared_with_forked_processes(self):
+        broker = djsqjobs.get_broker()
+
+        with patch('sqjobs.contrib.django.djsqjobs.utils._broker_pid', -1):
+            self.assertIsNot(djsqjobs.get_broker(), broker)
+
+    @patch('sqjobs.contrib.django.djsqjobs.utils.get_broker')
+    def test_jobs_are_added_in_a_batch_on_commit(self, get_broker):
+        broker = get_broker.return_value = Mock()
+
+        with transaction.atomic():
+            djsqjobs.add_job_on_commit(Adder, 1, 2)
+            djsqjobs.add_job_on_commit(Adder, 3, 4, queue_name='other')
+            self.assertFalse(broker.add_jobs.called)
+
+        broker.add_jobs.assert_called_once_with([
+            (Adder, (1, 2), {}),
+            (Adder, (3, 4), {'queue_name': 'other'}),
+        ])
+
+    @patch('sqjobs.contrib.django.djsqjobs.utils.get_broker')
+    def test_jobs_of_rolled_back_savepoints_are_discarded(self, get_broker):
+        broker = get_broker.return_value = Mock()
+
+        with transaction.atomic():
+            djsqjobs.add_job_on_commit(Adder, 1, 2)
+
+            try:
+                with transaction.atomic():
+                    djsqjobs.add_job_on_commit(Adder, 3, 4)
+                    raise ValueError
+            except ValueError:
+                pass
+
+            djsqjobs.add_job_on_commit(Adder, 5, 6)
+
+        broker.add_jobs.assert_called_once_with([(Adder, (1, 2), {}), (Adder, (5, 6), {})])
+
+    @patch('sqjobs.contrib.django.djsqjobs.utils.get_broker')
+    def test_jobs_of_rolled_back_transactions_are_discarded(self, get_broker):
+        broker = get_broker.return_value = Mock()
+
+        with transaction.atomic():
+            djsqjobs.add_job_on_commit(Adder, 1, 2)
+            transaction.set_rollback(True)
+
+        self.assertFalse(broker.add_jobs.called)
+
+    @patch('sqjobs.contrib.django.djsqjobs.utils.get_broker')
+    def test_jobs_are_added_after_a_rolled_back_transaction(self, get_broker):
+        broker = get_broker.return_value = Mock()
+
+        with transaction.atomic():
+            djsqjobs.add_job_on_commit(Adder, 1, 2)
+            transaction.set_rollback(True)
+
+        with transaction.atomic():
+            djsqjobs.add_job_on_commit(Adder, 3, 4)
+
+        with transaction.atomic():
+            djsqjobs.add_job_on_commit(Adder, 5, 6)
+            djsqjobs.add_job_on_commit(Adder, 7, 8)
+
+        self.assertEqual(broker.add_jobs.call_args_list, [
+            call([(Adder, (3, 4), {})]),
+            call([(Adder, (5, 6), {}), (Adder, (7, 8), {})]),
+        ])
+
+    @patch('sqjobs.contrib.django.djsqjobs.utils.get_broker')
+    def test_jobs_are_added_immediately_outside_transactions(self, get_broker):
+        broker = get_broker.return_value = Mock()
+
+        djsqjobs.add_job_on_commit(Adder, 1, 2)
+
+        broker.add_job.assert_called_once_with(Adder, 1, 2)
+
+    @patch('sqjobs.contrib.django.djsqjobs.utils.get_broker')
+    def test_add_job_is_deferred_if_enabled(self, get_broker):
+        broker = get_broker.return_value = Mock()
+
+        with override_settings(SQJOBS_ENQUEUE_ON_COMMIT=True):
+            with transaction.atomic():
+                djsqjobs.add_job(Adder, 1, 2)
+                self.assertFalse(broker.add_job.called)
+
+        broker.add_jobs.assert_called_once_with([(Adder, (1, 2), {})])
+
+
+class SchedulerTests(DjangoTestCase):
+
+    def setUp(self):
+        super(SchedulerTests, self).setUp()
+        self.scheduler = Scheduler(Standard(Dummy()), jobs=[Adder, Divider])
+
+    def test_due_jobs_are_added(self):
+        added = self.scheduler.tick()
+        jobs = self.scheduler.broker.connector.jobs
+
+        self.assertEqual(added, 2)
+        self.assertEqual(jobs['sqjobs'][0]['kwargs'], {'num1': 1, 'num2': 2})
+        self.assertEqual(jobs['math_operations'][0]['kwargs'], {'num1': 2, 'num2': 1})
+
+    def test_next_execution_is_updated(self):
+        self.scheduler.tick()
+        now = datetime.now(pytz.utc)
+
+        for periodic_job in PeriodicJob.objects.filter(pk__in=[2, 3]):
+            self.assertGreater(periodic_job.next_execution, now)
+
+        self.assertEqual(self.scheduler.tick(), 0)
+
+    def test_failed_jobs_are_not_updated(self):
+        self.scheduler.broker.connector.enqueue_batch = lambda queue_name, payloads: ['Throttled']
+
+        self.assertEqual(self.scheduler.tick(), 0)
+        self.assertEqual(
+            PeriodicJob.objects.get(pk=2).next_execution,
+            datetime(2015, 3, 29, 0, 1, tzinfo=pytz.utc)
+        )
+
+    def test_next_executions_of_added_jobs_are_saved_if_others_fail(self):
+        save = PeriodicJob.save
+
+        def save_or_fail(periodic_job, *args, **kwargs):
+            if periodic_job.pk == 3:
+                raise DatabaseError('Deadlock')
+
+            save(periodic_job, *args, **kwargs)
+
+        with patch.object(PeriodicJob, 'save', save_or_fail):
+            self.assertEqual(self.scheduler.tick(), 1)
+
+        self.assertGreater(PeriodicJob.objects.get(pk=2).next_execution, datetime.now(pytz.utc))
+
+    def test_scheduler_keeps_running_after_errors(self):
+        ticks = []
+
+        def tick():
+            ticks.append(len(ticks))
+
+            if len(ticks) == 1:
+                raise DatabaseError('Connection lost')
+
+            self.scheduler.stop()
+
+        with patch('signal.signal'), patch.object(self.scheduler, 'tick', tick), \
+                patch.object(self.scheduler._stopped, 'wait'):
+            self.scheduler.run()
+
+        self.assertEqual(ticks, [0, 1])
+
+    def test_scheduler_sleeps_until_next_execution(self):
+        now = datetime.now(pytz.utc)
+        self.scheduler.max_sleep = 3600
+
+        PeriodicJob.objects.filter(pk__in=[2, 3]).update(enabled=False)
+        PeriodicJob.objects.filter(pk=4).update(next_execution=now + timedelta(seconds=30))
+        self.scheduler.load(now)
+
+        self.assertEqual(self.scheduler.time_to_next_execution(now), 30)
+        self.assertEqual(self.scheduler.tick(now), 0)
+
+    def test_jobs_of_unknown_classes_use_the_default_queue(self):
+        scheduler = Scheduler(Standard(Dummy()), default_queue_name='periodic')
+        scheduler.tick()
+
+        self.assertEqual(len(scheduler.broker.connector.jobs['periodic']), 2)
+
+
+class CleanupTests(DjangoTestCase):
+
+    def setUp(self):
+        super(CleanupTests, self).setUp()
+        old = datetime.now(pytz.utc) - timedelta(days=60)
+
+        statuses = [JobStatus.SUCCESS] * 5 + [JobStatus.FAILURE, JobStatus.PENDING]
+
+        for i, status in enumerate(statuses):
+            JobStatus.objects.create(job_id='old-%d' % i, job_name='Adder()', status=status)
+
+        JobStatus.objects.create(job_id='new', job_name='Adder()', status=JobStatus.SUCCESS)
+        JobStatus.objects.exclude(job_id='new').update(created_at=old)
+
+    def test_old_successful_statuses_are_deleted_in_chunks(self):
+        before = datetime.now(pytz.utc) - timedelta(days=30)
+
+        self.assertEqual(JobStatus.delete_old(before, chunk_size=2), 5)
+        self.assertEqual(
+            sorted(JobStatus.objects.values_list('job_id', flat=True)),
+            ['new', 'old-5', 'old-6']
+        )
+
+    def test_cleanup_command(self):
+        call_command('sqjobs_cleanup', days=30, status=JobStatus.FAILURE, verbosity=0)
+
+        self.assertFalse(JobStatus.objects.filter(job_id='old-5').exists())
+        self.assertEqual(JobStatus.objects.count(), 7)
@@ -1,3 +1,5 @@
+import time
+
 from sqjobs import Job
 
 
@@ -102,3 +104,38 @@ class ComplexRetryJob(Adder):
 
     def next_retry_time(self):
         return (self.retries + 1) * self.retry_time
+
+
+class FakeRedis(object):
+    """
+    Implements the Redis commands used by the result backends and the idempotency stores
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.calls = []
+
+    def set(self, key, value, px=None, nx=False):
+        self.calls.append('set')
+
+        if nx and self._get(key) is not None:
+            return None
+
+        self.data[key] = (value.encode('utf-8'), time.time() + px / 1000.0)
+        return True
+
+    def get(self, key):
+        self.calls.append('get')
+        return self._get(key)
+
+    def mget(self, keys):
+        self.calls.append('mget')
+        return [self._get(key) for key in keys]
+
+    def delete(self, key):
+        self.calls.append('delete')
+        self.data.pop(key, None)
+
+    def _get(self, key):
+        value, expires_at = self.data.get(key, (None, 0))
+        return value if expires_at > time.time() else None
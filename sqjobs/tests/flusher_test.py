@@ -0,0 +1,124 @@
+import time
+
+from ..connectors.dummy import Dummy as DummyConnector
+from ..flusher import Flusher
+
+
+class BatchConnector(DummyConnector):
+
+    def __init__(self, failures=0):
+        super(BatchConnector, self).__init__()
+        self.failures = failures
+        self.batches = []
+
+    def delete_batch(self, queue_name, message_ids):
+        self.batches.append(('delete', queue_name, list(message_ids)))
+        return self._fail(message_ids)
+
+    def set_retry_time_batch(self, queue_name, entries):
+        self.batches.append(('retry_time', queue_name, list(entries)))
+        return self._fail(entries)
+
+    def _fail(self, entries):
+        if not self.failures:
+            return []
+
+        self.failures -= 1
+        return entries[:1]
+
+
+class TestFlusher(object):
+
+    def test_flusher_repr(self):
+        assert repr(Flusher(DummyConnector())) == 'Flusher(Dummy)'
+
+    def test_batch_is_sent_when_full(self):
+        connector = BatchConnector()
+        flusher = Flusher(connector, max_size=3)
+
+        for i in range(7):
+            flusher.delete('sqjobs', i)
+
+        assert connector.batches == [
+            ('delete', 'sqjobs', [0, 1, 2]),
+            ('delete', 'sqjobs', [3, 4, 5]),
+        ]
+        assert flusher.pending() == 1
+
+    def test_batches_are_grouped_by_queue_and_action(self):
+        connector = BatchConnector()
+        flusher = Flusher(connector)
+
+        flusher.delete('first', 1)
+        flusher.delete('second', 2)
+        flusher.set_retry_time('first', 3, 10)
+        flusher.delete('first', 4)
+        flusher.flush()
+
+        assert sorted(connector.batches) == [
+            ('delete', 'first', [1, 4]),
+            ('delete', 'second', [2]),
+            ('retry_time', 'first', [(3, 10)]),
+        ]
+        assert flusher.pending() == 0
+
+    def test_only_failed_entries_are_retried(self):
+        connector = BatchConnector(failures=1)
+        flusher = Flusher(connector)
+
+        flusher.delete('sqjobs', 1)
+        flusher.delete('sqjobs', 2)
+        flusher.flush()
+
+        assert connector.batches == [
+            ('delete', 'sqjobs', [1, 2]),
+            ('delete', 'sqjobs', [1]),
+        ]
+
+    def test_failed_entries_are_discarded_after_max_attempts(self):
+        connector = BatchConnector(failures=10)
+        flusher = Flusher(connector, max_attempts=2)
+
+        flusher.set_retry_time('sqjobs', 1, 5)
+        flusher.flush()
+
+        assert len(connector.batches) == 2
+        assert flusher.pending() == 0
+
+    def test_batch_is_sent_when_the_deadline_expires(self):
+        connector = BatchConnector()
+        flusher = Flusher(connector, max_delay=0.01)
+        flusher.start()
+
+        try:
+            flusher.delete('sqjobs', 1)
+
+            for _ in range(100):
+                if connector.batches:
+                    break
+                time.sleep(0.01)
+
+            assert connector.batches == [('delete', 'sqjobs', [1])]
+        finally:
+            flusher.close()
+
+    def test_pending_entries_are_sent_when_closed(self):
+        connector = BatchConnector()
+        flusher = Flusher(connector, max_delay=60)
+        flusher.start()
+
+        flusher.delete('sqjobs', 1)
+        flusher.close()
+
+        assert connector.batches == [('delete', 'sqjobs', [1])]
+
+    def test_default_batch_methods_of_the_connector(self):
+        connector = DummyConnector()
+        flusher = Flusher(connector)
+
+        flusher.delete('sqjobs', 1)
+        flusher.set_retry_time('sqjobs', 2, 10)
+        flusher.flush()
+
+        assert connector.deleted_jobs == {'sqjobs': [1]}
+        assert connector.retried_jobs == {'sqjobs': [(2, 10)]}
@@ -0,0 +1,104 @@
+import threading
+import time
+
+from ..heartbeat import Heartbeat
+from .fixtures import Adder
+from .flusher_test import BatchConnector
+
+
+class BlockingConnector(BatchConnector):
+
+    def __init__(self):
+        super(BlockingConnector, self).__init__()
+        self.called = threading.Event()
+        self.unblocked = threading.Event()
+
+    def set_retry_time_batch(self, queue_name, entries):
+        self.called.set()
+        self.unblocked.wait(10)
+        return super(BlockingConnector, self).set_retry_time_batch(queue_name, entries)
+
+
+def running_job(queue_name, broker_id):
+    job = Adder()
+    job.queue_name = queue_name
+    job.broker_id = broker_id
+    return job
+
+
+class TestHeartbeat(object):
+
+    def test_heartbeat_repr(self):
+        assert repr(Heartbeat(BatchConnector(), 10)) == 'Heartbeat(10s)'
+
+    def test_default_visibility_timeout(self):
+        assert Heartbeat(BatchConnector(), 10).visibility_timeout == 30
+        assert Heartbeat(BatchConnector(), 10, 15).visibility_timeout == 15
+
+    def test_running_jobs_are_extended_in_batches(self):
+        connector = BatchConnector()
+        heartbeat = Heartbeat(connector, 10)
+
+        heartbeat.add(running_job('first', 1))
+        heartbeat.add(running_job('first', 2))
+        heartbeat.add(running_job('second', 3))
+        heartbeat.beat()
+
+        assert sorted(connector.batches) == [
+            ('retry_time', 'first', [(1, 30), (2, 30)]),
+            ('retry_time', 'second', [(3, 30)]),
+        ]
+
+    def test_finished_jobs_are_not_extended(self):
+        connector = BatchConnector()
+        heartbeat = Heartbeat(connector, 10)
+        job = running_job('first', 1)
+
+        heartbeat.add(job)
+        heartbeat.remove(job)
+        heartbeat.beat()
+
+        assert heartbeat.running_jobs() == 0
+        assert connector.batches == []
+
+    def test_jobs_are_tracked_while_a_heartbeat_is_sent(self):
+        connector = BlockingConnector()
+        heartbeat = Heartbeat(connector, 10)
+        extended = running_job('first', 1)
+        heartbeat.add(extended)
+
+        thread = threading.Thread(target=heartbeat.beat)
+        thread.start()
+        connector.called.wait(10)
+
+        try:
+            heartbeat.add(running_job('first', 2))  # Doesn't wait for the connector
+            assert heartbeat.running_jobs() == 2
+
+            removed = threading.Thread(target=heartbeat.remove, args=[extended])
+            removed.start()
+            removed.join(0.05)
+            assert removed.is_alive()  # Waits until the heartbeat is sent
+        finally:
+            connector.unblocked.set()
+            thread.join()
+
+        removed.join()
+        assert heartbeat.running_jobs() == 1
+        assert connector.batches == [('retry_time', 'first', [(1, 30)])]
+
+    def test_heartbeats_are_sent_periodically(self):
+        connector = BatchConnector()
+        heartbeat = Heartbeat(connector, 0.01)
+        heartbeat.add(running_job('first', 1))
+        heartbeat.start()
+
+        try:
+            for _ in range(100):
+                if len(connector.batches) >= 2:
+                    break
+                time.sleep(0.01)
+        finally:
+            heartbeat.close()
+
+        assert len(connector.batches) >= 2
@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+from ..brokers.standard import Standard
+from ..connectors.dummy import Dummy
+from ..idempotency import InMemoryIdempotencyStore, RedisIdempotencyStore, SQLiteIdempotencyStore
+from ..worker import Worker
+from .fixtures import Adder, ExceptionJob, FakeRedis
+from .worker_test import payload, run_until_empty
+
+
+class CountedAdder(Adder):
+    name = 'counted_adder'
+    executions = 0
+
+    def run(self, num1, num2):
+        CountedAdder.executions += 1
+        return num1 + num2
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def store(request, tmpdir):
+    if request.param == 'memory':
+        return InMemoryIdempotencyStore(ttl=60, running_ttl=60)
+
+    if request.param == 'sqlite':
+        return SQLiteIdempotencyStore(str(tmpdir.join('claims.db')), ttl=60, running_ttl=60)
+
+    return RedisIdempotencyStore(FakeRedis(), ttl=60, running_ttl=60)
+
+
+class TestIdempotencyStores(object):
+
+    def test_jobs_are_claimed_once(self, store):
+        assert store.claim('1') == store.CLAIMED
+        assert store.claim('1') == store.RUNNING
+
+        store.complete('1')
+
+        assert store.claim('1') == store.DONE
+        assert store.claim('2') == store.CLAIMED
+
+    def test_released_jobs_can_be_claimed_again(self, store):
+        store.claim('1')
+        store.release('1')
+
+        assert store.claim('1') == store.CLAIMED
+
+    def test_claims_expire(self, store):
+        store.running_ttl = 0.01
+        store.claim('1')
+        time.sleep(0.02)
+
+        assert store.claim('1') == store.CLAIMED
+
+    def test_least_recently_used_claims_are_forgotten(self):
+        store = InMemoryIdempotencyStore(max_size=2)
+
+        for key in ['1', '2', '1', '3']:
+            store.claim(key)
+
+        assert store.claim('1') == store.RUNNING
+        assert store.claim('2') == store.CLAIMED
+
+
+class TestWorkerIdempotency(object):
+
+    def setup_method(self, method):
+        CountedAdder.executions = 0
+
+        self.broker = Standard(Dummy())
+        self.store = InMemoryIdempotencyStore()
+        self.worker = Worker(self.broker, 'sqjobs', idempotency_store=self.store)
+        self.worker.register_job(CountedAdder)
+        self.worker.register_job(ExceptionJob)
+
+    def test_duplicated_jobs_are_deleted_without_running(self):
+        self.broker.connector.enqueue('sqjobs', payload('counted_adder', 1, 2))
+        self.broker.connector.enqueue('sqjobs', payload('counted_adder', 1, 2))
+        run_until_empty(self.worker)
+
+        assert CountedAdder.executions == 1
+        assert self.broker.connector.num_deleted_jobs == 2
+
+    def test_jobs_are_deduplicated_by_their_key(self):
+        for job_id in ['1', '2']:
+            job = payload('counted_adder', 1, 2)
+            job['id'], job['dedup_key'] = job_id, 'order-1'
+            self.broker.connector.enqueue('sqjobs', job)
+
+        run_until_empty(self.worker)
+
+        assert CountedAdder.executions == 1
+
+    def test_running_jobs_are_left_in_the_queue(self):
+        self.store.claim('counted_adder')
+        self.broker.connector.enqueue('sqjobs', payload('counted_adder', 1, 2))
+        run_until_empty(self.worker)
+
+        assert CountedAdder.executions == 0
+        assert self.broker.connector.num_deleted_jobs == 0
+
+    def test_failed_jobs_can_be_retried(self):
+        self.broker.connector.enqueue('sqjobs', payload('exception'))
+        run_until_empty(self.worker)
+
+        assert self.store.claim('exception') == self.store.CLAIMED
+
+    def test_executed_jobs_stay_done_if_they_can_not_be_deleted(self):
+        def delete(queue_name, message_id):
+            raise Exception('Throttled')
+
+        self.broker.connector.delete = delete
+        self.broker.connector.enqueue('sqjobs', payload('counted_adder', 1, 2))
+        run_until_empty(self.worker)
+
+        assert CountedAdder.executions == 1
+        assert self.store.claim('counted_adder') == self.store.DONE
+
+    def test_dedup_key_is_sent_in_the_payload(self):
+        self.broker.add_job(CountedAdder, 1, 2, dedup_key='order-1')
+
+        assert self.broker.connector.jobs['sqjobs'][0]['dedup_key'] == 'order-1'
+        assert self.broker.connector.jobs['sqjobs'][0]['kwargs'] == {}
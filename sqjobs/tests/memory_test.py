@@ -0,0 +1,84 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from ..connectors.memory import Memory, SharedMemory
+from .connector_contract import ConnectorContract, payload
+
+
+@pytest.fixture
+def connector():
+    return Memory(visibility_timeout=60)
+
+
+class TestMemoryConnector(ConnectorContract):
+
+    def new_connector(self, connector):
+        return connector  # Shared by threads
+
+    def test_repr(self, connector):
+        assert repr(connector) == 'Memory()'
+
+    def test_waiting_consumers_are_woken_up(self, connector):
+        timer = threading.Timer(0.05, connector.enqueue, ['sqjobs', payload('1')])
+        timer.start()
+
+        started = time.time()
+
+        assert connector.dequeue('sqjobs', wait_time=10)['id'] == '1'
+        assert time.time() - started < 1
+
+    def test_received_payloads_are_copies(self, connector):
+        connector.enqueue('sqjobs', payload('1', kwargs={'items': [1]}))
+
+        received = connector.dequeue('sqjobs', wait_time=0)
+        received['kwargs']['items'].append(2)
+        connector.release('sqjobs', [received])
+
+        assert connector.dequeue('sqjobs', wait_time=0)['kwargs'] == {'items': [1]}
+
+
+class TestSharedMemoryConnector(ConnectorContract):
+
+    @pytest.fixture
+    def connector(self, request):
+        connector = SharedMemory(visibility_timeout=60)
+        request.addfinalizer(connector.close)
+
+        return connector
+
+    def new_connector(self, connector):
+        return connector
+
+    def test_repr(self, connector):
+        assert repr(connector) == 'SharedMemory()'
+
+    def test_queues_are_shared_between_processes(self, connector):
+        connector.enqueue_batch('sqjobs', [payload(str(i)) for i in range(50)])
+        results = multiprocessing.Queue()
+
+        def consume():
+            received = []
+
+            while True:
+                payloads = connector.dequeue_batch('sqjobs', max_messages=3, wait_time=0)
+
+                if not payloads:
+                    results.put(received)
+                    return
+
+                received.extend(p['id'] for p in payloads)
+
+        processes = [multiprocessing.Process(target=consume) for _ in range(3)]
+
+        for process in processes:
+            process.start()
+
+        received = sum((results.get(timeout=10) for _ in processes), [])
+
+        for process in processes:
+            process.join()
+
+        assert sorted(received) == sorted(str(i) for i in range(50))
@@ -0,0 +1,75 @@
+from ..poller import QueuePoller
+
+
+class TestQueuePoller(object):
+
+    def test_poller_repr(self):
+        assert repr(QueuePoller(['high', 'low'])) == 'QueuePoller(high, low)'
+
+    def test_single_queue_is_long_polled(self):
+        poller = QueuePoller(['sqjobs'])
+
+        assert poller.next_queue(20, now=0) == ('sqjobs', 20)
+
+        poller.report('sqjobs', 0, now=0)
+        assert poller.next_queue(20, now=0) == ('sqjobs', 20)
+
+    def test_queues_are_polled_by_weight(self):
+        poller = QueuePoller([('high', 3), 'low'])
+        polled = []
+
+        for _ in range(8):
+            queue_name, wait_time = poller.next_queue(20, now=0)
+            poller.report(queue_name, 1, now=0)
+            polled.append(queue_name)
+
+            assert wait_time == 0  # Both queues have work
+
+        assert polled.count('high') == 6
+        assert polled.count('low') == 2
+        assert polled[:4] == ['high', 'high', 'low', 'high']
+
+    def test_strict_priority(self):
+        poller = QueuePoller(['high', 'low'], strict_priority=True)
+
+        assert poller.next_queue(20, now=0)[0] == 'high'
+        poller.report('high', 1, now=0)
+        assert poller.next_queue(20, now=0)[0] == 'high'
+
+        poller.report('high', 0, now=0)
+        assert poller.next_queue(20, now=0)[0] == 'low'
+
+    def test_idle_queues_back_off(self):
+        poller = QueuePoller(['first', 'second'], max_backoff=8)
+
+        for now, backoff in [(0, 1), (10, 2), (20, 4), (30, 8), (40, 8)]:
+            poller.report('first', 0, now=now)
+            assert poller.next_queue(20, now=now + backoff - 0.5)[0] == 'second'
+            assert poller.next_queue(20, now=now + backoff)[1] == 0
+
+        poller.report('first', 1, now=50)
+        assert poller.next_queue(20, now=50)[1] == 0
+
+    def test_idle_time(self):
+        poller = QueuePoller(['sqjobs'])
+        poller.report('sqjobs', 0, now=0)
+        poller.report('sqjobs', 0, now=0)
+
+        assert poller.idle_time('sqjobs', now=0.5) == 1.5
+        assert poller.idle_time('sqjobs', now=3) == 0
+
+    def test_only_active_queue_is_long_polled_until_the_others_wake_up(self):
+        poller = QueuePoller(['first', 'second'])
+        poller.report('first', 0, now=0)
+        poller.report('first', 0, now=0)
+        poller.report('first', 0, now=0)  # Idle for 4 seconds
+
+        assert poller.next_queue(20, now=1) == ('second', 3)
+
+    def test_all_idle_queues_long_poll_the_first_to_wake_up(self):
+        poller = QueuePoller(['first', 'second'])
+        poller.report('first', 0, now=0)
+        poller.report('first', 0, now=0)
+        poller.report('second', 0, now=0)
+
+        assert poller.next_queue(20, now=0.5) == ('second', 1)
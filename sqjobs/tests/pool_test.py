@@ -0,0 +1,99 @@
+import os
+import threading
+
+import boto3
+import mock
+
+from ..connectors import pool
+from ..connectors.pool import build_config, get_connection
+from ..connectors.sqs import SQS
+
+
+class TestConnectionPool(object):
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connections_are_shared_between_connectors(self, resource_mock):
+        first = SQS('ACCESS_KEY', 'SECRET_KEY')
+        second = SQS('ACCESS_KEY', 'SECRET_KEY')
+
+        assert first.connection is second.connection
+        assert resource_mock.call_count == 1
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connections_are_not_shared_if_parameters_differ(self, resource_mock):
+        resource_mock.side_effect = lambda **kwargs: mock.Mock()
+
+        connections = [
+            get_connection('sqs', 'us-east-1', 'ACCESS_KEY', 'SECRET_KEY'),
+            get_connection('sqs', 'eu-west-1', 'ACCESS_KEY', 'SECRET_KEY'),
+            get_connection('sqs', 'us-east-1', 'ACCESS_KEY', 'SECRET_KEY', endpoint_url='my_url'),
+            get_connection('sqs', 'us-east-1', 'ACCESS_KEY', 'SECRET_KEY', read_timeout=30),
+        ]
+
+        assert len(set(id(connection) for connection in connections)) == 4
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connections_are_not_shared_if_disabled(self, resource_mock):
+        resource_mock.side_effect = lambda **kwargs: mock.Mock()
+
+        first = SQS('ACCESS_KEY', 'SECRET_KEY', shared_connection=False)
+        second = SQS('ACCESS_KEY', 'SECRET_KEY', shared_connection=False)
+
+        assert first.connection is not second.connection
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_every_thread_has_its_own_connections(self, resource_mock):
+        resource_mock.side_effect = lambda **kwargs: mock.Mock()
+        connections = []
+
+        def connect():
+            connector = SQS('ACCESS_KEY', 'SECRET_KEY')
+            connections.append((connector.connection, SQS('ACCESS_KEY', 'SECRET_KEY').connection))
+
+        threads = [threading.Thread(target=connect) for _ in range(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        assert all(first is second for first, second in connections)
+        assert len(set(id(first) for first, _ in connections)) == 8
+        assert resource_mock.call_count == 8
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connections_are_not_inherited_by_child_processes(self, resource_mock):
+        resource_mock.side_effect = lambda **kwargs: mock.Mock()
+        connection = get_connection('sqs', 'us-east-1', 'ACCESS_KEY', 'SECRET_KEY')
+
+        with mock.patch.object(pool, '_pid', os.getpid() + 1):
+            assert get_connection('sqs', 'us-east-1', 'ACCESS_KEY', 'SECRET_KEY') is not connection
+
+    @mock.patch.object(boto3.session.Session, 'resource')
+    def test_connection_options_are_passed_to_botocore(self, resource_mock):
+        SQS('ACCESS_KEY', 'SECRET_KEY', connection_options={
+            'max_pool_connections': 50, 'retry_mode': 'adaptive', 'read_timeout': 30,
+        }).connection
+
+        config = resource_mock.call_args[1]['config']
+
+        assert config.max_pool_connections == 50
+        assert config.read_timeout == 30
+        assert config.retries == {'mode': 'adaptive'}
+
+    def test_build_config_keeps_botocore_defaults(self):
+        config = build_config(connect_timeout=5, tcp_keepalive=True, max_attempts=3)
+
+        assert config.connect_timeout == 5
+        assert config.tcp_keepalive is True
+        assert config.retries == {'max_attempts': 3}
+        assert config.max_pool_connections == 10
+
+    def test_build_config_leaves_out_unsupported_options(self):
+        with mock.patch.object(pool, 'supported_options', return_value=set(['read_timeout'])):
+            config = build_config(read_timeout=30, tcp_keepalive=True, retry_mode='adaptive')
+
+        assert config.read_timeout == 30
+        assert config.tcp_keepalive is not True
+        assert config.retries is None
@@ -0,0 +1,40 @@
+import pytest
+
+from ..connectors.redis import Redis
+from .connector_contract import ConnectorContract, payload
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def connector():
+    return Redis(fakeredis.FakeStrictRedis(), visibility_timeout=60, max_wait=0.01)
+
+
+class TestRedisConnector(ConnectorContract):
+
+    def new_connector(self, connector):
+        return Redis(connector.client, max_wait=0.01)
+
+    def test_repr(self, connector):
+        assert repr(connector) == 'Redis("sqjobs:")'
+
+    def test_enqueue_batch_is_sent_in_a_single_round_trip(self, connector):
+        pipelines = []
+        pipeline = connector.client.pipeline
+
+        def count_pipelines(*args, **kwargs):
+            pipelines.append(1)
+            return pipeline(*args, **kwargs)
+
+        connector.client.pipeline = count_pipelines
+        connector.enqueue_batch('sqjobs', [payload(str(i)) for i in range(10)])
+
+        assert len(pipelines) == 1
+        assert len(connector.dequeue_batch('sqjobs', max_messages=10, wait_time=0)) == 10
+
+    def test_waiting_consumers_are_woken_up(self, connector):
+        connector.max_wait = 5
+        connector.client.brpop = lambda keys, timeout: connector.enqueue('sqjobs', payload('1'))
+
+        assert connector.dequeue('sqjobs', wait_time=10)['id'] == '1'
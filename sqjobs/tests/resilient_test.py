@@ -0,0 +1,222 @@
+import socket
+import time
+
+import botocore.exceptions
+import pytest
+
+from ..brokers.standard import Standard
+from ..connectors.dummy import Dummy
+from ..connectors.resilient import CircuitBreaker, Resilient, TokenBucket, backoff
+from ..exceptions import CircuitOpen, QueueDoesNotExist
+from .fixtures import Adder
+
+
+def throttling_error():
+    return botocore.exceptions.ClientError(
+        {'Error': {'Code': 'RequestThrottled'}, 'ResponseMetadata': {'HTTPStatusCode': 403}},
+        'SendMessage'
+    )
+
+
+class FlakyConnector(Dummy):
+    """
+    Dummy connector whose calls raise the errors of `self.errors` before succeeding
+    """
+
+    def __init__(self, errors=None):
+        super(FlakyConnector, self).__init__()
+        self.errors = list(errors or [])
+        self.calls = 0
+
+    def enqueue(self, queue_name, payload):
+        self._fail()
+        super(FlakyConnector, self).enqueue(queue_name, payload)
+
+    def dequeue_batch(self, queue_name, max_messages=10, wait_time=20):
+        self._fail()
+        return super(FlakyConnector, self).dequeue_batch(queue_name, max_messages, wait_time)
+
+    def enqueue_batch(self, queue_name, payloads):
+        self._fail()
+        return super(FlakyConnector, self).enqueue_batch(queue_name, payloads)
+
+    def delete(self, queue_name, message_id):
+        self._fail()
+        super(FlakyConnector, self).delete(queue_name, message_id)
+
+    def _fail(self):
+        self.calls += 1
+
+        if self.errors:
+            raise self.errors.pop(0)
+
+
+class PartiallyFailingConnector(Dummy):
+    """
+    Dummy connector whose batches fail to send the payloads of `self.failures`
+    (a dict with the number of failures of every payload ID)
+    """
+
+    def __init__(self, failures):
+        super(PartiallyFailingConnector, self).__init__()
+        self.failures = dict(failures)
+        self.batches = []
+
+    def enqueue_batch(self, queue_name, payloads):
+        self.batches.append([payload['id'] for payload in payloads])
+        errors = []
+
+        for payload in payloads:
+            if self.failures.get(payload['id']):
+                self.failures[payload['id']] -= 1
+                errors.append('Throttled')
+            else:
+                self.enqueue(queue_name, payload)
+                errors.append(None)
+
+        return errors
+
+
+def resilient(errors=None, **options):
+    options.setdefault('base_delay', 0.001)
+    return Resilient(FlakyConnector(errors), **options)
+
+
+class TestResilientConnector(object):
+
+    def test_repr(self):
+        assert repr(Resilient(Dummy())).startswith('Resilient(<sqjobs.connectors.dummy.Dummy')
+
+    def test_transient_errors_are_retried(self):
+        connector = resilient([throttling_error(), socket.error()])
+
+        connector.delete('sqjobs', '1')
+
+        assert connector.connector.calls == 3
+        assert connector.connector.deleted_jobs == {'sqjobs': ['1']}
+        assert connector.metrics['retries'] == 2
+        assert connector.metrics['circuit_state'] == CircuitBreaker.CLOSED
+
+    def test_the_error_is_raised_after_the_last_attempt(self):
+        connector = resilient([throttling_error()] * 3, max_attempts=3)
+
+        with pytest.raises(botocore.exceptions.ClientError):
+            connector.delete('sqjobs', '1')
+
+        assert connector.connector.calls == 3
+
+    def test_other_errors_are_not_retried(self):
+        connector = resilient([QueueDoesNotExist('sqjobs'), ValueError()])
+
+        with pytest.raises(QueueDoesNotExist):
+            connector.delete('sqjobs', '1')
+
+        with pytest.raises(ValueError):
+            connector.delete('sqjobs', '1')
+
+        assert connector.connector.calls == 2
+        assert connector.metrics['failures'] == 0
+
+    def test_enqueues_are_not_retried(self):
+        connector = resilient([throttling_error(), socket.error()])
+
+        with pytest.raises(botocore.exceptions.ClientError):
+            connector.enqueue('sqjobs', {'id': '1'})
+
+        with pytest.raises(socket.error):
+            connector.enqueue_batch('sqjobs', [{'id': '1'}])
+
+        assert connector.connector.calls == 2
+        assert connector.metrics['retries'] == 0
+
+    def test_only_the_failed_messages_of_a_batch_are_sent_again(self):
+        connector = Resilient(
+            PartiallyFailingConnector({'2': 1, '3': 5}), max_attempts=3, base_delay=0.001
+        )
+
+        errors = connector.enqueue_batch('sqjobs', [{'id': '1'}, {'id': '2'}, {'id': '3'}])
+
+        assert errors == [None, None, 'Throttled']
+        assert connector.connector.batches == [['1', '2', '3'], ['2', '3'], ['3']]
+        assert connector.metrics['retries'] == 2
+
+    def test_producers_fail_fast_while_the_circuit_is_open(self):
+        connector = resilient([throttling_error()] * 2, failure_threshold=2, reset_timeout=60)
+
+        with pytest.raises(botocore.exceptions.ClientError):
+            connector.delete('sqjobs', '1')
+
+        with pytest.raises(CircuitOpen):
+            connector.enqueue('sqjobs', {'id': '1'})
+
+        assert connector.connector.calls == 2
+        assert connector.metrics['circuit_state'] == CircuitBreaker.OPEN
+        assert connector.metrics['rejected'] == 1
+
+    def test_circuit_is_closed_after_a_successful_trial(self):
+        connector = resilient([throttling_error()] * 2, failure_threshold=2, reset_timeout=0.01)
+
+        with pytest.raises(botocore.exceptions.ClientError):
+            connector.delete('sqjobs', '1')
+
+        time.sleep(0.02)
+        connector.enqueue('sqjobs', {'id': '1'})
+
+        assert connector.metrics['circuit_state'] == CircuitBreaker.CLOSED
+        assert connector.metrics['circuit_opened'] == 1
+
+    def test_consumers_sleep_while_the_circuit_is_open(self):
+        connector = resilient([throttling_error()] * 2, failure_threshold=2, reset_timeout=60)
+
+        assert connector.dequeue_batch('sqjobs', wait_time=0) == []
+
+        started = time.time()
+
+        assert connector.dequeue_batch('sqjobs', wait_time=0.05) == []
+        assert time.time() - started >= 0.05
+        assert connector.connector.calls == 2
+
+    def test_workers_keep_consuming_after_transient_errors(self):
+        connector = resilient([socket.error()] * 4, max_attempts=2, failure_threshold=10)
+        broker = Standard(connector)
+        connector.connector.jobs['sqjobs'] = [{'id': '1'}]
+
+        jobs = broker.jobs('sqjobs', timeout=0.01)
+
+        assert next(jobs) == {'id': '1'}
+        assert broker.empty_receives == 2
+
+    def test_jobs_are_serialized_by_the_wrapped_connector(self):
+        connector = Resilient(Dummy())
+
+        expected = Dummy().serialize_job('adder', '1', [1, 2], {})
+
+        assert connector.serialize_job('adder', '1', [1, 2], {}) == expected
+
+
+class TestTokenBucket(object):
+
+    def test_calls_wait_for_tokens(self):
+        bucket = TokenBucket(rate=100, capacity=2)
+        started = time.time()
+
+        for _ in range(4):
+            bucket.acquire()
+
+        assert time.time() - started >= 0.015
+        assert bucket.metrics['throttled'] == 2
+
+    def test_tokens_are_refilled(self):
+        bucket = TokenBucket(rate=1000, capacity=5)
+
+        for _ in range(5):
+            bucket.acquire()
+
+        time.sleep(0.01)
+
+        assert bucket.metrics['tokens'] == 5
+
+
+def test_backoff_grows_exponentially_up_to_max_delay():
+    for attempt in range(10):
+        assert 0 <= backoff(attempt, 0.1, 1) <= min(1, 0.1 * 2 ** attempt)
@@ -0,0 +1,202 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from ..brokers.standard import Standard
+from ..connectors.dummy import Dummy
+from ..exceptions import JobFailed, ResultTimeout
+from ..job import JobResult
+from ..results import InMemoryResultBackend, RedisResultBackend, SQLiteResultBackend
+from ..worker import Worker
+from .fixtures import Adder, ExceptionJob, FakeRedis
+from .worker_test import payload, run_until_empty
+
+
+class GivingUpJob(ExceptionJob):
+    name = 'giving_up'
+    max_retries = 1
+
+
+class FailingOnceAdder(Adder):
+    name = 'failing_once'
+    failures = 0
+
+    def run(self, num1, num2):
+        if FailingOnceAdder.failures:
+            FailingOnceAdder.failures -= 1
+            raise Exception('Failing once')
+
+        return super(FailingOnceAdder, self).run(num1, num2)
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def backend(request, tmpdir):
+    if request.param == 'memory':
+        return InMemoryResultBackend(ttl=60)
+
+    if request.param == 'sqlite':
+        return SQLiteResultBackend(str(tmpdir.join('results.db')), ttl=60)
+
+    return RedisResultBackend(FakeRedis(), ttl=60)
+
+
+class TestResultBackends(object):
+
+    def test_results_are_stored_and_fetched(self, backend):
+        backend.store('1', backend.SUCCESS, {'total': 3})
+
+        assert backend.fetch('1') == ('SUCCESS', {'total': 3})
+        assert backend.fetch('2') is None
+
+    def test_results_are_fetched_in_bulk(self, backend):
+        backend.store('1', backend.SUCCESS, 3)
+        backend.store('2', backend.FAILURE, 'ZeroDivisionError')
+
+        assert backend.fetch_many(['1', '2', '3']) == {
+            '1': ('SUCCESS', 3),
+            '2': ('FAILURE', 'ZeroDivisionError'),
+        }
+
+    def test_results_are_encoded_like_the_payloads(self, backend):
+        backend.store('1', backend.SUCCESS, {'created_on': datetime(2020, 1, 2, 3, 4, 5)})
+
+        assert backend.fetch('1') == ('SUCCESS', {'created_on': '2020-01-02 03:04:05'})
+
+    def test_results_that_can_not_be_encoded_are_failures(self, backend):
+        circular = []
+        circular.append(circular)
+        backend.store('1', backend.SUCCESS, circular)
+
+        status, error = backend.fetch('1')
+
+        assert status == backend.FAILURE
+        assert 'can not be encoded' in error
+
+    def test_results_expire(self, backend):
+        backend.ttl = 0.01
+        backend.store('1', backend.SUCCESS, 3)
+        time.sleep(0.02)
+
+        assert backend.fetch('1') is None
+        assert backend.fetch_many(['1']) == {}
+
+    def test_expired_results_are_purged(self, tmpdir):
+        backend = SQLiteResultBackend(str(tmpdir.join('results.db')), ttl=0.01, purge_interval=0.01)
+        backend.store('1', backend.SUCCESS, 3)
+        time.sleep(0.02)
+        backend.store('2', backend.SUCCESS, 3)
+
+        rows = backend.connection.execute('SELECT job_id FROM sqjobs_results').fetchall()
+
+        assert rows == [('2',)]
+
+    def test_redis_results_are_fetched_in_a_single_call(self):
+        backend = RedisResultBackend(FakeRedis())
+        backend.fetch_many(['1', '2', '3'])
+
+        assert backend.client.calls == ['mget']
+
+
+class TestJobResult(object):
+
+    def result(self, backend, job_id):
+        result = JobResult()
+        result.job_id = job_id
+        result.backend = backend
+
+        return result
+
+    def worker(self, broker, *job_classes):
+        worker = Worker(broker, 'sqjobs')
+
+        for job_class in job_classes:
+            worker.register_job(job_class)
+
+        return worker
+
+    def test_get_waits_for_the_result(self):
+        backend = InMemoryResultBackend()
+        result = self.result(backend, '1')
+
+        assert not result.ready()
+
+        backend.store('1', backend.SUCCESS, 3)
+
+        assert result.ready()
+        assert result.get(timeout=1) == 3
+
+    def test_get_raises_if_the_job_failed(self):
+        backend = InMemoryResultBackend()
+        backend.store('1', backend.FAILURE, 'ZeroDivisionError')
+
+        with pytest.raises(JobFailed):
+            self.result(backend, '1').get()
+
+    def test_get_raises_after_timeout(self):
+        with pytest.raises(ResultTimeout):
+            self.result(InMemoryResultBackend(), '1').get(timeout=0.05, interval=0.01)
+
+    def test_get_many_fetches_all_the_results_at_once(self):
+        backend = RedisResultBackend(FakeRedis())
+        backend.store('1', backend.SUCCESS, 3)
+        backend.store('2', backend.SUCCESS, 5)
+
+        results = [self.result(backend, '1'), self.result(backend, '2')]
+
+        assert JobResult.get_many(results, timeout=1) == [3, 5]
+        assert backend.client.calls == ['set', 'set', 'mget']
+
+    def test_results_of_the_broker_use_its_backend(self):
+        backend = InMemoryResultBackend()
+        broker = Standard(Dummy(), result_backend=backend)
+
+        assert broker.add_job(Adder, 1, 2).backend is backend
+        assert broker.add_jobs([(Adder, (1, 2), {})])[0].backend is backend
+
+    def test_results_without_backend_can_not_be_fetched(self):
+        with pytest.raises(RuntimeError):
+            JobResult().get()
+
+    def test_results_of_the_workers_are_fetched(self):
+        backend = InMemoryResultBackend()
+        broker = Standard(Dummy(), result_backend=backend)
+        worker = Worker(broker, 'sqjobs')
+        worker.register_job(Adder)
+        worker.register_job(GivingUpJob)
+
+        broker.connector.enqueue('sqjobs', payload('adder', 1, 2))
+        broker.connector.enqueue('sqjobs', payload('giving_up'))
+        run_until_empty(worker)
+
+        added, failed = self.result(backend, 'adder'), self.result(backend, 'giving_up')
+
+        assert added.get(timeout=1) == 3
+
+        with pytest.raises(JobFailed) as error:
+            failed.get(timeout=1)
+
+        assert 'Exception: Test' in str(error.value)
+        assert broker.connector.deleted_jobs == {'sqjobs': ['giving_up', 'adder']}
+
+    def test_results_of_retried_jobs_are_not_final(self):
+        backend = InMemoryResultBackend()
+        broker = Standard(Dummy(), result_backend=backend)
+        FailingOnceAdder.failures = 1
+
+        broker.connector.enqueue('sqjobs', payload('failing_once', 1, 2))
+        run_until_empty(self.worker(broker, FailingOnceAdder))
+
+        result = self.result(backend, 'failing_once')
+
+        assert not result.ready()
+        assert result.status == backend.RETRY
+        assert 'Exception: Failing once' in result.result
+
+        with pytest.raises(ResultTimeout):
+            result.get(timeout=0.05, interval=0.01)
+
+        broker.connector.enqueue('sqjobs', payload('failing_once', 1, 2))  # Delivered again
+        run_until_empty(self.worker(broker, FailingOnceAdder))
+
+        assert result.get(timeout=1) == 3
@@ -0,0 +1,70 @@
+from datetime import date, datetime
+
+import pytest
+
+from ..serializers import Codec, SERIALIZERS, COMPRESSORS
+
+PAYLOAD = {'name': 'adder', 'args': [1, 2], 'kwargs': {'text': u'\xf1' * 10}}
+
+
+class TestCodec(object):
+
+    def test_default_codec_is_untagged(self):
+        body, tag = Codec().encode(PAYLOAD)
+
+        assert tag is None
+        assert Codec.decode(body) == PAYLOAD
+
+    def test_raw_json(self):
+        body, tag = Codec(base64=False).encode(PAYLOAD)
+
+        assert tag == 'json'
+        assert body.startswith('{')
+        assert Codec.decode(body, tag) == PAYLOAD
+
+    def test_dates_are_formatted(self):
+        body, tag = Codec().encode({'on': datetime(2016, 4, 9, 7, 16, 44), 'day': date(2016, 4, 9)})
+
+        assert Codec.decode(body, tag) == {'on': '2016-04-09 07:16:44', 'day': '2016-04-09'}
+
+    def test_small_payloads_are_not_compressed(self):
+        body, tag = Codec(compression='zlib').encode(PAYLOAD)
+
+        assert tag is None
+        assert Codec.decode(body, tag) == PAYLOAD
+
+    def test_big_payloads_are_compressed(self):
+        payload = {'data': 'x' * 10000}
+        body, tag = Codec(compression='zlib', base64=False).encode(payload)
+
+        assert tag == 'json+zlib/b64'
+        assert len(body) < 1000
+        assert Codec.decode(body, tag) == payload
+
+    def test_bytes_bodies_can_be_decoded(self):
+        body, tag = Codec().encode(PAYLOAD)
+
+        assert Codec.decode(body.encode('utf-8'), tag) == PAYLOAD
+
+    @pytest.mark.skipif('msgpack' not in SERIALIZERS, reason='msgpack not installed')
+    def test_msgpack_is_always_base64_encoded(self):
+        body, tag = Codec('msgpack', base64=False).encode(PAYLOAD)
+
+        assert tag == 'msgpack/b64'
+        assert Codec.decode(body, tag) == PAYLOAD
+
+    @pytest.mark.skipif('lz4' not in COMPRESSORS, reason='lz4 not installed')
+    def test_lz4_compression(self):
+        payload = {'data': 'x' * 10000}
+        body, tag = Codec(compression='lz4').encode(payload)
+
+        assert tag == 'json+lz4/b64'
+        assert Codec.decode(body, tag) == payload
+
+    def test_unknown_serializer(self):
+        with pytest.raises(ValueError):
+            Codec('unknown')
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            Codec.decode('e30=', 'unknown/b64')
@@ -0,0 +1,18 @@
+import pytest
+
+from ..connectors.sqlite import SQLite
+from .connector_contract import ConnectorContract
+
+
+@pytest.fixture
+def connector(tmpdir):
+    return SQLite(str(tmpdir.join('queues.db')), visibility_timeout=60, poll_interval=0.01)
+
+
+class TestSQLiteConnector(ConnectorContract):
+
+    def new_connector(self, connector):
+        return SQLite(connector.path, poll_interval=0.01)
+
+    def test_repr(self, connector):
+        assert repr(connector) == 'SQLite("{path}")'.format(path=connector.path)
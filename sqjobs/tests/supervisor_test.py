@@ -0,0 +1,72 @@
+import os
+import signal
+
+from ..supervisor import Supervisor
+
+
+class FakeWorker(object):
+
+    def __init__(self, path, stop_after, fail=False):
+        self.path = path
+        self.stop_after = stop_after
+        self.fail = fail
+
+    def run(self):
+        with open(self.path, 'a') as f:
+            f.write('%d\n' % os.getpid())
+
+        with open(self.path) as f:
+            runs = len(f.readlines())
+
+        if runs >= self.stop_after:
+            os.kill(os.getppid(), signal.SIGTERM)
+
+        if self.fail:
+            raise ValueError('Worker crashed')
+
+
+class TestSupervisor(object):
+
+    def run_supervisor(self, supervisor):
+        handlers = signal.getsignal(signal.SIGINT), signal.getsignal(signal.SIGTERM)
+        supervisor.MIN_CHILD_LIFETIME = 0
+
+        try:
+            supervisor.run()
+        finally:
+            signal.signal(signal.SIGINT, handlers[0])
+            signal.signal(signal.SIGTERM, handlers[1])
+
+    def test_supervisor_repr(self):
+        assert repr(Supervisor(None, 4)) == 'Supervisor(4)'
+
+    def test_finished_workers_are_replaced(self, tmpdir):
+        path = str(tmpdir.join('runs'))
+        supervisor = Supervisor(lambda: FakeWorker(path, stop_after=3), 1)
+
+        self.run_supervisor(supervisor)
+
+        with open(path) as f:
+            pids = f.read().split()
+
+        assert len(pids) >= 3
+        assert len(set(pids)) == len(pids)
+        assert supervisor.children == {}
+
+    def test_crashed_workers_are_replaced(self, tmpdir):
+        path = str(tmpdir.join('runs'))
+        supervisor = Supervisor(lambda: FakeWorker(path, stop_after=2, fail=True), 1)
+
+        self.run_supervisor(supervisor)
+
+        with open(path) as f:
+            assert len(f.readlines()) >= 2
+
+    def test_several_workers_are_forked(self, tmpdir):
+        path = str(tmpdir.join('runs'))
+        supervisor = Supervisor(lambda: FakeWorker(path, stop_after=3), 3)
+
+        self.run_supervisor(supervisor)
+
+        with open(path) as f:
+            assert len(f.readlines()) >= 3
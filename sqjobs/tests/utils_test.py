@@ -1,6 +1,7 @@
 from sqjobs import metadata
 from sqjobs.brokers.eager import Eager
 from sqjobs.brokers.standard import Standard
+from sqjobs.connectors.resilient import Resilient
 from sqjobs.connectors.sqs import SQS
 from sqjobs.utils import (
     create_sqs_broker, create_sqs_worker, get_jobs_from_module, create_eager_broker
@@ -29,6 +30,13 @@ class TestBuilders(object):
         broker = create_sqs_broker('access', 'secret', 'eu-west-1')
         assert broker.connector.region_name == 'eu-west-1'
 
+    def test_broker_builder_with_resilience(self):
+        broker = create_sqs_broker('access', 'secret', resilience_options={'rate_limit': 100})
+
+        assert isinstance(broker.connector, Resilient)
+        assert isinstance(broker.connector.connector, SQS)
+        assert broker.connector.rate_limiter.rate == 100
+
     def test_worker_builder(self):
         worker = create_sqs_worker('queue_name', 'access', 'secret')
 
@@ -1,9 +1,68 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mock
 import pytest
 
 from ..connectors.dummy import Dummy as DummyConnector
 from ..worker import Worker
 from ..brokers.standard import Standard as StandardBroker
 from .fixtures import Adder, FakeAdder, AbstractAdder, RetryJob, ExceptionJob
+from sqjobs import Job
+
+
+class SlowJob(Job):
+    name = 'slow'
+    threads = set()
+
+    def run(self, seconds):
+        SlowJob.threads.add(threading.current_thread().name)
+        time.sleep(seconds)
+
+
+class HeartbeatJob(Job):
+    name = 'heartbeat'
+    worker = None
+
+    def run(self):
+        HeartbeatJob.worker.heartbeat.beat()
+
+
+def payload(name, *args):
+    return {
+        'id': name,
+        'name': name,
+        'args': args,
+        'kwargs': {},
+        '_metadata': {'id': name, 'retries': 1, 'created_on': None},
+    }
+
+
+def run_until_empty(worker):
+    """
+    Runs a worker until its queue is empty
+    """
+    connector = worker.broker.connector
+    dequeue_batch = connector.dequeue_batch
+
+    def dequeue_or_stop(queue_name, max_messages=10, wait_time=20):
+        payloads = dequeue_batch(queue_name, max_messages, wait_time)
+
+        if not payloads:
+            worker._shutting_down = True
+            payloads = [payload('stop')]
+
+        return payloads
+
+    connector.dequeue_batch = dequeue_or_stop
+
+    try:
+        worker.run()
+    finally:
+        del connector.dequeue_batch
+
+    connector.jobs[worker.queue_name].remove(payload('stop'))
 
 
 class TestWorker(object):
@@ -48,3 +107,149 @@ class TestWorker(object):
 
         assert len(worker.registered_jobs) == 1
         assert worker.registered_jobs[FakeAdder.name] == FakeAdder
+
+    def test_prefetched_jobs_are_released_on_shutdown(self):
+        broker = self.broker
+        worker = Worker(broker, 'sqjobs', prefetch=3)
+        worker.register_job(Adder)
+
+        for i in range(3):
+            broker.add_job(Adder, i, i)
+
+        worker._shutting_down = True
+        worker.run()
+
+        assert broker.connector.num_jobs == 3
+        assert [job['args'] for job in broker.connector.jobs['sqjobs']] == [(0, 0), (1, 1), (2, 2)]
+
+    def test_batched_acks_are_sent_on_shutdown(self):
+        broker = self.broker
+        worker = Worker(broker, 'sqjobs', batch_acks=True)
+        job = Adder()
+        job.queue_name = 'sqjobs'
+        job.broker_id = 'id'
+
+        worker._execute_job(job, [1, 2], {})
+
+        assert broker.connector.num_deleted_jobs == 0
+        assert worker.flusher.pending() == 1
+
+        worker._shutting_down = True
+        broker.add_job(Adder, 1, 2)
+        worker.run()
+
+        assert broker.connector.deleted_jobs == {'sqjobs': ['id']}
+
+    def test_jobs_are_executed_in_threads(self):
+        broker = self.broker
+        worker = Worker(broker, 'sqjobs', concurrency=4)
+        worker.register_job(SlowJob)
+        SlowJob.threads.clear()
+
+        for _ in range(4):
+            broker.connector.enqueue('sqjobs', payload('slow', 0.1))
+
+        run_until_empty(worker)
+
+        assert broker.connector.num_deleted_jobs == 4
+        assert len(SlowJob.threads) > 1
+        assert threading.current_thread().name not in SlowJob.threads
+
+    def test_no_more_messages_are_retrieved_than_can_be_executed(self):
+        worker = Worker(self.broker, 'sqjobs', concurrency=2)
+        worker.register_job(SlowJob)
+        executor = ThreadPoolExecutor(2)
+
+        worker._submit(executor, payload('slow', 0.2))
+        worker._submit(executor, payload('slow', 0.2))
+        assert worker._in_flight == 2
+
+        start = time.time()
+        assert worker._wait_for_slot() is True
+        assert time.time() - start >= 0.1
+        assert worker._in_flight < 2
+
+        executor.shutdown(wait=True)
+        assert worker._in_flight == 0
+
+    def test_worker_stops_after_max_jobs(self):
+        broker = self.broker
+        worker = Worker(broker, 'sqjobs', max_jobs=2)
+        worker.register_job(Adder)
+
+        for i in range(3):
+            broker.connector.enqueue('sqjobs', payload('adder', i, i))
+
+        worker.run()
+
+        assert broker.connector.num_deleted_jobs == 2
+        assert broker.connector.num_jobs == 1
+
+    def test_empty_receives_are_skipped(self):
+        broker = self.broker
+
+        def jobs(queue_name, timeout, prefetch):
+            for job in [None, payload('adder', 1, 2), None]:
+                yield job
+
+        broker.jobs = jobs
+        worker = Worker(broker, 'sqjobs', max_jobs=2)
+        worker.register_job(Adder)
+
+        worker.run()
+
+        assert worker._processed_jobs == 1
+        assert broker.connector.num_deleted_jobs == 1
+
+    def test_idle_queues_are_not_polled_in_a_loop_in_non_blocking_mode(self):
+        broker = self.broker
+        worker = Worker(broker, 'sqjobs', timeout=0)
+
+        def stop(seconds):
+            worker._shutting_down = True
+
+        with mock.patch('time.sleep', side_effect=stop) as sleep:
+            worker.run()
+
+        assert worker.timeout == 0
+        assert (broker.receives, broker.empty_receives) == (1, 1)
+        assert sleep.call_count == 1
+
+    def test_worker_stops_when_memory_limit_is_reached(self):
+        broker = self.broker
+        worker = Worker(broker, 'sqjobs', max_memory=1)
+        worker.register_job(Adder)
+
+        for i in range(2):
+            broker.connector.enqueue('sqjobs', payload('adder', i, i))
+
+        worker.run()
+
+        assert broker.connector.num_deleted_jobs == 1
+
+    def test_worker_with_several_queues(self):
+        broker = self.broker
+        worker = Worker(broker, [('sqjobs', 2), 'math_operations'])
+        worker.register_job(Adder)
+
+        assert worker.queue_names == ['sqjobs', 'math_operations']
+
+        broker.connector.enqueue('sqjobs', payload('adder', 1, 1))
+        broker.connector.enqueue('math_operations', payload('adder', 2, 2))
+
+        run_until_empty(worker)
+
+        assert broker.connector.deleted_jobs == {'sqjobs': ['adder'], 'math_operations': ['adder']}
+
+    def test_visibility_is_extended_while_the_job_runs(self):
+        broker = self.broker
+        worker = Worker(broker, 'sqjobs', heartbeat=10)
+        worker.register_job(HeartbeatJob)
+        HeartbeatJob.worker = worker
+
+        broker.connector.enqueue('sqjobs', payload('heartbeat'))
+        run_until_empty(worker)
+
+        assert broker.connector.retried_jobs == {'sqjobs': [('heartbeat', 30)]}
+        assert broker.connector.num_deleted_jobs == 1
+        assert worker.heartbeat.running_jobs() == 0
@@ -4,6 +4,9 @@ import inspect
 from .job import Job
 from .brokers.standard import Standard
 from .brokers.eager import Eager
+from .connectors.redis import Redis
+from .connectors.resilient import Resilient
+from .connectors.sqlite import SQLite
 from .connectors.sqs import SQS
 from .worker import Worker
 
@@ -15,20 +18,53 @@ def create_eager_broker():
     return Eager()
 
 
-def create_sqs_broker(access_key, secret_key, region_name='us-west-1', endpoint_url=None):
+def create_sqs_broker(access_key, secret_key, region_name='us-west-1', endpoint_url=None,
+                      codec=None, blob_store=None, connection_options=None, result_backend=None,
+                      resilience_options=None):
     sqs = SQS(
         access_key=access_key,
         secret_key=secret_key,
         region_name=region_name,
         endpoint_url=endpoint_url,
+        codec=codec,
+        blob_store=blob_store,
+        connection_options=connection_options,
     )
 
-    return Standard(sqs)
+    if resilience_options is not None:
+        sqs = Resilient(sqs, **resilience_options)
 
+    return Standard(sqs, result_backend=result_backend)
 
-def create_sqs_worker(queue_name, access_key, secret_key, region_name='us-west-1', endpoint_url=None):
-    broker = create_sqs_broker(access_key, secret_key, region_name, endpoint_url)
-    return Worker(broker, queue_name)
+
+def create_sqs_worker(queue_name, access_key, secret_key, region_name='us-west-1',
+                      endpoint_url=None, worker_class=Worker, result_backend=None,
+                      resilience_options=None, **worker_options):
+    broker = create_sqs_broker(
+        access_key, secret_key, region_name, endpoint_url,
+        result_backend=result_backend, resilience_options=resilience_options,
+    )
+    return worker_class(broker, queue_name, **worker_options)
+
+
+def create_sqlite_broker(path, result_backend=None, **connector_options):
+    return Standard(SQLite(path, **connector_options), result_backend=result_backend)
+
+
+def create_sqlite_worker(queue_name, path, worker_class=Worker, result_backend=None,
+                         **worker_options):
+    broker = create_sqlite_broker(path, result_backend=result_backend)
+    return worker_class(broker, queue_name, **worker_options)
+
+
+def create_redis_broker(url, result_backend=None, **connector_options):
+    return Standard(Redis.from_url(url, **connector_options), result_backend=result_backend)
+
+
+def create_redis_worker(queue_name, url, worker_class=Worker, result_backend=None,
+                        **worker_options):
+    broker = create_redis_broker(url, result_backend=result_backend)
+    return worker_class(broker, queue_name, **worker_options)
 
 
 def get_jobs_from_module(module_name):
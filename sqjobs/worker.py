@@ -1,8 +1,18 @@
+import resource
 import signal
 import sys
+import threading
 import traceback
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import six
 
 from .exceptions import RetryException
+from .flusher import Flusher
+from .heartbeat import Heartbeat
+from .idempotency import IdempotencyStore
+from .results import ResultBackend
 
 import logging
 logger = logging.getLogger('sqjobs.worker')
@@ -10,14 +20,35 @@ logger = logging.getLogger('sqjobs.worker')
 
 class Worker(object):
     DEFAULT_TIMEOUT = 20  # seconds
+    DEFAULT_PREFETCH = 1  # messages
+    DEFAULT_CONCURRENCY = 1  # jobs
 
-    def __init__(self, broker, queue_name, timeout=None):
+    def __init__(self, broker, queue_name, timeout=None, prefetch=None, batch_acks=False,
+                 concurrency=None, max_jobs=None, max_memory=None, strict_priority=False,
+                 heartbeat=None, idempotency_store=None):
         self.broker = broker
-        self.queue_name = queue_name
-        self.timeout = timeout or self.DEFAULT_TIMEOUT
+        self.queues = [queue_name] if isinstance(queue_name, six.string_types) else list(queue_name)
+        self.queue_names = [
+            queue if isinstance(queue, six.string_types) else queue[0] for queue in self.queues
+        ]
+        self.queue_name = self.queue_names[0]
+        self.strict_priority = strict_priority
+        # Zero is non-blocking
+        self.timeout = timeout if timeout is not None else self.DEFAULT_TIMEOUT
+        self.prefetch = prefetch or self.DEFAULT_PREFETCH
+        self.concurrency = concurrency or self.DEFAULT_CONCURRENCY
+        self.flusher = Flusher(broker.connector) if batch_acks else None
+        self.heartbeat = Heartbeat(broker.connector, heartbeat) if heartbeat else None
+        self.result_backend = getattr(broker, 'result_backend', None)
+        self.idempotency_store = idempotency_store
+        self.max_jobs = max_jobs
+        self.max_memory = max_memory
         self.registered_jobs = {}
         self.exception_handlers = []
         self._shutting_down = False
+        self._processed_jobs = 0
+        self._in_flight = 0
+        self._slots = threading.Condition()
 
         signal.signal(signal.SIGINT, self._exit_gracefully)
         signal.signal(signal.SIGTERM, self._exit_gracefully)
@@ -47,45 +78,261 @@ class Worker(object):
     def run(self):
         logger.info('Running worker, %d jobs registered...', len(self.registered_jobs))
 
-        for payload in self.broker.jobs(self.queue_name, self.timeout):
-            if self._shutting_down:
-                break
+        self.broker.warm_up(self.queue_names)
+        jobs = self._jobs()
+
+        executor = ThreadPoolExecutor(self.concurrency) if self.concurrency > 1 else None
+
+        if self.flusher:
+            self.flusher.start()
 
-            try:
-                job_class = self.registered_jobs.get(payload['name'])
+        if self.heartbeat:
+            self.heartbeat.start()
+
+        try:
+            for queue_name, payload in jobs:
+                if self._shutting_down:
+                    jobs.close()  # Releases the prefetched messages
+                    self.broker.release(queue_name, [payload])
+                    break
 
-                if not job_class:
-                    logger.error('Unregistered task: %s', payload['name'])
+                if payload is None:  # Empty receive in non-blocking mode
                     continue
 
-                job, args, kwargs = self.broker.unserialize_job(job_class, self.queue_name, payload)
-                self._set_custom_retry_time_if_needed(job)
-                self._execute_job(job, args, kwargs)
-            except:
-                logger.exception('Error executing job')
+                if not executor:
+                    self._process_payload(payload, queue_name)
+                    continue
+
+                self._submit(executor, payload, queue_name)
+
+                if not self._wait_for_slot():
+                    break
+        finally:
+            jobs.close()
+
+            if executor:
+                logger.info('Waiting for %d jobs to finish...', self._in_flight)
+                executor.shutdown(wait=True)
+
+            if self.heartbeat:
+                self.heartbeat.close()
+
+            if self.flusher:
+                self.flusher.close()
+
+    def _jobs(self):
+        """
+        Generator of (queue name, payload) tuples of the queues of the worker
+        """
+        if len(self.queues) > 1:
+            return self.broker.jobs_from_queues(
+                self.queues, self.timeout, self.prefetch, strict_priority=self.strict_priority
+            )
+
+        return self._single_queue_jobs()
+
+    def _single_queue_jobs(self):
+        jobs = self.broker.jobs(self.queue_name, self.timeout, self.prefetch)
+
+        try:
+            for payload in jobs:
+                yield self.queue_name, payload
+        finally:
+            jobs.close()
+
+    def _submit(self, executor, payload, queue_name=None):
+        with self._slots:
+            self._in_flight += 1
 
-    def _set_custom_retry_time_if_needed(self, job):
+        future = executor.submit(self._process_payload, payload, queue_name)
+        future.add_done_callback(self._release_slot)
+
+    def _release_slot(self, future):
+        with self._slots:
+            self._in_flight -= 1
+            self._slots.notify_all()
+
+    def _wait_for_slot(self):
+        """
+        Blocks until there are less than `concurrency` jobs running, so no new messages
+        are retrieved if they can't be processed. Returns False if the worker is shutting down.
+        """
+        with self._slots:
+            while self._in_flight >= self.concurrency and not self._shutting_down:
+                self._slots.wait(1)
+
+        return not self._shutting_down
+
+    def _process_payload(self, payload, queue_name=None):
+        try:
+            job_class = self.registered_jobs.get(payload['name'])
+
+            if not job_class:
+                logger.error('Unregistered task: %s', payload['name'])
+                return
+
+            job, args, kwargs = self.broker.unserialize_job(
+                job_class, queue_name or self.queue_name, payload
+            )
+
+            if not self._claim(job, payload):
+                return
+
+            self._set_custom_retry_time_if_needed(job)
+            self._execute_job(job, args, kwargs)
+        except:
+            logger.exception('Error executing job')
+        finally:
+            self._check_limits()
+
+    def _check_limits(self):
+        """
+        Stops the worker if it has reached its max jobs or max memory limits
+        """
+        with self._slots:
+            self._processed_jobs += 1
+            processed_jobs = self._processed_jobs
+
+        if self.max_jobs and processed_jobs >= self.max_jobs:
+            logger.info('%d jobs processed, shutting down the worker...', processed_jobs)
+            self._shutting_down = True
+
+        if self.max_memory and get_max_rss() >= self.max_memory:
+            logger.info('Memory limit reached (%d MB), shutting down the worker...', get_max_rss())
+            self._shutting_down = True
+
+    def _set_custom_retry_time_if_needed(self, job, deferred=False):
         if job.next_retry_time() is None:  # Use default value of the queue
             return
 
-        self.broker.set_retry_time(job, job.next_retry_time())
+        if deferred and self.flusher:
+            self.flusher.set_retry_time(job.queue_name, job.broker_id, job.next_retry_time())
+        else:
+            self.broker.set_retry_time(job, job.next_retry_time())
+
+    def _delete_job(self, job):
+        if self.flusher:
+            self.flusher.delete(job.queue_name, job.broker_id)
+        else:
+            self.broker.delete_job(job)
+
+    @contextmanager
+    def _beating(self, job):
+        """
+        Extends the visibility of the message of the job while it's running
+        """
+        if self.heartbeat:
+            self.heartbeat.add(job)
+
+        try:
+            yield
+        finally:
+            if self.heartbeat:
+                self.heartbeat.remove(job)
 
     def _execute_job(self, job, args, kwargs):
         try:
-            job.execute(*args, **kwargs)
-            self.broker.delete_job(job)
+            with self._beating(job):
+                job.execute(*args, **kwargs)
         except RetryException:
+            self._release_claim(job)
             job.on_retry()
-            self._set_custom_retry_time_if_needed(job)
+            self._set_custom_retry_time_if_needed(job, deferred=True)
             return
         except:
+            exc_info = sys.exc_info()
+            self._release_claim(job)
             job.on_failure()
-            self._handle_exception(job, args, kwargs, *sys.exc_info())
-            self._set_custom_retry_time_if_needed(job)
+            self._handle_exception(job, args, kwargs, *exc_info)
+            self._fail(job, format_error(exc_info))
             return
 
+        self._succeed(job)
         job.on_success()
 
+    def _succeed(self, job):
+        """
+        Stores the result of a successful job and deletes its message. Errors are only
+        logged: the job has been executed, so it's not failed nor its claim released.
+        """
+        self._store_result(job, ResultBackend.SUCCESS, getattr(job, 'result', None))
+        self._complete(job)
+
+        try:
+            self._delete_job(job)
+        except Exception:
+            logger.exception('Error deleting job %s', job.id)
+
+    def _fail(self, job, error):
+        """
+        Stores the error of a failed job. It's final only if the job gives up (see
+        `Job.max_retries`), and then its message is deleted. Otherwise the job is
+        stored as RETRY, so the ones waiting for it keep waiting, and it's retried.
+        """
+        if job.gives_up():
+            logger.info('Job %s failed %d times, giving up', job.id, job.retries)
+            self._store_result(job, ResultBackend.FAILURE, error)
+            self._delete_job(job)
+            return
+
+        self._store_result(job, ResultBackend.RETRY, error)
+        self._set_custom_retry_time_if_needed(job, deferred=True)
+
+    def _claim(self, job, payload):
+        """
+        Claims the execution of a job in the idempotency store (if any). Jobs already
+        executed are deleted, and jobs being executed by others are left in the queue.
+
+        :return: True if the job must be executed
+        """
+        if not self.idempotency_store:
+            return True
+
+        job.dedup_key = payload.get('dedup_key') or job.id
+
+        try:
+            state = self.idempotency_store.claim(job.dedup_key)
+        except Exception:
+            logger.exception('Error claiming job %s, executing it anyway', job.dedup_key)
+            return True
+
+        if state == IdempotencyStore.CLAIMED:
+            return True
+
+        if state == IdempotencyStore.DONE:
+            logger.info('Job %s already executed, deleting it', job.dedup_key)
+            self._delete_job(job)
+        else:
+            logger.info('Job %s is already running, leaving it in the queue', job.dedup_key)
+
+        return False
+
+    def _complete(self, job):
+        if self.idempotency_store:
+            self._call_idempotency_store(self.idempotency_store.complete, job)
+
+    def _release_claim(self, job):
+        if self.idempotency_store:
+            self._call_idempotency_store(self.idempotency_store.release, job)
+
+    def _call_idempotency_store(self, method, job):
+        try:
+            method(job.dedup_key)
+        except Exception:
+            logger.exception('Error updating the claim of job %s', job.dedup_key)
+
+    def _store_result(self, job, status, value):
+        """
+        Stores the result of a job in the result backend of the broker (if any)
+        """
+        if not self.result_backend:
+            return
+
+        try:
+            self.result_backend.store(job.id, status, value)
+        except Exception:
+            logger.exception('Error storing the result of job %s', job.id)
+
     def _handle_exception(self, job, args, kwargs, *exc_info):
         exception_message = ''.join(
             traceback.format_exception_only(*exc_info[:2]) +
@@ -107,3 +354,22 @@ class Worker(object):
     def _exit_gracefully(self, signum, frame):
         logger.info('Shutting down the worker...')
         self._shutting_down = True
+
+
+def format_error(exc_info):
+    """
+    One line description of an exception, like 'ZeroDivisionError: division by zero'
+    """
+    return ''.join(traceback.format_exception_only(*exc_info[:2])).strip()
+
+
+def get_max_rss():
+    """
+    Maximum resident set size (in MB) used by the current process
+    """
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if sys.platform == 'darwin':  # Bytes in OS X, kilobytes in Linux
+        return max_rss // (1024 * 1024)
+
+    return max_rss // 1024